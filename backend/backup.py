@@ -0,0 +1,182 @@
+import json
+import zlib
+from datetime import datetime
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from bson import json_util
+from bson.json_util import JSONOptions, JSONMode
+from pymongo import ReplaceOne
+
+# NDJSON export/import of the user's data. Each line is one document:
+#   {"collection": "notes", "document": {...}}
+# in MongoDB Extended JSON, so dates and ObjectIds survive the round trip.
+# Both directions stream in batches, so memory stays flat however large
+# the account is.
+
+# Collection -> field an import upserts on. Chats (live and archived) have
+# no id of their own, so they keep their _id; everything else drops it, so records can move
+# between databases without clashing.
+EXPORT_COLLECTIONS = {
+    "notes": "id",
+    "reminders": "id",
+    "chats": "_id",
+    "chats_archive": "_id",
+    "sessions": "session_id",
+    "searches": "id",
+    "code_analyses": "id",
+    "code_blobs": "hash",
+}
+
+# Collections /api/sync follows by updated_at. Imported documents get the
+# import time as updated_at, whatever the export carried, or sync clients
+# whose cursor is past the original time would never see them.
+SYNCED_COLLECTIONS = ("notes", "reminders")
+
+BATCH_SIZE = 1000
+MAX_LINE_BYTES = 16 * 2**20
+INFLATE_BYTES = 2**18
+
+JSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED, tz_aware=False)
+# The C JSON encoder/decoder with BSON types handled in hooks; several times
+# faster than json_util.dumps/loads, which walk every document in Python
+_encode_bson = partial(json_util.default, json_options=JSON_OPTIONS)
+_decode_bson = partial(json_util.object_hook, json_options=JSON_OPTIONS)
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def parse_collections(value: Optional[str]) -> List[str]:
+    if not value:
+        return list(EXPORT_COLLECTIONS)
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in EXPORT_COLLECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown collections: {', '.join(unknown)}")
+    return names
+
+
+def export_line(collection: str, document: dict) -> str:
+    if EXPORT_COLLECTIONS[collection] != "_id":
+        document.pop("_id", None)
+    return json.dumps({"collection": collection, "document": document}, default=_encode_bson, ensure_ascii=False) + "\n"
+
+
+async def export_chunks(database, collections: List[str], batch_size: int = BATCH_SIZE) -> AsyncIterator[bytes]:
+    """NDJSON, one chunk per batch of documents"""
+    for collection in collections:
+        lines = []
+        async for document in database[collection].find({}).batch_size(batch_size):
+            lines.append(export_line(collection, document))
+            if len(lines) >= batch_size:
+                yield "".join(lines).encode("utf-8")
+                lines = []
+        if lines:
+            yield "".join(lines).encode("utf-8")
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _inflate(decompressor, chunk: bytes):
+    """Decompress in bounded pieces; a small gzip chunk can expand a thousandfold"""
+    data = decompressor.decompress(chunk, INFLATE_BYTES)
+    while data:
+        yield data
+        data = decompressor.decompress(decompressor.unconsumed_tail, INFLATE_BYTES)
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Lines of an NDJSON body, gunzipped on the fly if it starts with the gzip magic bytes"""
+    decompressor = None
+    first = True
+    pending = b""
+    async for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk[:2] == b"\x1f\x8b":
+                decompressor = zlib.decompressobj(31)
+        for piece in _inflate(decompressor, chunk) if decompressor is not None else [chunk]:
+            pending += piece
+            *lines, pending = pending.split(b"\n")
+            if len(pending) > MAX_LINE_BYTES:
+                raise InvalidImport(f"Line longer than {MAX_LINE_BYTES} bytes")
+            for line in lines:
+                yield line
+    if decompressor is not None:
+        pending += decompressor.flush()
+    if pending:
+        yield pending
+
+
+def parse_line(line: bytes) -> tuple:
+    record = json.loads(line, object_hook=_decode_bson)
+    if not isinstance(record, dict) or not isinstance(record.get("document"), dict):
+        raise ValueError("expected {\"collection\": ..., \"document\": {...}}")
+    collection, document = record.get("collection"), record["document"]
+    if collection not in EXPORT_COLLECTIONS:
+        raise ValueError(f"unknown collection {collection!r}")
+    key = EXPORT_COLLECTIONS[collection]
+    if document.get(key) is None:
+        raise ValueError(f"document has no {key}")
+    if key != "_id":
+        document.pop("_id", None)
+    return collection, document
+
+
+def upsert_operation(collection: str, document: dict, now: Optional[datetime] = None) -> ReplaceOne:
+    key = EXPORT_COLLECTIONS[collection]
+    if collection in SYNCED_COLLECTIONS:
+        document["updated_at"] = now or datetime.now()
+    return ReplaceOne({key: document[key]}, document, upsert=True)
+
+
+async def import_lines(lines: AsyncIterator[bytes],
+                       write: Callable[[str, List[dict]], Awaitable[dict]],
+                       batch_size: int = BATCH_SIZE,
+                       max_errors: int = 20) -> dict:
+    """Group parsed lines into per-collection batches and hand each to write(collection, documents).
+
+    write returns counters ({"upserted": n, "matched": n, "failed": n}) that
+    are summed per collection. Malformed lines are skipped and reported.
+    """
+    batches: Dict[str, List[dict]] = {}
+    totals: Dict[str, Dict[str, int]] = {}
+    errors = []
+    skipped = 0
+
+    async def flush(collection: str):
+        documents = batches.pop(collection, [])
+        if documents:
+            counts = await write(collection, documents)
+            total = totals.setdefault(collection, {})
+            for name, value in counts.items():
+                total[name] = total.get(name, 0) + value
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            collection, document = parse_line(line)
+        except Exception as e:
+            skipped += 1
+            if len(errors) < max_errors:
+                errors.append({"line": line_number, "error": str(e)})
+            continue
+        batches.setdefault(collection, []).append(document)
+        if len(batches[collection]) >= batch_size:
+            await flush(collection)
+
+    for collection in list(batches):
+        await flush(collection)
+    return {"collections": totals, "skipped": skipped, "errors": errors}
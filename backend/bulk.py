@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Iterable, List, Set, Tuple
+
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+# Batch mutations for notes and reminders. Each batch is one existence
+# lookup plus one unordered bulk_write; the result lists every item with
+# its own status so a client can retry just the ones that failed.
+
+BULK_MAX_ITEMS = 1000
+
+
+def unique_ids(ids: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(ids))
+
+
+def insert_operations(documents: List[dict]) -> list:
+    return [InsertOne(document) for document in documents]
+
+
+def update_operations(ids: List[str], update) -> list:
+    return [UpdateOne({"id": doc_id}, update) for doc_id in ids]
+
+
+def delete_operations(ids: List[str]) -> list:
+    return [DeleteOne({"id": doc_id}) for doc_id in ids]
+
+
+def retag_update(add: List[str], remove: List[str], now: datetime) -> list:
+    """Pipeline update: drop `remove` (and `add`, to avoid duplicates) from tags, then append `add`"""
+    return [{"$set": {
+        "tags": {"$concatArrays": [
+            {"$filter": {"input": {"$ifNull": ["$tags", []]}, "cond": {"$not": [{"$in": ["$$this", remove + add]}]}}},
+            add,
+        ]},
+        "updated_at": now,
+    }}]
+
+
+def item_results(ids: List[str], targets: List[str], write_errors: List[dict], status: str) -> Tuple[List[dict], List[str]]:
+    """Per-item outcome of a bulk_write run over `targets` (the ids that existed).
+
+    Returns the results in request order and the ids that succeeded.
+    """
+    errors = {error["index"]: error.get("errmsg", "write failed") for error in write_errors}
+    failed = {targets[index]: message for index, message in errors.items()}
+    found: Set[str] = set(targets)
+
+    results, succeeded = [], []
+    for doc_id in ids:
+        if doc_id not in found:
+            results.append({"id": doc_id, "status": "not_found"})
+        elif doc_id in failed:
+            results.append({"id": doc_id, "status": "error", "error": failed[doc_id]})
+        else:
+            results.append({"id": doc_id, "status": status})
+            succeeded.append(doc_id)
+    return results, succeeded
+
+
+def summary(results: List[dict]) -> dict:
+    failed = sum(1 for result in results if result["status"] in ("error", "not_found"))
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
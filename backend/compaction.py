@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from typing import Optional, Set
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+
+class ChatCompactor:
+    """Moves chat turns beyond a per-session retention window to an archive.
+
+    Only turns the session's rolling summary (see ConversationContext)
+    already covers are moved, so what the assistant remembers of a
+    conversation is unchanged; a pass folds batches of older turns into the
+    summary, up to max_summaries of them, and archives each as it goes. A
+    session still over the window after that stays queued for the next
+    pass, so a long backlog is worked off without waiting for new turns.
+    Live history stays bounded per session, which keeps history pages and
+    context lookups as cheap for a 10k-turn session as for a new one.
+    Sessions are compacted in the background after they receive new turns,
+    and on startup sweep() queues every session already over the window.
+    """
+
+    def __init__(self, chats, archive, sessions, context, retention_turns: int = 200,
+                 batch_size: int = 500, interval: float = 300, max_summaries: int = 20):
+        self.chats = chats
+        self.archive = archive
+        self.sessions = sessions
+        self.context = context
+        self.retention_turns = retention_turns
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_summaries = max_summaries
+        self._touched: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.archived = 0
+        self.failures = 0
+
+    def touch(self, session_id: str):
+        """Note that a session got new turns"""
+        self._touched.add(session_id)
+
+    async def compact(self, session_id: str) -> int:
+        """Archive this session's summarized turns beyond the retention window; returns how many moved"""
+        newest = await self.chats.find(
+            {"session_id": session_id},
+            sort=[("timestamp", -1)],
+            limit=self.retention_turns + 1,
+            projection={"timestamp": 1}
+        )
+        if len(newest) <= self.retention_turns:
+            return 0
+        boundary = newest[self.retention_turns - 1]["timestamp"]
+
+        # Fold the next batch of older turns into the summary, then move what it covers
+        moved = 0
+        for _ in range(self.max_summaries):
+            folded = await self.context.refresh_summary(session_id, boundary)
+            moved += await self._archive(session_id, boundary)
+            if folded is None:
+                break
+        else:
+            # Turns before the window may be left: carry on in the next pass
+            self.touch(session_id)
+
+        self.archived += moved
+        return moved
+
+    async def _archive(self, session_id: str, boundary) -> int:
+        """Move the turns before boundary that the summary covers"""
+        summary = await self.context.get_summary(session_id)
+        if summary["upto"] is None:
+            return 0
+
+        moved = 0
+        while True:
+            turns = await self.chats.find(
+                {"session_id": session_id, "timestamp": {"$lt": boundary, "$lte": summary["upto"]}},
+                sort=[("timestamp", 1)],
+                limit=self.batch_size
+            )
+            if not turns:
+                break
+            # Upserts keyed on _id, so a pass interrupted between the two writes can simply rerun
+            _, errors = await self.archive.bulk_write([ReplaceOne({"_id": t["_id"]}, t, upsert=True) for t in turns])
+            if errors:
+                raise RuntimeError(f"Could not archive turns: {errors[0].get('errmsg')}")
+            await self.chats.delete_many({"_id": {"$in": [t["_id"] for t in turns]}})
+            await self.sessions.update_one(
+                {"session_id": session_id},
+                {"$inc": {"archived_turns": len(turns)}, "$set": {"archived_upto": turns[-1]["timestamp"]}}
+            )
+            moved += len(turns)
+        return moved
+
+    async def sweep(self) -> int:
+        """Queue the sessions whose live turns exceed the window; returns how many"""
+        over = await self.sessions.find(
+            {"$expr": {"$gt": [{"$subtract": ["$turn_count", {"$ifNull": ["$archived_turns", 0]}]}, self.retention_turns]}},
+            projection={"session_id": 1}
+        )
+        for session in over:
+            self.touch(session["session_id"])
+        return len(over)
+
+    async def run_once(self) -> int:
+        sessions, self._touched = self._touched, set()
+        moved = 0
+        for session_id in sessions:
+            try:
+                moved += await self.compact(session_id)
+            except Exception as e:
+                self.failures += 1
+                logger.warning("Could not compact session %s: %s", session_id, e)
+        self.runs += 1
+        return moved
+
+    async def run(self):
+        try:
+            await self.sweep()
+        except Exception as e:
+            logger.warning("Could not find sessions to compact: %s", e)
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "retention_turns": self.retention_turns,
+            "pending_sessions": len(self._touched),
+            "runs": self.runs,
+            "archived": self.archived,
+            "failures": self.failures,
+        }
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate (~4 characters per token for Portuguese/English text).
+# Good enough for budgeting; we only need to keep prompts bounded.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+def format_turn(turn: dict, max_tokens: int) -> str:
+    return (
+        f"Usuário: {truncate_to_tokens(turn['message'], max_tokens // 2)}\n"
+        f"Assistente: {truncate_to_tokens(turn['response'], max_tokens // 2)}"
+    )
+
+
+class ConversationContext:
+    """Builds bounded chat prompts from recent turns plus a rolling summary.
+
+    Recent turns are included newest-first until the token budget is spent.
+    Turns that fall out of the window are folded into a per-session summary
+    in the background, so the prompt size stays flat however long the
+    session gets; a summary call is only made once at least
+    summary_min_turns of them are waiting, not for every turn that leaves
+    the window. Summaries are cached in memory and persisted on the session
+    document (summary, summary_upto).
+    """
+
+    def __init__(self, chats, sessions, summarize: Callable[[str, List[dict]], Awaitable[str]],
+                 token_budget: int = 2000, max_turns: int = 10, max_turn_tokens: int = 600,
+                 summary_batch: int = 50, summary_min_turns: int = 10, max_cached_sessions: int = 1000):
+        self.chats = chats
+        self.sessions = sessions
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.max_turn_tokens = max_turn_tokens
+        self.summary_batch = summary_batch
+        self.summary_min_turns = summary_min_turns
+        self.summaries = TTLCache(max_entries=max_cached_sessions, ttl=24 * 3600)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get_summary(self, session_id: str) -> dict:
+        summary = self.summaries.get(session_id)
+        if summary is None:
+            session = await self.sessions.get(session_id, {"summary": 1, "summary_upto": 1})
+            summary = {
+                "text": (session or {}).get("summary", ""),
+                "upto": (session or {}).get("summary_upto"),
+            }
+            self.summaries.set(session_id, summary)
+        return summary
+
+    async def build(self, session_id: str, turns: List[dict], message: str, notes: Optional[List[str]] = None) -> str:
+        """Prompt for message given the session's recent turns (oldest first).
+
+        notes are snippets of the user's own notes/reminders relevant to the
+        message, most relevant first; they share the token budget with the
+        conversation and take precedence over older turns.
+        """
+        summary = await self.get_summary(session_id)
+        remaining = self.token_budget - estimate_tokens(message) - estimate_tokens(summary["text"])
+
+        kept_notes = []
+        for note in notes or []:
+            cost = estimate_tokens(note)
+            if cost > remaining:
+                break
+            kept_notes.append(note)
+            remaining -= cost
+
+        kept = []
+        for turn in reversed(turns):
+            text = format_turn(turn, self.max_turn_tokens)
+            cost = estimate_tokens(text)
+            if cost > remaining:
+                break
+            kept.append((turn, text))
+            remaining -= cost
+        kept.reverse()
+
+        # Anything older than the oldest kept turn and not yet summarized gets folded in later.
+        # A full window of turns means there may be more history beyond it.
+        oldest_kept = kept[0][0]["timestamp"] if kept else datetime.now()
+        has_older = len(kept) < len(turns) or len(turns) >= self.max_turns
+        if has_older and (summary["upto"] is None or summary["upto"] < oldest_kept):
+            self.schedule_refresh(session_id, oldest_kept)
+
+        if not summary["text"] and not kept and not kept_notes:
+            return message
+
+        sections = []
+        if kept_notes:
+            sections.append("Notas e lembretes do usuário que podem ser relevantes:\n" + "\n".join(f"- {note}" for note in kept_notes))
+        if summary["text"]:
+            sections.append(f"Resumo da conversa anterior:\n{summary['text']}")
+        if kept:
+            sections.append("Conversa recente:\n" + "\n".join(text for _, text in kept))
+        sections.append(f"Mensagem atual do usuário:\n{message}")
+        return "\n\n".join(sections)
+
+    def schedule_refresh(self, session_id: str, before: datetime):
+        task = self._refreshing.get(session_id)
+        if task is not None and not task.done():
+            return
+        self._refreshing[session_id] = asyncio.create_task(self._refresh_in_background(session_id, before))
+
+    async def _refresh_in_background(self, session_id: str, before: datetime):
+        try:
+            await self.refresh_summary(session_id, before, min_turns=self.summary_min_turns)
+        except Exception as e:
+            logger.warning("Could not update summary for session %s: %s", session_id, e)
+        finally:
+            self._refreshing.pop(session_id, None)
+
+    async def refresh_summary(self, session_id: str, before: datetime, min_turns: int = 1) -> Optional[dict]:
+        """Fold turns between the current summary and `before` into the summary,
+        unless fewer than min_turns are waiting"""
+        summary = await self.get_summary(session_id)
+        query = {"session_id": session_id, "timestamp": {"$lt": before}}
+        if summary["upto"] is not None:
+            query["timestamp"]["$gt"] = summary["upto"]
+
+        turns = await self.chats.find(
+            query,
+            sort=[("timestamp", 1)],
+            limit=self.summary_batch,
+            projection={"message": 1, "response": 1, "timestamp": 1}
+        )
+        if not turns or len(turns) < min(min_turns, self.summary_batch):
+            return None
+
+        text = await self.summarize(summary["text"], turns)
+        summary = {"text": text, "upto": turns[-1]["timestamp"]}
+        self.summaries.set(session_id, summary)
+        await self.sessions.update(session_id, {
+            "summary": text,
+            "summary_upto": summary["upto"],
+            "summary_updated_at": datetime.now()
+        })
+        return summary
+
+    def forget(self, session_id: str):
+        self.summaries.invalidate(session_id)
+
+    async def wait_idle(self):
+        """Wait for background summary updates (used on shutdown)"""
+        tasks = [t for t in self._refreshing.values() if not t.done()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from pymongo.errors import OperationFailure
+
+# Everything /api/dashboard needs, fetched in a single aggregation: the three
+# most recent documents of each collection plus the three counters, chained
+# with $unionWith (MongoDB 4.4+) and tagged with _kind so they can be split
+# apart again.
+
+RECENT_PER_SOURCE = 3
+
+# (collection, kind, sort field)
+ACTIVITY_SOURCES = [
+    ("chats", "chat", "timestamp"),
+    ("notes", "note", "created_at"),
+    ("reminders", "reminder", "created_at"),
+    ("searches", "search", "timestamp"),
+    ("code_analyses", "code", "timestamp"),
+]
+
+
+COUNTERS = ["recent_chats", "total_notes", "upcoming_reminders"]
+
+
+def count_queries(now: datetime) -> List[Tuple[str, str, dict]]:
+    """(counter name, collection, filter)"""
+    return [
+        ("recent_chats", "chats", {"timestamp": {"$gte": now - timedelta(days=7)}}),
+        ("total_notes", "notes", {}),
+        ("upcoming_reminders", "reminders", {"date": {"$gte": now}, "completed": False}),
+    ]
+
+
+def recent_pipeline(kind: str, sort_field: str) -> List[dict]:
+    stages = [
+        {"$sort": {sort_field: -1}},
+        {"$limit": RECENT_PER_SOURCE},
+    ]
+    if kind == "code":
+        # Code snippets live in code_blobs, referenced by hash
+        stages.append({"$lookup": {"from": "code_blobs", "localField": "code_hash", "foreignField": "hash", "as": "_blob"}})
+    stages.append({"$addFields": {"_kind": kind}})
+    return stages
+
+
+def count_pipeline(name: str, query: dict) -> List[dict]:
+    return [
+        {"$match": query},
+        {"$count": "value"},
+        {"$addFields": {"_kind": "count", "_name": name}},
+    ]
+
+
+def dashboard_pipeline(now: datetime) -> List[dict]:
+    """Pipeline to run on the chats collection"""
+    (_, first_kind, first_sort), *others = ACTIVITY_SOURCES
+    pipeline = recent_pipeline(first_kind, first_sort)
+    for collection, kind, sort_field in others:
+        pipeline.append({"$unionWith": {"coll": collection, "pipeline": recent_pipeline(kind, sort_field)}})
+    for name, collection, query in count_queries(now):
+        pipeline.append({"$unionWith": {"coll": collection, "pipeline": count_pipeline(name, query)}})
+    return pipeline
+
+
+def split_results(docs: List[dict]) -> Tuple[Dict[str, int], Dict[str, List[dict]]]:
+    counts = {name: 0 for name in COUNTERS}
+    recent = {kind: [] for _, kind, _ in ACTIVITY_SOURCES}
+    for doc in docs:
+        kind = doc.pop("_kind")
+        if kind == "count":
+            counts[doc["_name"]] = doc["value"]
+            continue
+        blob = doc.pop("_blob", None)
+        if "code" not in doc and kind == "code":
+            doc["code"] = blob[0]["code"] if blob else ""
+        recent[kind].append(doc)
+    return counts, recent
+
+
+async def fetch_concurrently(database, now: datetime) -> List[dict]:
+    """Same result as dashboard_pipeline for servers without $unionWith"""
+    async def recent(collection, kind, sort_field):
+        return await database[collection].aggregate(recent_pipeline(kind, sort_field)).to_list(length=None)
+
+    async def count(name, collection, query):
+        return [{"_kind": "count", "_name": name, "value": await database[collection].count_documents(query)}]
+
+    results = await asyncio.gather(
+        *(recent(*source) for source in ACTIVITY_SOURCES),
+        *(count(*counter) for counter in count_queries(now)),
+    )
+    return [doc for docs in results for doc in docs]
+
+
+async def fetch_dashboard_data(database, now: datetime) -> Tuple[Dict[str, int], Dict[str, List[dict]]]:
+    """Counters and recent documents per kind in one round-trip"""
+    try:
+        docs = await database.chats.aggregate(dashboard_pipeline(now)).to_list(length=None)
+    except OperationFailure:
+        docs = await fetch_concurrently(database, now)
+    return split_results(docs)
@@ -0,0 +1,345 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import AsyncIterator, Optional, List, Tuple
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+
+from metrics import MongoCommandMetrics, MongoPoolMetrics, mongo_checkouts_waiting, mongo_connections_in_use
+from sessions import preview, session_title
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB Connection
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
+client = AsyncIOMotorClient(MONGO_URL, event_listeners=[MongoCommandMetrics(), MongoPoolMetrics()])
+db = client.ai_assistant
+
+
+class Repository:
+    """Async data access for a single MongoDB collection.
+
+    Every method awaits Motor, so a slow round-trip only suspends the calling
+    request instead of blocking the whole event loop.
+    """
+
+    def __init__(self, collection, id_field: str = "id"):
+        self.collection = collection
+        self.id_field = id_field
+
+    async def insert(self, document: dict):
+        await self.collection.insert_one(document)
+        return document
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True) -> int:
+        result = await self.collection.insert_many(documents, ordered=ordered)
+        return len(result.inserted_ids)
+
+    async def bulk_write(self, operations: list, ordered: bool = False) -> Tuple[dict, List[dict]]:
+        """Run many writes in one round-trip.
+
+        Returns the raw bulk result and its write errors (each carrying the
+        index of the failed operation) instead of raising on partial failure.
+        """
+        try:
+            result = await self.collection.bulk_write(operations, ordered=ordered)
+            return result.bulk_api_result, []
+        except BulkWriteError as e:
+            return e.details, e.details.get("writeErrors", [])
+
+    async def get(self, doc_id: str, projection: Optional[dict] = None):
+        return await self.collection.find_one({self.id_field: doc_id}, projection)
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None):
+        return await self.collection.find_one(query, projection)
+
+    async def find(self, query: Optional[dict] = None, sort: Optional[list] = None,
+                   limit: int = 0, projection: Optional[dict] = None) -> List[dict]:
+        cursor = self.collection.find(query or {}, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def find_batches(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+                           batch_size: int = 1000) -> AsyncIterator[List[dict]]:
+        """Matching documents in lists of up to batch_size, read as the cursor fetches them"""
+        batch = []
+        async for document in self.collection.find(query or {}, projection).batch_size(batch_size):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def insert_if_missing(self, doc_id: str, document: dict) -> bool:
+        """Insert document under doc_id unless it already exists; True if it was inserted"""
+        result = await self.collection.update_one(
+            {self.id_field: doc_id},
+            {"$setOnInsert": {**document, self.id_field: doc_id}},
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    async def count(self, query: Optional[dict] = None) -> int:
+        return await self.collection.count_documents(query or {})
+
+    async def update(self, doc_id: str, fields: dict) -> int:
+        """Set fields on one document, returning how many documents matched"""
+        result = await self.collection.update_one({self.id_field: doc_id}, {"$set": fields})
+        return result.matched_count
+
+    async def update_one(self, query: dict, update: dict) -> int:
+        """Apply a raw update document to the first match, returning how many documents matched"""
+        result = await self.collection.update_one(query, update)
+        return result.matched_count
+
+    async def delete(self, doc_id: str) -> int:
+        result = await self.collection.delete_one({self.id_field: doc_id})
+        return result.deleted_count
+
+    async def delete_one(self, query: dict) -> int:
+        result = await self.collection.delete_one(query)
+        return result.deleted_count
+
+    async def find_one_and_delete(self, query: dict, projection: Optional[dict] = None):
+        """Delete the first match and return it (None if nothing matched)"""
+        return await self.collection.find_one_and_delete(query, projection=projection)
+
+    async def delete_many(self, query: dict) -> int:
+        result = await self.collection.delete_many(query)
+        return result.deleted_count
+
+
+# Repositories
+chats_repo = Repository(db.chats)
+chats_archive_repo = Repository(db.chats_archive)
+notes_repo = Repository(db.notes)
+reminders_repo = Repository(db.reminders)
+sessions_repo = Repository(db.sessions, id_field="session_id")
+searches_repo = Repository(db.searches)
+code_analyses_repo = Repository(db.code_analyses)
+code_blobs_repo = Repository(db.code_blobs, id_field="hash")
+tombstones_repo = Repository(db.tombstones)
+
+# Tombstones let /api/sync report deletions; older ones expire and clients
+# whose cursor predates them have to sync from scratch
+TOMBSTONE_TTL_SECONDS = 30 * 24 * 3600
+
+
+# Indexes backing the queries in server.py, per collection: (name, keys, options)
+INDEXES = {
+    "chats": [
+        ("session_timestamp", [("session_id", ASCENDING), ("timestamp", ASCENDING)], {}),
+        ("timestamp", [("timestamp", DESCENDING)], {}),
+    ],
+    "chats_archive": [
+        ("session_timestamp", [("session_id", ASCENDING), ("timestamp", ASCENDING)], {}),
+    ],
+    "notes": [
+        ("id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("created_at", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("category_created_at", [("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("tags", [("tags", ASCENDING)], {}),
+        ("updated_at", [("updated_at", ASCENDING), ("id", ASCENDING)], {}),
+    ],
+    "reminders": [
+        ("id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("completed_date", [("completed", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], {}),
+        ("date", [("date", ASCENDING), ("id", ASCENDING)], {}),
+        ("created_at", [("created_at", DESCENDING)], {}),
+        ("updated_at", [("updated_at", ASCENDING), ("id", ASCENDING)], {}),
+    ],
+    "sessions": [
+        ("session_id_unique", [("session_id", ASCENDING)], {"unique": True}),
+        ("last_activity", [("last_activity", DESCENDING), ("session_id", DESCENDING)], {}),
+    ],
+    "searches": [
+        ("id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("query_hash_answered_at", [("query_hash", ASCENDING), ("answered_at", DESCENDING)], {}),
+        ("timestamp", [("timestamp", DESCENDING)], {}),
+    ],
+    "code_analyses": [
+        ("id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("cache_key", [("cache_key", ASCENDING)], {}),
+        ("code_hash", [("code_hash", ASCENDING)], {}),
+        ("timestamp", [("timestamp", DESCENDING)], {}),
+    ],
+    "code_blobs": [
+        ("hash_unique", [("hash", ASCENDING)], {"unique": True}),
+    ],
+    "tombstones": [
+        ("kind_deleted_at", [("kind", ASCENDING), ("deleted_at", ASCENDING), ("id", ASCENDING)], {}),
+        ("deleted_at_ttl", [("deleted_at", ASCENDING)], {"expireAfterSeconds": TOMBSTONE_TTL_SECONDS}),
+    ],
+}
+
+
+def _index_matches(existing: dict, keys: list, options: dict) -> bool:
+    return (
+        list(existing["key"]) == keys
+        and bool(existing.get("unique", False)) == bool(options.get("unique", False))
+        and existing.get("expireAfterSeconds") == options.get("expireAfterSeconds")
+    )
+
+
+async def ensure_indexes(database=None, indexes: Optional[dict] = None) -> dict:
+    """Create missing indexes and rebuild declared ones whose definition changed.
+
+    Returns {collection: [actions]} describing what was done. Indexes that are
+    not declared here are left alone.
+    """
+    database = database if database is not None else db
+    indexes = indexes if indexes is not None else INDEXES
+    report = {}
+
+    for collection_name, declared in indexes.items():
+        collection = database[collection_name]
+        existing = await collection.index_information()
+        to_create = []
+        actions = []
+
+        for name, keys, options in declared:
+            current = existing.get(name)
+            if current is not None and _index_matches(current, keys, options):
+                continue
+            if current is not None:
+                await collection.drop_index(name)
+                actions.append(f"rebuilt {name}")
+            else:
+                actions.append(f"created {name}")
+            to_create.append(IndexModel(keys, name=name, **options))
+
+        if to_create:
+            await collection.create_indexes(to_create)
+        report[collection_name] = actions
+
+    return report
+
+
+async def backfill_updated_at(database=None) -> dict:
+    """Give notes and reminders written before updated_at existed their created_at,
+    so delta sync can order every document. Returns {collection: modified count}."""
+    database = database if database is not None else db
+    report = {}
+    for collection_name in ["notes", "reminders"]:
+        result = await database[collection_name].update_many(
+            {"updated_at": {"$exists": False}},
+            [{"$set": {"updated_at": "$created_at"}}]
+        )
+        report[collection_name] = result.modified_count
+    return report
+
+
+async def backfill_session_aggregates(database=None, batch_size: int = 1000) -> int:
+    """Compute turn_count, last_activity, title and previews for sessions created
+    before the session document carried them. Returns how many were updated."""
+    database = database if database is not None else db
+    updated = 0
+    while True:
+        sessions = await database.sessions.find(
+            {"turn_count": {"$exists": False}}, {"session_id": 1, "archived_turns": 1, "created_at": 1}
+        ).to_list(length=batch_size)
+        if not sessions:
+            return updated
+        aggregates = {
+            row["_id"]: row
+            for row in await database.chats.aggregate([
+                {"$match": {"session_id": {"$in": [s["session_id"] for s in sessions]}}},
+                {"$sort": {"timestamp": 1}},
+                {"$group": {
+                    "_id": "$session_id",
+                    "turn_count": {"$sum": 1},
+                    "last_activity": {"$last": "$timestamp"},
+                    "first_message": {"$first": "$message"},
+                    "last_message": {"$last": "$message"},
+                    "last_response": {"$last": "$response"},
+                }},
+            ]).to_list(length=None)
+        }
+        operations = []
+        for session in sessions:
+            row = aggregates.get(session["session_id"], {})
+            fields = {
+                "turn_count": row.get("turn_count", 0) + session.get("archived_turns", 0),
+                "last_activity": row.get("last_activity") or session.get("created_at"),
+                "title": session_title(row.get("first_message", "")),
+                "last_message": preview(row.get("last_message", ""), 100),
+                "last_response": preview(row.get("last_response", ""), 200),
+            }
+            operations.append(UpdateOne({"_id": session["_id"]}, {"$set": fields, "$unset": {"messages": ""}}))
+        result = await database.sessions.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+
+
+async def ping(database=None):
+    database = database if database is not None else db
+    await database.command("ping")
+
+
+async def missing_indexes(database=None, indexes: Optional[dict] = None) -> dict:
+    """{collection: [declared index names not present]}, only for collections missing some"""
+    database = database if database is not None else db
+    indexes = indexes if indexes is not None else INDEXES
+    missing = {}
+    for collection_name, declared in indexes.items():
+        existing = await database[collection_name].index_information()
+        names = [name for name, _, _ in declared if name not in existing]
+        if names:
+            missing[collection_name] = names
+    return missing
+
+
+def pool_usage() -> dict:
+    """Connection pool occupancy across servers, from the pool listener"""
+    in_use = mongo_connections_in_use.total()
+    max_size = client.options.pool_options.max_pool_size
+    return {
+        "connections_in_use": in_use,
+        "checkouts_waiting": mongo_checkouts_waiting.total(),
+        "max_pool_size": max_size,
+        "saturation": round(in_use / max_size, 3) if max_size else 0.0,
+    }
+
+
+def close_client():
+    client.close()
+
+
+async def delete_orphan_code_blobs(database=None, batch_size: int = 1000) -> int:
+    """Delete code blobs no analysis refers to any more, left by deletes made before
+    delete_code_analysis removed them. Returns how many were deleted."""
+    database = database if database is not None else db
+    used = set(await database.code_analyses.distinct("code_hash"))
+    deleted = 0
+    orphans = []
+    async for blob in database.code_blobs.find({}, {"hash": 1}).batch_size(batch_size):
+        if blob["hash"] not in used:
+            orphans.append(blob["hash"])
+        if len(orphans) >= batch_size:
+            deleted += (await database.code_blobs.delete_many({"hash": {"$in": orphans}})).deleted_count
+            orphans = []
+    if orphans:
+        deleted += (await database.code_blobs.delete_many({"hash": {"$in": orphans}})).deleted_count
+    return deleted
+
+
+async def migrate():
+    for name, actions in (await ensure_indexes()).items():
+        logging.info("%s: %s", name, ", ".join(actions) or "up to date")
+    for name, modified in (await backfill_updated_at()).items():
+        logging.info("%s: updated_at set on %d documents", name, modified)
+    logging.info("sessions: aggregates set on %d documents", await backfill_session_aggregates())
+    logging.info("code_blobs: %d orphaned blobs deleted", await delete_orphan_code_blobs())
+
+
+if __name__ == "__main__":
+    # Can be run on its own as a migration: python database.py
+    # One event loop for all steps: the motor client is bound to the first loop it runs on
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate())
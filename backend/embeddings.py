@@ -0,0 +1,196 @@
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from textindex import field_text, stem, words
+
+# What the chat retrieves from: per kind, the fields that are embedded and
+# how a match is quoted in the prompt.
+EMBEDDED = {
+    "note": {"fields": ["title", "content", "tags", "category"]},
+    "reminder": {"fields": ["title", "description"]},
+}
+
+SNIPPET_CHARS = 200
+
+
+def document_text(kind: str, document: dict) -> str:
+    return " ".join(field_text(document.get(field)) for field in EMBEDDED[kind]["fields"])
+
+
+def snippet(kind: str, document: dict) -> str:
+    title = field_text(document.get("title"))
+    if kind == "reminder":
+        date = document.get("date")
+        if isinstance(date, datetime):
+            title = f"{title} ({date.strftime('%d/%m/%Y %H:%M')})"
+        body = field_text(document.get("description"))
+    else:
+        body = field_text(document.get("content"))
+    return f"{title}: {body[:SNIPPET_CHARS]}" if body else title
+
+
+class HashingEmbedder:
+    """CPU-only text embedding: hashed stem unigrams, stem bigrams and character 4-grams.
+
+    Needs no model or training. Texts sharing words, word stems or word
+    fragments land close together, which is enough to surface the notes a
+    chat message is about. Vectors are L2-normalized, so a dot product is
+    the cosine similarity.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._term_features = lru_cache(maxsize=100000)(self._hash_term)
+
+    def _hash(self, feature: str, weight: float) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode("utf-8"))
+        return h % self.dim, weight if h & 0x80000000 else -weight
+
+    def _hash_term(self, term: str) -> List[Tuple[int, float]]:
+        """The word itself and its character 4-grams"""
+        padded = f"<{term}>"
+        return [self._hash("w:" + term, 1.0)] + [
+            self._hash("c:" + padded[j:j + 4], 0.25) for j in range(len(padded) - 3)
+        ]
+
+    def embed(self, text: str) -> np.ndarray:
+        stems = [stem(w) for w in words(text)]
+        features = []
+        for i, term in enumerate(stems):
+            features.extend(self._term_features(term))
+            if i:
+                features.append(self._hash(f"b:{stems[i - 1]} {term}", 0.5))
+        if not features:
+            return np.zeros(self.dim, dtype=np.float32)
+
+        indices, weights = zip(*features)
+        vector = np.bincount(indices, weights=weights, minlength=self.dim).astype(np.float32)
+        # Sublinear term frequency, then unit length
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            matrix[i] = self.embed(text)
+        return matrix
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """int8 codes and per-vector float32 scales (vector ~= codes * scale)"""
+    peak = np.abs(vectors).max(axis=1)
+    scales = np.where(peak > 0, peak / 127, 1).astype(np.float32)
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+
+class VectorIndex:
+    """Cosine top-k over int8-quantized embeddings of notes and reminders.
+
+    Codes are stored dimension-major (dim x capacity), so a query only
+    reads the rows of its strongest dimensions: the query vector is pruned
+    to query_dims components, which keeps search cost proportional to that
+    number rather than to the embedding size. Slots of removed documents
+    are zeroed and reused.
+    """
+
+    def __init__(self, embedder: Optional[HashingEmbedder] = None, capacity: int = 1024, query_dims: int = 48):
+        self.embedder = embedder or HashingEmbedder()
+        self.query_dims = query_dims
+        self._codes = np.zeros((self.embedder.dim, capacity), dtype=np.int8)
+        self._scales = np.zeros(capacity, dtype=np.float32)
+        self._kinds = np.full(capacity, -1, dtype=np.int8)
+        self._kind_codes = {kind: code for code, kind in enumerate(EMBEDDED)}
+        self._keys: List[Optional[Tuple[str, str]]] = []
+        self._snippets: List[Optional[str]] = []
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._free: List[int] = []
+        self.ready = False
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        slot = len(self._keys)
+        capacity = self._codes.shape[1]
+        if slot >= capacity:
+            self._codes = np.concatenate([self._codes, np.zeros_like(self._codes)], axis=1)
+            self._scales = np.concatenate([self._scales, np.zeros(capacity, dtype=np.float32)])
+            self._kinds = np.concatenate([self._kinds, np.full(capacity, -1, dtype=np.int8)])
+        self._keys.append(None)
+        self._snippets.append(None)
+        return slot
+
+    def add(self, kind: str, document: dict):
+        self.add_many(kind, [document])
+
+    def add_many(self, kind: str, documents: List[dict]):
+        """Embed and store (or replace) documents of one kind in a single batch"""
+        if not documents:
+            return
+        codes, scales = quantize(self.embedder.embed_many(document_text(kind, d) for d in documents))
+        for document, code, scale in zip(documents, codes, scales):
+            key = (kind, document["id"])
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._allocate()
+                self._slots[key] = slot
+                self._keys[slot] = key
+            self._codes[:, slot] = code
+            self._scales[slot] = scale
+            self._kinds[slot] = self._kind_codes[kind]
+            self._snippets[slot] = snippet(kind, document)
+
+    def remove(self, kind: str, doc_id: str) -> bool:
+        slot = self._slots.pop((kind, doc_id), None)
+        if slot is None:
+            return False
+        self._codes[:, slot] = 0
+        self._scales[slot] = 0
+        self._kinds[slot] = -1
+        self._keys[slot] = self._snippets[slot] = None
+        self._free.append(slot)
+        return True
+
+    def search(self, text: str, k: int = 5, kinds: Optional[List[str]] = None, min_score: float = 0.0) -> List[dict]:
+        n = len(self._keys)
+        query = self.embedder.embed(text)
+        dims = np.flatnonzero(query)
+        if n == 0 or len(dims) == 0:
+            return []
+        if len(dims) > self.query_dims:
+            dims = dims[np.argpartition(-np.abs(query[dims]), self.query_dims - 1)[:self.query_dims]]
+
+        scores = (query[dims] @ self._codes[dims, :n].astype(np.float32)) * self._scales[:n]
+        if kinds:
+            scores[~np.isin(self._kinds[:n], [self._kind_codes[kind] for kind in kinds])] = 0
+
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {
+                "type": self._keys[slot][0],
+                "id": self._keys[slot][1],
+                "snippet": self._snippets[slot],
+                "score": round(float(scores[slot]), 4),
+            }
+            for slot in top
+            if scores[slot] > min_score and self._keys[slot] is not None
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "documents": len(self._slots),
+            "dim": self.embedder.dim,
+            "bytes": int(self._codes.nbytes + self._scales.nbytes),
+        }
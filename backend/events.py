@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional
+
+
+class Subscription(asyncio.Queue):
+    """A subscriber's queue. overflowed is set when events had to be dropped from it.
+
+    None is put in the queue when the broadcaster closes: no more events follow.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.overflowed = False
+
+
+class Broadcaster:
+    """Fans events out to every current subscriber.
+
+    Each subscriber gets its own bounded queue. A subscriber that falls
+    behind loses its oldest events rather than slowing down the publisher
+    or the other subscribers; its queue is then marked overflowed so the
+    consumer can tell its client to resync. close() ends every subscription,
+    and any made until open() is called, with None.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self.closed = False
+        self._subscribers = set()
+        self.published = 0
+        self.dropped = 0
+
+    @staticmethod
+    def _end(queue: Subscription):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def close(self):
+        self.closed = True
+        for queue in self._subscribers:
+            self._end(queue)
+
+    def open(self):
+        self.closed = False
+
+    def publish(self, event: dict):
+        self.published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                queue.overflowed = True
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self):
+        queue = Subscription(self.max_queue)
+        if self.closed:
+            self._end(queue)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "closed": self.closed,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+class EventBus(Broadcaster):
+    """Versioned change events (note.created, reminder.due, ...) for push clients.
+
+    Every event gets the next version number. The most recent events are
+    kept so a client that reconnects can replay what it missed; if it fell
+    further behind than that, or the server restarted (new epoch), it has
+    to resync from the REST endpoints instead.
+    """
+
+    def __init__(self, max_queue: int = 100, history: int = 1000):
+        super().__init__(max_queue)
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions = itertools.count(1)
+        self.version = 0
+        self._history = deque(maxlen=history)
+
+    def publish(self, event_type: str, data: dict) -> dict:
+        self.version = next(self._versions)
+        event = {"version": self.version, "type": event_type, "data": data, "timestamp": datetime.now()}
+        self._history.append(event)
+        super().publish(event)
+        return event
+
+    def since(self, version: int) -> Optional[List[dict]]:
+        """Events after version, or None when some of them are no longer kept"""
+        if version >= self.version:
+            return []
+        if not self._history or self._history[0]["version"] > version + 1:
+            return None
+        return [event for event in self._history if event["version"] > version]
+
+    def stats(self) -> dict:
+        return {**super().stats(), "epoch": self.epoch, "version": self.version, "history": len(self._history)}
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from cache import SingleFlight
+
+OK = "ok"
+DEGRADED = "degraded"
+DOWN = "down"
+
+
+class ProbeFailed(Exception):
+    """Raised by a probe whose dependency is unusable; details go in the report"""
+
+    def __init__(self, message: str, details: Optional[dict] = None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+class _Probe:
+    def __init__(self, name: str, check: Callable[[], Awaitable[dict]], critical: bool, budget_ms: Optional[float]):
+        self.name = name
+        self.check = check
+        self.critical = critical
+        self.budget_ms = budget_ms
+        self.result: Optional[dict] = None
+        self.checked_at = 0.0
+        self.runs = 0
+
+
+class HealthChecker:
+    """Readiness from cached dependency probes.
+
+    Each probe runs at most once per ttl seconds however often readiness is
+    polled, and concurrent polls share a run in progress, so load balancer
+    health checks add a bounded, tiny load to the dependencies. A probe
+    raising ProbeFailed or exceeding timeout is down; one slower than its
+    budget_ms is degraded. The service is ready unless a critical probe is
+    down or it is draining, which takes it out of rotation while in-flight
+    requests finish.
+    """
+
+    def __init__(self, ttl: float = 5.0, timeout: float = 2.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.clock = clock
+        self.draining = False
+        self._probes: Dict[str, _Probe] = {}
+        self._flight = SingleFlight()
+
+    def register(self, name: str, check: Callable[[], Awaitable[dict]], critical: bool = True,
+                 budget_ms: Optional[float] = None):
+        """check() returns details for the report, may return {"status": "degraded"}, or raises ProbeFailed"""
+        self._probes[name] = _Probe(name, check, critical, budget_ms)
+
+    async def _run(self, probe: _Probe) -> dict:
+        start = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(probe.check(), self.timeout)
+            status = details.pop("status", OK)
+            error = None
+        except asyncio.TimeoutError:
+            status, details, error = DOWN, {}, f"timed out after {self.timeout}s"
+        except ProbeFailed as e:
+            status, details, error = DOWN, e.details, str(e)
+        except Exception as e:
+            status, details, error = DOWN, {}, f"{type(e).__name__}: {e}"
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        if status == OK and probe.budget_ms is not None and latency_ms > probe.budget_ms:
+            status = DEGRADED
+        result = {"status": status, "critical": probe.critical, "latency_ms": round(latency_ms, 1)}
+        if probe.budget_ms is not None:
+            result["budget_ms"] = probe.budget_ms
+        if error:
+            result["error"] = error
+        result.update(details)
+
+        probe.result = result
+        probe.checked_at = self.clock()
+        probe.runs += 1
+        return result
+
+    async def probe(self, name: str) -> dict:
+        probe = self._probes[name]
+        if probe.result is None or self.clock() - probe.checked_at >= self.ttl:
+            await self._flight.do(name, lambda: self._run(probe))
+        return {**probe.result, "age_seconds": round(self.clock() - probe.checked_at, 1)}
+
+    async def readiness(self) -> dict:
+        names = list(self._probes)
+        results = dict(zip(names, await asyncio.gather(*(self.probe(name) for name in names))))
+        failing = [name for name, result in results.items() if result["critical"] and result["status"] == DOWN]
+        if self.draining:
+            status = "draining"
+        elif failing:
+            status = "not_ready"
+        else:
+            status = "ready"
+        return {
+            "status": status,
+            "ready": status == "ready",
+            "failing": failing,
+            "degraded": [name for name, result in results.items() if result["status"] != OK and name not in failing],
+            "checks": results,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "draining": self.draining,
+            "ttl_seconds": self.ttl,
+            "timeout_seconds": self.timeout,
+            "probe_runs": {name: probe.runs for name, probe in self._probes.items()},
+        }
@@ -0,0 +1,226 @@
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Optional
+
+# Local intent classifier used before the Gemini intent call in /api/chat.
+# It answers in the same format as the intent prompt
+# (CRIAR_NOTA|..., CRIAR_LEMBRETE|..., CONVERSAR) and returns None when the
+# message is ambiguous, in which case the caller falls back to the LLM.
+
+NOTE = "note"
+REMINDER = "reminder"
+
+# (pattern, intent, weight) over accent-folded, lowercased text.
+# Weight 3 marks an explicit command, weight 1 a supporting keyword.
+KEYWORD_WEIGHTS = [
+    (r"^(por favor,? )?(anote|anota|anotar)\b", NOTE, 3),
+    (r"\banote (que|ai|isso|isto)\b", NOTE, 3),
+    (r"\b(crie|criar|cria|faca|fazer|adicione|adicionar) (uma |a )?(nova )?nota\b", NOTE, 3),
+    (r"\bnova nota\b", NOTE, 3),
+    (r"^(salve|salva|guarde|guarda|escreva|escreve)\b", NOTE, 2),
+    (r"\blembrar disso\b", NOTE, 2),
+    (r"\b(nota|anotacao|anotar|salvar|guardar|escrever)\b", NOTE, 1),
+    (r"^(por favor,? )?(me )?(lembre|relembre)\b", REMINDER, 3),
+    (r"\bme (lembre|avise)\b", REMINDER, 3),
+    (r"\b(crie|criar|cria|adicione|adicionar|coloque|colocar) (um |o )?(novo )?lembrete\b", REMINDER, 3),
+    (r"^(agende|agendar)\b", REMINDER, 3),
+    (r"^(um |novo )?lembrete\b", REMINDER, 3),
+    (r"\bnao (me )?deixe? esquecer\b", REMINDER, 3),
+    (r"\b(lembrete|agendar|compromisso|tarefa|lembrar de)\b", REMINDER, 1),
+]
+
+# Words that are also nouns or recall questions ("Marca de carro", "Agenda cultural",
+# "Lembra quando..."); they only count as a command next to a date or time
+DATED_KEYWORD_WEIGHTS = [
+    (r"^(por favor,? )?(me )?lembra\b", REMINDER, 3),
+    (r"\bme (lembra|avisa)\b", REMINDER, 3),
+    (r"^(agenda|marque|marca)\b", REMINDER, 3),
+]
+
+# Signals that the user is asking something rather than giving a command
+QUESTION_PATTERNS = [
+    r"\?",
+    r"^(o que|oque|como|qual|quais|quando|onde|por que|porque|pq|quem|quanto|sera que|voce|vc|pode|poderia|consegue|sabe)\b",
+]
+
+# Signals that the message is plain conversation
+CONVERSATION_PATTERNS = [
+    r"^(oi|ola|bom dia|boa tarde|boa noite|e ai|eai|hey|hello|hi|obrigad[oa]|valeu|tchau|ate mais)\b",
+    r"^(explique|explica|me explique|me explica|fale|fala|me fale|me conte|conte|descreva|resuma|traduza|escreva um|escreva uma|gere|ajude|me ajude)\b",
+]
+
+TIME_PATTERNS = [
+    (r"\b(\d{1,2})[h:](\d{2})\b", True),
+    (r"\b(\d{1,2}) ?h\b", False),
+    (r"\bas (\d{1,2})\b", False),
+    (r"\b(\d{1,2}) horas\b", False),
+    (r"\b(\d{1,2}) ?(?:am|pm)\b", False),
+]
+
+WEEKDAYS = {
+    "segunda": 0, "terca": 1, "quarta": 2, "quinta": 3,
+    "sexta": 4, "sabado": 5, "domingo": 6,
+}
+
+DATE_CUE = re.compile(r"\b(hoje|amanha|depois de amanha|segunda|terca|quarta|quinta|sexta|sabado|domingo|\d{1,2} ?h|\d{1,2}:\d{2}|\d{1,2} ?pm|as \d{1,2})\b")
+
+CATEGORY_KEYWORDS = {
+    "work": ["trabalho", "reuniao", "cliente", "projeto", "chefe", "escritorio", "relatorio", "empresa", "email"],
+    "study": ["estudar", "estudo", "prova", "aula", "faculdade", "curso", "livro", "escola", "materia", "revisar"],
+    "personal": ["comprar", "compras", "casa", "medico", "familia", "academia", "mercado", "aniversario", "pagar", "conta"],
+}
+
+HIGH_PRIORITY_KEYWORDS = ["urgente", "importante", "sem falta", "prioridade alta"]
+LOW_PRIORITY_KEYWORDS = ["sem pressa", "quando puder", "prioridade baixa"]
+
+# Leading words removed when extracting the note/reminder body
+NOTE_TRIGGER = re.compile(
+    r"^.*?\b(anote|anota|anotar|nova nota|nota|salve|salva|guarde|guarda|escreva|escreve|lembrar disso)\b"
+    r"(\s+(que|ai|isso|isto|sobre|com|de|do|da|o seguinte|para mim|pra mim)\b)*[\s:,-]*"
+)
+REMINDER_TRIGGER = re.compile(
+    r"^.*?\b(lembre|lembra|relembre|avise|avisa|lembrete|agende|agenda|agendar|marque|marca|esquecer)\b(-me)?"
+    r"(\s+(me|de|do|da|que|para|pra|sobre|o|a)\b)*[\s:,-]*"
+)
+
+MIN_ACTION_SCORE = 3
+MIN_MARGIN = 2
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents, keeping one output char per input char"""
+    folded = []
+    for ch in unicodedata.normalize("NFC", text):
+        base = unicodedata.normalize("NFKD", ch)[0]
+        folded.append(base.lower() if len(base.lower()) == 1 else ch)
+    return "".join(folded)
+
+
+def score_message(text: str) -> dict:
+    """Weighted keyword scores for each intent plus question/conversation cues"""
+    folded = fold(text.strip())
+    date_cue = bool(DATE_CUE.search(folded))
+    scores = {NOTE: 0, REMINDER: 0}
+    for pattern, intent, weight in KEYWORD_WEIGHTS + (DATED_KEYWORD_WEIGHTS if date_cue else []):
+        if re.search(pattern, folded):
+            scores[intent] += weight
+    return {
+        NOTE: scores[NOTE],
+        REMINDER: scores[REMINDER],
+        "question": any(re.search(p, folded) for p in QUESTION_PATTERNS),
+        "conversation": any(re.search(p, folded) for p in CONVERSATION_PATTERNS),
+        "date_cue": date_cue,
+    }
+
+
+def _clean(text: str) -> str:
+    text = text.replace("|", "/").strip(" .,:;-!\n\t")
+    return text[:1].upper() + text[1:]
+
+
+def _title(text: str, max_words: int = 6) -> str:
+    return " ".join(text.split()[:max_words])
+
+
+def _category(folded: str) -> str:
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(re.search(rf"\b{k}\b", folded) for k in keywords):
+            return category
+    return "general"
+
+
+def _priority(folded: str) -> str:
+    if any(k in folded for k in HIGH_PRIORITY_KEYWORDS):
+        return "high"
+    if any(k in folded for k in LOW_PRIORITY_KEYWORDS):
+        return "low"
+    return "medium"
+
+
+def parse_reminder_date(folded: str, now: Optional[datetime] = None) -> datetime:
+    """Resolve the relative date/time expressions the intent prompt describes"""
+    now = now or datetime.now()
+
+    if "depois de amanha" in folded:
+        day = now + timedelta(days=2)
+    elif re.search(r"\bamanha\b", folded):
+        day = now + timedelta(days=1)
+    elif re.search(r"\bhoje\b", folded):
+        day = now
+    else:
+        day = now + timedelta(days=1)
+        for name, weekday in WEEKDAYS.items():
+            if re.search(rf"\b{name}\b", folded):
+                days_ahead = (weekday - now.weekday()) % 7 or 7
+                day = now + timedelta(days=days_ahead)
+                break
+
+    hour, minute = 10, 0
+    for pattern, has_minutes in TIME_PATTERNS:
+        match = re.search(pattern, folded)
+        if match:
+            hour = int(match.group(1))
+            minute = int(match.group(2)) if has_minutes else 0
+            break
+    if re.search(rf"\b{hour} ?(pm|da tarde|da noite)\b", folded) and hour < 12:
+        hour += 12
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        hour, minute = 10, 0
+
+    return day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def _strip_date_words(text: str) -> str:
+    folded = fold(text)
+    cut = re.search(
+        r"(\s+(para|pra|em|de|do|da))?\s+(hoje|amanha|depois de amanha|(na |no |nesta |neste |proxima |proximo )?(segunda|terca|quarta|quinta|sexta|sabado|domingo)(-feira)?|as \d{1,2}|\d{1,2}[h:]).*$",
+        folded,
+    )
+    return text[:cut.start()] if cut else text
+
+
+def _extract_note(message: str, folded: str) -> Optional[str]:
+    match = NOTE_TRIGGER.match(folded)
+    content = _clean(message[match.end():] if match else message)
+    if not content:
+        return None
+    return f"CRIAR_NOTA|{_clean(_title(content))}|{content}|{_category(folded)}"
+
+
+def _extract_reminder(message: str, folded: str, now: Optional[datetime] = None) -> Optional[str]:
+    match = REMINDER_TRIGGER.match(folded)
+    description = _clean(message[match.end():] if match else message)
+    if not description:
+        return None
+    title = _clean(_title(_strip_date_words(description))) or _clean(_title(description))
+    date = parse_reminder_date(folded, now)
+    return f"CRIAR_LEMBRETE|{title}|{description}|{date.isoformat()}|{_priority(folded)}"
+
+
+def classify_intent(message: str, now: Optional[datetime] = None) -> Optional[str]:
+    """Return an intent line for obvious messages or None if the LLM should decide"""
+    if not message or not message.strip():
+        return "CONVERSAR"
+
+    message = unicodedata.normalize("NFC", message.strip())
+    folded = fold(message)
+    scores = score_message(message)
+    note, reminder = scores[NOTE], scores[REMINDER]
+    action = max(note, reminder)
+
+    if action == 0:
+        # No note/reminder vocabulary at all; a bare date mention may still be an implicit reminder
+        if scores["date_cue"] and not (scores["question"] or scores["conversation"]):
+            return None
+        return "CONVERSAR"
+
+    if scores["conversation"] and action < MIN_ACTION_SCORE:
+        return "CONVERSAR"
+
+    if scores["question"] or action < MIN_ACTION_SCORE or abs(note - reminder) < MIN_MARGIN:
+        return None
+
+    if reminder > note:
+        return _extract_reminder(message, folded, now)
+    return _extract_note(message, folded)
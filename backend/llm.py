@@ -0,0 +1,138 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+
+@dataclass
+class LlmProfile:
+    """A named system prompt + generation settings shared by many requests"""
+    name: str
+    system_message: str
+    max_tokens: int = 4096
+    priority: int = 1  # lower is served first when calls have to queue
+
+
+@dataclass
+class _PooledClient:
+    client: Any
+    initial_messages: list = None
+    uses: int = 0
+
+
+@dataclass
+class _ProfileStats:
+    created: int = 0
+    reused: int = 0
+    discarded: int = 0
+    idle: List[_PooledClient] = field(default_factory=list)
+
+
+class LlmClientPool:
+    """Reusable, pre-configured LLM clients per profile with a global concurrency bound.
+
+    Building an LlmChat means re-validating the model config and, on the
+    first call, opening a fresh provider connection. Keeping configured
+    clients around lets consecutive requests reuse them (and the keep-alive
+    connections underneath). A client is only returned to the pool when its
+    conversation history can be reset, so requests never see each other's
+    turns.
+    """
+
+    def __init__(self, factory: Callable[[LlmProfile], Any], max_concurrency: int = 16, max_idle: int = 8):
+        self.factory = factory
+        self.max_concurrency = max_concurrency
+        self.max_idle = max_idle
+        self.profiles: Dict[str, LlmProfile] = {}
+        self._stats: Dict[str, _ProfileStats] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def register(self, name: str, system_message: str, max_tokens: int = 4096, priority: int = 1) -> LlmProfile:
+        profile = LlmProfile(name, system_message, max_tokens, priority)
+        self.profiles[name] = profile
+        self._stats.setdefault(name, _ProfileStats())
+        return profile
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one unit of the concurrency limit without checking out a client"""
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - start
+        self.acquired += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.in_use += 1
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def client(self, profile_name: str):
+        """Check out a configured client for a profile"""
+        profile = self.profiles[profile_name]
+        stats = self._stats[profile_name]
+        async with self.slot():
+            if stats.idle:
+                pooled = stats.idle.pop()
+                stats.reused += 1
+            else:
+                client = self.factory(profile)
+                pooled = _PooledClient(client, _history(client))
+                stats.created += 1
+
+            healthy = False
+            try:
+                yield pooled.client
+                healthy = True
+            finally:
+                pooled.uses += 1
+                if healthy and len(stats.idle) < self.max_idle and _reset_history(pooled):
+                    stats.idle.append(pooled)
+                else:
+                    stats.discarded += 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "wait_ms_avg": round(self.wait_seconds_total * 1000 / self.acquired, 3) if self.acquired else 0.0,
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            "profiles": {
+                name: {
+                    "created": s.created,
+                    "reused": s.reused,
+                    "discarded": s.discarded,
+                    "idle": len(s.idle),
+                }
+                for name, s in self._stats.items()
+            },
+        }
+
+
+def _history(client):
+    messages = getattr(client, "messages", None)
+    return list(messages) if isinstance(messages, list) else None
+
+
+def _reset_history(pooled: _PooledClient) -> bool:
+    """Put the client's conversation back to how it was created; False if that is not possible"""
+    messages = getattr(pooled.client, "messages", None)
+    if pooled.initial_messages is None or not isinstance(messages, list):
+        return False
+    messages[:] = pooled.initial_messages
+    return True
@@ -0,0 +1,309 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# Minimal Prometheus text-format metrics. Recording a sample is a dict lookup
+# and an addition under a per-metric lock (Mongo command events arrive on
+# driver threads); formatting only happens when /metrics is scraped.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def total(self) -> float:
+        """Sum over all label values"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, labels)} {_number(value)}" for labels, value in values]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    @contextmanager
+    def track(self, *labels):
+        """Count the block as in progress while it runs"""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, *labels, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - start)
+
+    def count(self, *labels) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = []
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Callback(_Metric):
+    """Values read from elsewhere (e.g. a stats() dict) when scraped.
+
+    read() returns {label values tuple: value}.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str], read: Callable[[], Dict[tuple, float]],
+                 type: str = "gauge"):
+        super().__init__(name, documentation, labels)
+        self.type = type
+        self.read = read
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, labels)} {_number(value)}" for labels, value in self.read().items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name: str, documentation: str, labels: Iterable[str], read: Callable[[], Dict[tuple, float]],
+                 type: str = "gauge") -> Callback:
+        return self.register(Callback(name, documentation, labels, read, type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception:
+                # A failing stats source must not take the whole scrape down
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.counter("http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+http_request_seconds = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route", ["method", "route"])
+http_in_flight = REGISTRY.gauge("http_requests_in_flight", "HTTP requests being served, open event streams excluded")
+http_streams_open = REGISTRY.gauge("http_streams_open", "Long-lived event streams connected")
+mongo_command_seconds = REGISTRY.histogram("mongo_command_duration_seconds", "MongoDB command latency by collection",
+                                           ["collection", "command"])
+mongo_connections_in_use = REGISTRY.gauge("mongo_connections_in_use", "MongoDB connections checked out", ["address"])
+mongo_checkouts_waiting = REGISTRY.gauge("mongo_connection_checkouts_waiting", "Operations waiting for a MongoDB connection",
+                                         ["address"])
+mongo_command_failures = REGISTRY.counter("mongo_command_failures_total", "Failed MongoDB commands by collection",
+                                          ["collection", "command"])
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template.
+
+    Requests are labelled with the matched route's path (/api/notes/{note_id}),
+    not the raw URL, so the number of series stays bounded. Requests to the
+    streaming paths stay open until the client leaves, so they are counted
+    in http_streams_open instead of http_requests_in_flight.
+    """
+
+    def __init__(self, app, excluded: Iterable[str] = ("/metrics",), streaming: Iterable[str] = ()):
+        self.app = app
+        self.excluded = set(excluded)
+        self.streaming = set(streaming)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded:
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        open_requests = http_streams_open if scope["path"] in self.streaming else http_in_flight
+        open_requests.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            open_requests.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(scope["method"], path, str(status[0]))
+            http_request_seconds.observe(scope["method"], path, value=elapsed)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per-collection latency of every command the driver sends"""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[int, int], str] = {}
+
+    def started(self, event):
+        # {"find": "notes", ...}; getMore names the cursor first and the collection after
+        collection = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        if isinstance(collection, str):
+            self._collections[(event.request_id, event.operation_id)] = collection
+
+    def _finish(self, event) -> Optional[str]:
+        return self._collections.pop((event.request_id, event.operation_id), None)
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            mongo_command_seconds.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            mongo_command_seconds.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+            mongo_command_failures.inc(collection, event.command_name)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connections in use and checkouts waiting, per server"""
+
+    def connection_check_out_started(self, event):
+        mongo_checkouts_waiting.inc(str(event.address))
+
+    def connection_check_out_failed(self, event):
+        mongo_checkouts_waiting.dec(str(event.address))
+
+    def connection_checked_out(self, event):
+        mongo_checkouts_waiting.dec(str(event.address))
+        mongo_connections_in_use.inc(str(event.address))
+
+    def connection_checked_in(self, event):
+        mongo_connections_in_use.dec(str(event.address))
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
@@ -0,0 +1,66 @@
+import base64
+from typing import List, Optional, Tuple
+
+from bson import json_util
+
+# Keyset ("seek") pagination helpers. A cursor holds the sort-key values of
+# the last document on a page; the next page is everything strictly after it
+# in sort order, so Mongo can walk the index instead of skipping documents.
+
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(document: dict, sort: List[Tuple[str, int]]) -> str:
+    values = [document[field] for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, sort: List[Tuple[str, int]]) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def keyset_filter(values: list, sort: List[Tuple[str, int]]) -> dict:
+    """Filter matching documents that come after values in the given sort order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$lt" if direction < 0 else "$gt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def apply_cursor(query: dict, cursor: Optional[str], sort: List[Tuple[str, int]]) -> dict:
+    if not cursor:
+        return query
+    seek = keyset_filter(decode_cursor(cursor, sort), sort)
+    return {"$and": [query, seek]} if query else seek
+
+
+def build_projection(fields: Optional[str], allowed: List[str], required: List[str]) -> Tuple[Optional[dict], List[str]]:
+    """Parse a comma-separated fields= parameter.
+
+    Returns the Mongo projection (None for all fields) and the list of fields
+    to return. Fields needed for the cursor are always fetched.
+    """
+    if not fields:
+        return None, allowed
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    selected = [f for f in allowed if f in requested or f == "id"]
+    projection = {f: 1 for f in set(selected) | set(required)}
+    projection["_id"] = 0
+    return projection, selected
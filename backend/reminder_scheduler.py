@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def due_timestamp(date) -> float:
+    """Reminder dates are stored as naive local datetimes, like datetime.now()"""
+    if isinstance(date, str):
+        date = datetime.fromisoformat(date)
+    return date.timestamp()
+
+
+class ReminderScheduler:
+    """Fires pending reminders when they come due.
+
+    Pending reminders live in a min-heap keyed on their due time, so
+    scheduling, cancelling and firing cost O(log n) however many reminders
+    are pending, and the background task only wakes up for the next one
+    due. Cancelled or rescheduled entries are skipped lazily and the heap is
+    compacted when they outnumber the live ones.
+    """
+
+    def __init__(self, on_due: Callable[[dict], None], clock: Callable[[], float] = time.time):
+        self.on_due = on_due
+        self.clock = clock
+        self._heap = []
+        self._entries: Dict[str, Tuple[float, int]] = {}
+        self._payloads: Dict[str, dict] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.fired = 0
+        self.lag_seconds_total = 0.0
+        self.lag_seconds_max = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def schedule(self, reminder: dict):
+        """Add or move a reminder; it needs id and date"""
+        due = due_timestamp(reminder["date"])
+        entry = (due, next(self._seq))
+        self._entries[reminder["id"]] = entry
+        self._payloads[reminder["id"]] = reminder
+        heapq.heappush(self._heap, (*entry, reminder["id"]))
+        if self._heap[0][1] == entry[1]:
+            # New earliest reminder: the runner may be sleeping past it
+            self._wakeup.set()
+        self._maybe_compact()
+
+    def load(self, reminders: Iterable[dict]):
+        """Bulk-load reminders (e.g. at startup) in O(n)"""
+        for reminder in reminders:
+            entry = (due_timestamp(reminder["date"]), next(self._seq))
+            self._entries[reminder["id"]] = entry
+            self._payloads[reminder["id"]] = reminder
+            self._heap.append((*entry, reminder["id"]))
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def cancel(self, reminder_id: str) -> bool:
+        self._payloads.pop(reminder_id, None)
+        if self._entries.pop(reminder_id, None) is None:
+            return False
+        self._maybe_compact()
+        return True
+
+    def _maybe_compact(self):
+        if len(self._heap) <= 2 * len(self._entries) + 1024:
+            return
+        self._heap = [(due, seq, rid) for rid, (due, seq) in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def _peek(self) -> Optional[Tuple[float, int, str]]:
+        while self._heap:
+            due, seq, reminder_id = self._heap[0]
+            if self._entries.get(reminder_id) == (due, seq):
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def fire_due(self) -> float:
+        """Fire everything due now; returns seconds until the next reminder (or None)"""
+        while True:
+            head = self._peek()
+            if head is None:
+                return None
+            due, _, reminder_id = head
+            now = self.clock()
+            if due > now:
+                return due - now
+            heapq.heappop(self._heap)
+            del self._entries[reminder_id]
+            payload = self._payloads.pop(reminder_id)
+
+            lag = now - due
+            self.fired += 1
+            self.lag_seconds_total += lag
+            self.lag_seconds_max = max(self.lag_seconds_max, lag)
+            try:
+                self.on_due(payload)
+            except Exception as e:
+                logger.warning("Reminder %s due handler failed: %s", reminder_id, e)
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            delay = self.fire_due()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        head = self._peek()
+        return {
+            "pending": len(self._entries),
+            "heap_size": len(self._heap),
+            "next_due_in_seconds": round(head[0] - self.clock(), 3) if head else None,
+            "fired": self.fired,
+            "lag_ms_avg": round(self.lag_seconds_total * 1000 / self.fired, 3) if self.fired else 0.0,
+            "lag_ms_max": round(self.lag_seconds_max * 1000, 3),
+        }
@@ -0,0 +1,207 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+# Substrings of provider errors that mean "slow down" rather than "bad request"
+OVERLOAD_MARKERS = ("429", "503", "rate limit", "ratelimit", "quota", "resource_exhausted", "overloaded")
+
+
+class LlmOverloaded(Exception):
+    """Raised instead of queueing a call that would not start before its deadline"""
+
+    def __init__(self, retry_after: float, reason: str = "LLM capacity exhausted"):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def is_overload_error(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, LlmOverloaded)):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in OVERLOAD_MARKERS)
+
+
+class LlmScheduler:
+    """Admission control for outbound LLM calls.
+
+    Calls start when both a token-bucket rate limit and an adaptive
+    concurrency window allow it. The window grows by one per window's worth
+    of successful calls and halves when the provider signals overload
+    (AIMD). Waiting calls are served by
+    priority (lower first), then FIFO. A call whose estimated wait exceeds
+    its deadline, or that reaches its deadline while queued, is rejected
+    with LlmOverloaded so the API can answer 429 + Retry-After right away.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 20, initial_limit: int = 8, min_limit: int = 1,
+                 max_limit: int = 64, max_queue: int = 256, timeout: float = 20.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.clock = clock
+
+        self.tokens = float(burst)
+        self._refilled_at = clock()
+        self.in_flight = 0
+        self.avg_latency = 1.0
+        self._last_decrease = float("-inf")
+        self._queue = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = 0
+        self.shed = 0
+        self.expired = 0
+        self.completed = 0
+        self.overloads = 0
+        self.decreases = 0
+
+    # Token bucket
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _can_start(self) -> bool:
+        self._refill()
+        return self.in_flight < int(self.limit) and self.tokens >= 1
+
+    def _start(self):
+        self.tokens -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    # Queue
+
+    def queued(self, priority: Optional[int] = None) -> int:
+        return sum(
+            1 for p, _, fut in self._queue
+            if not fut.done() and (priority is None or p <= priority)
+        )
+
+    def estimated_wait(self, priority: int) -> float:
+        """Seconds until a new call at this priority would likely start"""
+        ahead = self.queued(priority)
+        if ahead == 0 and self._can_start():
+            return 0.0
+        throughput = min(self.rate, max(int(self.limit), 1) / max(self.avg_latency, 1e-3))
+        token_wait = max(0.0, 1 - self.tokens) / self.rate
+        return max((ahead + 1) / throughput, token_wait)
+
+    def check(self, priority: int = 1, timeout: Optional[float] = None):
+        """Raise LlmOverloaded if a call at this priority should be shed now"""
+        timeout = self.timeout if timeout is None else timeout
+        if self.queued() >= self.max_queue:
+            self.shed += 1
+            raise LlmOverloaded(self.estimated_wait(priority), "LLM queue is full")
+        wait = self.estimated_wait(priority)
+        if wait > timeout:
+            self.shed += 1
+            raise LlmOverloaded(wait, "LLM is busy")
+
+    def _dispatch(self):
+        self._timer = None
+        while self._queue:
+            _, _, fut = self._queue[0]
+            if fut.done():
+                heapq.heappop(self._queue)
+                continue
+            if self.in_flight >= int(self.limit):
+                return
+            self._refill()
+            if self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            self._start()
+            fut.set_result(None)
+
+    def _wake(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    # AIMD
+
+    def _finish(self, started_at: float, error: Optional[BaseException]):
+        self.in_flight -= 1
+        latency = self.clock() - started_at
+        if error is None:
+            self.completed += 1
+            self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif is_overload_error(error):
+            self.overloads += 1
+            # Calls already in flight when we backed off don't count again (like TCP, once per round)
+            if started_at >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = self.clock()
+                self.decreases += 1
+        self._wake()
+
+    @asynccontextmanager
+    async def admit(self, priority: int = 1, timeout: Optional[float] = None):
+        """Wait for permission to make one LLM call"""
+        timeout = self.timeout if timeout is None else timeout
+        if self.queued() == 0 and self._can_start():
+            self._start()
+        else:
+            self.check(priority, timeout)
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (priority, next(self._seq), fut))
+            self._wake()
+            try:
+                await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                self.expired += 1
+                raise LlmOverloaded(self.estimated_wait(priority), "Timed out waiting for the LLM")
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # Granted a slot just as the caller went away
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+
+        started_at = self.clock()
+        try:
+            yield
+        except BaseException as e:
+            self._finish(started_at, e)
+            if is_overload_error(e) and not isinstance(e, LlmOverloaded):
+                raise LlmOverloaded(self.avg_latency, "LLM provider is rate limiting") from e
+            raise
+        else:
+            self._finish(started_at, None)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued(),
+            "tokens": round(self.tokens, 2),
+            "rate_per_second": self.rate,
+            "avg_latency_ms": round(self.avg_latency * 1000, 1),
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "shed": self.shed,
+            "expired": self.expired,
+            "overloads": self.overloads,
+            "decreases": self.decreases,
+        }
@@ -1,20 +1,71 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from typing import Optional, List
 import os
 import json
 import uuid
-from pymongo import MongoClient
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import asyncio
+import logging
+import time
+import zlib
 from dotenv import load_dotenv
+from database import (
+    db,
+    chats_repo,
+    chats_archive_repo,
+    notes_repo,
+    reminders_repo,
+    sessions_repo,
+    searches_repo,
+    code_analyses_repo,
+    code_blobs_repo,
+    tombstones_repo,
+    TOMBSTONE_TTL_SECONDS,
+    backfill_updated_at,
+    backfill_session_aggregates,
+    ensure_indexes,
+    missing_indexes,
+    ping,
+    pool_usage,
+    close_client,
+)
+from intent import classify_intent
+from cache import TTLCache, TwoTierCache, SnapshotCache, SingleFlight, normalize_query, query_hash, content_hash
+from dashboard import fetch_dashboard_data
+from sessions import SessionStore
+from pagination import MAX_PAGE_SIZE, InvalidCursor, apply_cursor, build_projection, encode_cursor, keyset_filter
+from backup import InvalidImport, export_chunks, gzip_chunks, import_lines, ndjson_lines, parse_collections, upsert_operation
+from bulk import (
+    BULK_MAX_ITEMS, delete_operations, insert_operations, item_results, retag_update, summary, unique_ids,
+    update_operations
+)
+from sync import (
+    CHANGES_SORT, SYNC_KINDS, TOMBSTONES_SORT,
+    after as sync_after, decode_sync_cursor, encode_sync_cursor, next_position, oldest_position, tombstone_stream
+)
+from llm import LlmClientPool, LlmProfile
+from scheduler import LlmScheduler, LlmOverloaded
+from writebehind import WriteBehindQueue
+from context import ConversationContext, estimate_tokens
+from compaction import ChatCompactor
+from textindex import SEARCHABLE, TextIndex
+from embeddings import EMBEDDED, VectorIndex
+from events import EventBus
+from reminder_scheduler import ReminderScheduler, due_timestamp
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware, http_in_flight, http_streams_open
+from health import DEGRADED, HealthChecker, ProbeFailed
+from streaming import SSE_HEADERS, sse_event, stream_completion, streaming_available, relay_stream, text_stream
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 # CORS Configuration
@@ -24,24 +75,125 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# MongoDB Connection
-MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
-client = MongoClient(MONGO_URL)
-db = client.ai_assistant
-
-# Collections
-chats_collection = db.chats
-notes_collection = db.notes
-reminders_collection = db.reminders
-sessions_collection = db.sessions
-searches_collection = db.searches
-code_analyses_collection = db.code_analyses
+# Request counts and latency per route, served at /metrics. The change event
+# streams stay open indefinitely and are counted apart from in-flight requests
+EVENT_STREAM_PATHS = ("/api/events", "/api/reminders/due/stream")
+app.add_middleware(MetricsMiddleware, streaming=EVENT_STREAM_PATHS)
 
 # Google Gemini Configuration
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
+# LLM client pool configuration
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '16'))
+LLM_POOL_MAX_IDLE = int(os.environ.get('LLM_POOL_MAX_IDLE', '8'))
+
+# LLM scheduler configuration (provider rate limit, adaptive concurrency, queueing)
+LLM_RATE_PER_SECOND = float(os.environ.get('LLM_RATE_PER_SECOND', '10'))
+LLM_RATE_BURST = int(os.environ.get('LLM_RATE_BURST', '20'))
+LLM_CONCURRENCY_INITIAL = int(os.environ.get('LLM_CONCURRENCY_INITIAL', '8'))
+LLM_CONCURRENCY_MIN = int(os.environ.get('LLM_CONCURRENCY_MIN', '1'))
+LLM_QUEUE_MAX = int(os.environ.get('LLM_QUEUE_MAX', '256'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '20'))
+
+# Search cache configuration
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', '1000'))
+SEARCH_CACHE_TTL_SECONDS = int(os.environ.get('SEARCH_CACHE_TTL_SECONDS', '3600'))
+
+# Code analysis cache configuration
+CODE_CACHE_MAX_ENTRIES = int(os.environ.get('CODE_CACHE_MAX_ENTRIES', '500'))
+CODE_CACHE_TTL_SECONDS = int(os.environ.get('CODE_CACHE_TTL_SECONDS', '86400'))
+
+# Conversation context configuration
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', '2000'))
+CHAT_CONTEXT_MAX_TURNS = int(os.environ.get('CHAT_CONTEXT_MAX_TURNS', '10'))
+CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', '400'))
+# Turns that must have left the context window before they are summarized
+CHAT_SUMMARY_MIN_TURNS = int(os.environ.get('CHAT_SUMMARY_MIN_TURNS', '10'))
+
+# Chat history: page size, and turns kept live per session before older
+# (already summarized) ones move to chats_archive
+CHAT_HISTORY_PAGE_SIZE = int(os.environ.get('CHAT_HISTORY_PAGE_SIZE', '50'))
+CHAT_RETENTION_TURNS = int(os.environ.get('CHAT_RETENTION_TURNS', '200'))
+CHAT_COMPACTION_INTERVAL_SECONDS = int(os.environ.get('CHAT_COMPACTION_INTERVAL_SECONDS', '300'))
+
+# Session ids remembered in-process, so resolving a known session skips Mongo
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+SESSION_LIST_PAGE_SIZE = int(os.environ.get('SESSION_LIST_PAGE_SIZE', '50'))
+
+# Notes/reminders retrieved into the chat prompt
+RAG_TOP_K = int(os.environ.get('RAG_TOP_K', '3'))
+RAG_MIN_SCORE = float(os.environ.get('RAG_MIN_SCORE', '0.2'))
+
+# Reminder due notifications: reminders missed by up to REMINDER_CATCHUP_SECONDS
+# (e.g. while the server was down) still fire once on startup
+REMINDER_CATCHUP_SECONDS = int(os.environ.get('REMINDER_CATCHUP_SECONDS', '3600'))
+
+# Change events pushed to clients; the last EVENT_HISTORY_SIZE can be replayed on reconnect
+EVENT_HISTORY_SIZE = int(os.environ.get('EVENT_HISTORY_SIZE', '1000'))
+EVENT_STREAM_KEEPALIVE_SECONDS = int(os.environ.get('EVENT_STREAM_KEEPALIVE_SECONDS', '15'))
+
+# Readiness probes run at most every HEALTH_PROBE_TTL_SECONDS however often they are polled;
+# a Mongo round-trip slower than HEALTH_MONGO_BUDGET_MS is reported as degraded
+HEALTH_PROBE_TTL_SECONDS = float(os.environ.get('HEALTH_PROBE_TTL_SECONDS', '5'))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_PROBE_TIMEOUT_SECONDS', '2'))
+HEALTH_MONGO_BUDGET_MS = float(os.environ.get('HEALTH_MONGO_BUDGET_MS', '100'))
+# Draining requires this token in X-Drain-Token; without one it is only accepted from localhost
+DRAIN_TOKEN = os.environ.get('DRAIN_TOKEN')
+
+# Dashboard snapshot, rebuilt after writes or at most every DASHBOARD_CACHE_TTL_SECONDS
+DASHBOARD_CACHE_TTL_SECONDS = int(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', '30'))
+dashboard_cache = SnapshotCache(ttl=DASHBOARD_CACHE_TTL_SECONDS)
+
+# Write-behind configuration for chat, search and code analysis history
+WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE', '500'))
+WRITE_QUEUE_MAX_PENDING = int(os.environ.get('WRITE_QUEUE_MAX_PENDING', '10000'))
+WRITE_FLUSH_INTERVAL_MS = int(os.environ.get('WRITE_FLUSH_INTERVAL_MS', '50'))
+
+# History writes are persisted after the response goes out; the dashboard is refreshed once they land
+write_queue = WriteBehindQueue(
+    max_batch=WRITE_BATCH_SIZE,
+    max_pending=WRITE_QUEUE_MAX_PENDING,
+    flush_interval=WRITE_FLUSH_INTERVAL_MS / 1000,
+    on_flush=dashboard_cache.invalidate
+)
+
+INTENT_SYSTEM_MESSAGE = """Você é um analisador de intenções especializado. Analise a mensagem do usuário e determine se ele está pedindo para:
+1. Criar uma nota (palavras-chave: nota, anotar, escrever, salvar, guardar, lembrar disso, anote que)
+2. Criar um lembrete (palavras-chave: lembrete, lembrar, agendar, compromisso, tarefa, fazer, me lembre)
+3. Apenas conversar normalmente
+
+IMPORTANTE: Para lembretes, extraia corretamente a data e hora. Se disser "amanhã", use a data de amanhã. Se disser "15h" ou "3pm", use esse horário.
+
+Responda EXATAMENTE em um destes formatos:
+- Se for para criar nota: CRIAR_NOTA|título|conteúdo|categoria
+- Se for para criar lembrete: CRIAR_LEMBRETE|título|descrição|data_hora|prioridade
+- Se for conversa normal: CONVERSAR
+
+Para lembretes, a data_hora deve considerar:
+- "amanhã" = próximo dia
+- "depois de amanhã" = 2 dias
+- "15h" = 15:00 de amanhã se não especificar dia
+- "sexta" = próxima sexta-feira
+
+Para categoria use: general, work, personal, study
+Para prioridade use: low, medium, high
+
+Exemplos:
+- "Anote que preciso comprar leite" -> CRIAR_NOTA|Compras|Preciso comprar leite|personal
+- "Me lembre de ligar para o médico amanhã às 15h" -> CRIAR_LEMBRETE|Ligar médico|Ligar para o médico|AMANHA_15H|medium
+- "Lembrete para fazer exercícios" -> CRIAR_LEMBRETE|Exercícios|Fazer exercícios|AMANHA_10H|medium"""
+
+CHAT_SYSTEM_MESSAGE = "Você é um assistente pessoal de IA avançado e inteligente. Você pode ajudar com pesquisas, análises, desenvolvimento de código, organização de tarefas e muito mais. Seja prestativo, criativo e amigável. Responda sempre em português brasileiro. Se o usuário pedir para criar notas ou lembretes, oriente-o a usar comandos claros como 'crie uma nota sobre...' ou 'me lembre de...'."
+
+SEARCH_SYSTEM_MESSAGE = "Você é um assistente especializado em pesquisas. Forneça respostas precisas, detalhadas e bem estruturadas sobre qualquer tópico pesquisado. Responda sempre em português brasileiro."
+
+CODE_SYSTEM_MESSAGE = "Você é um especialista em desenvolvimento de software. Analise código, identifique problemas, sugira melhorias, forneça explicações detalhadas e GERE CÓDIGO quando solicitado. Responda sempre em português brasileiro."
+
+SUMMARY_SYSTEM_MESSAGE = "Você resume conversas entre um usuário e um assistente pessoal. Mantenha fatos, preferências, decisões e pendências que possam ser úteis mais tarde, de forma concisa. Responda sempre em português brasileiro."
+
 # Pydantic Models
 class ChatMessage(BaseModel):
     message: str
@@ -80,268 +232,893 @@ class ReminderResponse(BaseModel):
     date: datetime
     priority: str
     created_at: datetime
+    updated_at: Optional[datetime] = None
     completed: bool
 
 class SearchQuery(BaseModel):
     query: str
     type: Optional[str] = "general"
+    bypass_cache: Optional[bool] = False
 
 class CodeAnalysis(BaseModel):
     code: str
     language: Optional[str] = "python"
     task: Optional[str] = "analyze"
     description: Optional[str] = ""
+    bypass_cache: Optional[bool] = False
+
+class BulkNotes(BaseModel):
+    notes: List[Note]
+
+class BulkReminders(BaseModel):
+    reminders: List[Reminder]
+
+class BulkIds(BaseModel):
+    ids: List[str]
+
+class BulkRetag(BaseModel):
+    ids: List[str]
+    add: Optional[List[str]] = []
+    remove: Optional[List[str]] = []
+
+# Gemini clients are pooled per system-prompt profile and reused across requests
+def create_llm_chat(profile: LlmProfile):
+    return LlmChat(
+        api_key=GEMINI_API_KEY,
+        session_id=str(uuid.uuid4()),
+        system_message=profile.system_message
+    ).with_model("gemini", "gemini-2.0-flash").with_max_tokens(profile.max_tokens)
+
+llm_pool = LlmClientPool(create_llm_chat, max_concurrency=LLM_MAX_CONCURRENCY, max_idle=LLM_POOL_MAX_IDLE)
+# Interactive chat goes first when calls queue; background summaries go last
+llm_pool.register("intent", INTENT_SYSTEM_MESSAGE, max_tokens=200, priority=0)
+llm_pool.register("chat", CHAT_SYSTEM_MESSAGE, priority=0)
+llm_pool.register("search", SEARCH_SYSTEM_MESSAGE, priority=1)
+llm_pool.register("code", CODE_SYSTEM_MESSAGE, priority=1)
+llm_pool.register("summary", SUMMARY_SYSTEM_MESSAGE, max_tokens=CHAT_SUMMARY_MAX_TOKENS, priority=2)
+
+llm_scheduler = LlmScheduler(
+    rate=LLM_RATE_PER_SECOND,
+    burst=LLM_RATE_BURST,
+    initial_limit=min(LLM_CONCURRENCY_INITIAL, LLM_MAX_CONCURRENCY),
+    min_limit=LLM_CONCURRENCY_MIN,
+    max_limit=LLM_MAX_CONCURRENCY,
+    max_queue=LLM_QUEUE_MAX,
+    timeout=LLM_QUEUE_TIMEOUT_SECONDS
+)
+
+# Identical concurrent prompts for the same profile share one Gemini call
+llm_flight = SingleFlight()
+
+llm_request_seconds = REGISTRY.histogram("llm_request_duration_seconds", "Gemini call latency by profile, queueing included", ["profile"])
+# The provider does not report usage, so tokens are estimated from text length
+llm_tokens = REGISTRY.counter("llm_tokens_total", "Estimated LLM tokens by profile", ["profile", "kind"])
+chat_stage_seconds = REGISTRY.histogram("chat_stage_duration_seconds", "Time spent in each stage of a chat request", ["stage"])
+
+def record_llm_tokens(profile_name: str, prompt: str, completion: str):
+    llm_tokens.inc(profile_name, "prompt", amount=estimate_tokens(prompt))
+    llm_tokens.inc(profile_name, "completion", amount=estimate_tokens(completion))
+
+async def ask_llm(profile_name: str, prompt: str, key: Optional[str] = None) -> str:
+    async def send():
+        with llm_request_seconds.time(profile_name):
+            async with llm_scheduler.admit(llm_pool.profiles[profile_name].priority):
+                async with llm_pool.client(profile_name) as chat:
+                    reply = await chat.send_message(UserMessage(text=prompt))
+        record_llm_tokens(profile_name, prompt, reply)
+        return reply
+    
+    return await llm_flight.do(key or content_hash(profile_name, prompt), send)
+
+async def summarize_turns(previous_summary: str, turns: List[dict]) -> str:
+    conversation = "\n".join(f"Usuário: {t['message']}\nAssistente: {t['response']}" for t in turns)
+    prompt = f"Resumo atual:\n{previous_summary or '(vazio)'}\n\nNovas mensagens:\n{conversation}\n\nAtualize o resumo incorporando as novas mensagens."
+    return await ask_llm("summary", prompt)
+
+# Pooled clients are stateless, so conversation context travels in the prompt
+chat_context = ConversationContext(
+    chats_repo,
+    sessions_repo,
+    summarize_turns,
+    token_budget=CHAT_CONTEXT_TOKEN_BUDGET,
+    max_turns=CHAT_CONTEXT_MAX_TURNS,
+    summary_min_turns=CHAT_SUMMARY_MIN_TURNS
+)
+
+session_store = SessionStore(sessions_repo, max_cached=SESSION_CACHE_SIZE, write_queue=write_queue)
+
+chat_compactor = ChatCompactor(
+    chats_repo,
+    chats_archive_repo,
+    sessions_repo,
+    chat_context,
+    retention_turns=CHAT_RETENTION_TURNS,
+    interval=CHAT_COMPACTION_INTERVAL_SECONDS
+)
+
+async def recent_turns(session_id: str) -> List[dict]:
+    """Last turns of a session, oldest first"""
+    history = await chats_repo.find(
+        {"session_id": session_id},
+        sort=[("timestamp", -1)],
+        limit=CHAT_CONTEXT_MAX_TURNS,
+        projection={"message": 1, "response": 1, "timestamp": 1}
+    )
+    return list(reversed(history))
+
+NOTE_FIELDS = ["id", "title", "content", "category", "tags", "created_at", "updated_at", "completed"]
+REMINDER_FIELDS = ["id", "title", "description", "date", "priority", "created_at", "updated_at", "completed"]
+SESSION_FIELDS = ["session_id", "title", "last_message", "last_response", "turn_count", "last_activity", "created_at"]
+
+NOTES_SORT = [("created_at", -1), ("id", -1)]
+REMINDERS_SORT = [("date", 1), ("id", 1)]
+SESSIONS_SORT = [("last_activity", -1), ("session_id", -1)]
+
+FIND_MAX_LIMIT = 100
+
+# Full-text index behind /api/find and the embedding index the chat retrieves
+# notes and reminders from, both kept up to date by the write endpoints
+find_index = TextIndex()
+note_vectors = VectorIndex()
+
+FIND_REPOS = {
+    "note": notes_repo,
+    "reminder": reminders_repo,
+    "search": searches_repo,
+    "code": code_analyses_repo,
+}
+
+def index_document(kind: str, document: dict):
+    find_index.add(kind, document)
+    if kind in EMBEDDED:
+        note_vectors.add(kind, document)
+
+def index_documents(kind: str, documents: List[dict]):
+    find_index.add_many(kind, documents)
+    if kind in EMBEDDED:
+        note_vectors.add_many(kind, documents)
+
+def unindex_document(kind: str, doc_id: str):
+    find_index.remove(kind, doc_id)
+    if kind in EMBEDDED:
+        note_vectors.remove(kind, doc_id)
+
+async def load_indexes():
+    try:
+        for kind, spec in SEARCHABLE.items():
+            projection = {field: 1 for field in ["id", "date", *spec["fields"]]}
+            # Indexed as the cursor reads them, so a large collection is never held in memory at once
+            async for batch in FIND_REPOS[kind].find_batches({"id": {"$exists": True}}, projection=projection):
+                find_index.add_many(kind, batch)
+                if kind in EMBEDDED:
+                    note_vectors.add_many(kind, batch)
+                await asyncio.sleep(0)  # keep serving requests while indexing
+        find_index.ready = note_vectors.ready = True
+        logger.info("Indexes loaded: find %s, vectors %s", find_index.stats(), note_vectors.stats())
+    except Exception as e:
+        # Both indexes still cover everything written from now on
+        logger.warning("Could not load search indexes: %s", e)
+
+# Every change to notes, reminders and activity is published on the event bus
+# and pushed to /api/events, so clients can patch their lists instead of reloading them
+event_bus = EventBus(history=EVENT_HISTORY_SIZE)
+
+def publish_change(event_type: str, data: dict):
+    # Inserted documents carry Mongo's _id, which is not part of the API
+    return event_bus.publish(event_type, jsonable_encoder({k: v for k, v in data.items() if k != "_id"}))
+
+# Pending reminders fire from memory as reminder.due events
+REMINDER_DUE_FIELDS = ["id", "title", "description", "date", "priority"]
+
+def reminder_due(reminder: dict):
+    publish_change("reminder.due", reminder)
+
+reminder_scheduler = ReminderScheduler(on_due=reminder_due)
+
+def schedule_reminder(reminder: dict):
+    if due_timestamp(reminder["date"]) >= time.time() - REMINDER_CATCHUP_SECONDS:
+        reminder_scheduler.schedule({field: reminder.get(field) for field in REMINDER_DUE_FIELDS})
+    else:
+        reminder_scheduler.cancel(reminder["id"])
+
+async def load_pending_reminders():
+    try:
+        reminders = await reminders_repo.find(
+            {"completed": False, "date": {"$gte": datetime.now() - timedelta(seconds=REMINDER_CATCHUP_SECONDS)}},
+            projection={field: 1 for field in REMINDER_DUE_FIELDS}
+        )
+        reminder_scheduler.load(reminders)
+        logger.info("Reminder scheduler loaded: %s", reminder_scheduler.stats())
+    except Exception as e:
+        # Reminders created from now on are still scheduled
+        logger.warning("Could not load pending reminders: %s", e)
+
+def relevant_notes(message: str) -> List[str]:
+    """Snippets of the user's notes and reminders closest to the message"""
+    return [hit["snippet"] for hit in note_vectors.search(message, k=RAG_TOP_K, min_score=RAG_MIN_SCORE)]
 
 # Helper Functions
-def get_or_create_session(session_id: str = None):
+async def get_or_create_session(session_id: str = None, first_message: str = ""):
     if not session_id:
         session_id = str(uuid.uuid4())
     
-    session = sessions_collection.find_one({"session_id": session_id})
-    if not session:
-        session = {
-            "session_id": session_id,
-            "created_at": datetime.now(),
-            "messages": []
-        }
-        sessions_collection.insert_one(session)
-    
-    return session_id
+    return await session_store.resolve(session_id, first_message)
 
-def save_message(session_id: str, message: str, response: str):
-    chats_collection.insert_one({
+async def save_message(session_id: str, message: str, response: str):
+    chat_data = {
         "session_id": session_id,
         "message": message,
         "response": response,
         "timestamp": datetime.now()
-    })
+    }
+    await write_queue.put(chats_repo, chat_data)
+    await session_store.record_turn(session_id, message, response, chat_data["timestamp"])
+    chat_compactor.touch(session_id)
+    publish_change("chat.created", {"session_id": session_id, "timestamp": chat_data["timestamp"]})
 
-def save_search(query: str, results: str, search_type: str):
-    searches_collection.insert_one({
+async def save_search(query: str, results: str, search_type: str, answered_at: datetime):
+    # timestamp is when it was asked; answered_at when Gemini produced the answer, kept on cache hits
+    search_data = {
         "id": str(uuid.uuid4()),
         "query": query,
+        "query_hash": query_hash(query),
         "results": results,
         "type": search_type,
-        "timestamp": datetime.now()
-    })
+        "timestamp": datetime.now(),
+        "answered_at": answered_at
+    }
+    await write_queue.put(searches_repo, search_data)
+    index_document("search", search_data)
+    publish_change("search.created", {field: search_data[field] for field in ["id", "query", "type", "timestamp"]})
 
-def save_code_analysis(code: str, language: str, task: str, analysis: str, description: str = ""):
-    code_analyses_collection.insert_one({
-        "id": str(uuid.uuid4()),
+async def record_deletion(kind: str, doc_id: str):
+    """Tombstone for /api/sync"""
+    await tombstones_repo.insert({"id": doc_id, "kind": kind, "deleted_at": datetime.now()})
+
+async def record_deletions(kind: str, doc_ids: List[str]):
+    now = datetime.now()
+    await tombstones_repo.insert_many([{"id": doc_id, "kind": kind, "deleted_at": now} for doc_id in doc_ids])
+
+def parse_list_params(fields: Optional[str], after: Optional[str], limit: Optional[int], allowed: List[str], sort: list):
+    """Validate fields=/after=/limit= before touching the database"""
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    try:
+        projection, selected = build_projection(fields, allowed, [field for field, _ in sort])
+        cursor_query = apply_cursor({}, after, sort)
+    except (ValueError, InvalidCursor) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return projection, selected, cursor_query
+
+def set_next_cursor(response: Response, documents: List[dict], limit: Optional[int], sort: list):
+    if limit and len(documents) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(documents[-1], sort)
+
+def code_cache_key(code: str, language: str, task: str, description: str = "") -> str:
+    return content_hash(code, language, task, description)
+
+async def save_code_analysis(code: str, language: str, task: str, analysis: str, description: str = ""):
+    # The code itself is stored once per distinct snippet and referenced by hash;
+    # a duplicate blob insert is skipped by the unique index on hash
+    code_hash = content_hash(code)
+    await write_queue.put(code_blobs_repo, {
+        "hash": code_hash,
         "code": code,
+        "size": len(code),
+        "created_at": datetime.now()
+    })
+    
+    analysis_data = {
+        "id": str(uuid.uuid4()),
+        "code_hash": code_hash,
+        "cache_key": code_cache_key(code, language, task, description),
         "language": language,
         "task": task,
         "analysis": analysis,
         "description": description,
         "timestamp": datetime.now()
-    })
+    }
+    await write_queue.put(code_analyses_repo, analysis_data)
+    index_document("code", analysis_data)
+    publish_change("code.created", {field: analysis_data[field] for field in ["id", "language", "task", "description", "timestamp"]})
+
+async def delete_unused_code_blob(code_hash: str):
+    """Delete a snippet once no analysis refers to it"""
+    # An analysis of the same snippet may still be queued: write it out before counting
+    await write_queue.flush()
+    if await code_analyses_repo.count({"code_hash": code_hash}) == 0:
+        await code_blobs_repo.delete(code_hash)
+
+async def detect_intent(message: str) -> str:
+    # Settle obvious intents locally; only ambiguous messages go to the intent model
+    with chat_stage_seconds.time("intent_local"):
+        intent_response = classify_intent(message)
+
+    if intent_response is None:
+        # Ask Gemini for intent detection
+        with chat_stage_seconds.time("intent_llm"):
+            intent_response = await ask_llm("intent", message)
+    
+    return intent_response
+
+def parse_reminder_date(date_str: str, message: str) -> datetime:
+    """Reminder date from the intent line, falling back to a time mentioned in the message"""
+    try:
+        # Handle special date strings
+        if "AMANHA" in date_str.upper():
+            tomorrow = datetime.now() + timedelta(days=1)
+            if "15H" in date_str.upper():
+                reminder_date = tomorrow.replace(hour=15, minute=0, second=0, microsecond=0)
+            elif "10H" in date_str.upper():
+                reminder_date = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
+            else:
+                reminder_date = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
+        else:
+            # Try to parse as ISO format first
+            reminder_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    except:
+        try:
+            # Try different common formats using dateutil
+            from dateutil import parser
+            reminder_date = parser.parse(date_str, default=datetime.now() + timedelta(days=1))
+        except:
+            # Final fallback: extract time from original message
+            tomorrow = datetime.now() + timedelta(days=1)
+
+            # Try to extract hour from original message
+            import re
+            time_patterns = [
+                r'(\d{1,2})[h:](\d{2})',  # 15h30, 15:30
+                r'(\d{1,2})h',             # 15h
+                r'às (\d{1,2})',          # às 15
+                r'(\d{1,2}) horas'        # 15 horas
+            ]
+
+            hour, minute = 10, 0  # default
+            for pattern in time_patterns:
+                time_match = re.search(pattern, message.lower())
+                if time_match:
+                    hour = int(time_match.group(1))
+                    minute = int(time_match.group(2)) if len(time_match.groups()) > 1 and time_match.group(2) else 0
+                    break
+
+            # Ensure valid time
+            if 0 <= hour <= 23 and 0 <= minute <= 59:
+                reminder_date = tomorrow.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            else:
+                reminder_date = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
+    
+    return reminder_date
+
+async def run_intent_action(intent_response: str, message: str) -> Optional[str]:
+    """Create the note or reminder requested by the intent line and return the reply, or None for normal conversation"""
+    if intent_response.startswith("CRIAR_NOTA|"):
+        try:
+            parts = intent_response.split("|")
+            if len(parts) >= 4:
+                _, title, content, category = parts[0], parts[1], parts[2], parts[3]
+
+                # Create note
+                note_id = str(uuid.uuid4())
+                note_data = {
+                    "id": note_id,
+                    "title": title,
+                    "content": content,
+                    "category": category,
+                    "tags": [],
+                    "created_at": datetime.now(),
+                    "updated_at": datetime.now(),
+                    "completed": False
+                }
+
+                await notes_repo.insert(note_data)
+                index_document("note", note_data)
+                publish_change("note.created", note_data)
+                dashboard_cache.invalidate()
+
+                response = f"✅ Nota criada com sucesso!\n\n📝 **{title}**\n{content}\n\nCategoria: {category}\n\nVocê pode ver sua nota na seção 'Notas' do menu."
+            else:
+                response = "Entendi que você quer criar uma nota, mas não consegui extrair todas as informações. Pode repetir especificando título e conteúdo?"
+        except Exception as e:
+            response = f"Entendi que você quer criar uma nota, mas houve um erro: {str(e)}. Pode tentar novamente?"
+
+    elif intent_response.startswith("CRIAR_LEMBRETE|"):
+        try:
+            parts = intent_response.split("|")
+            if len(parts) >= 5:
+                _, title, description, date_str, priority = parts[0], parts[1], parts[2], parts[3], parts[4]
+
+                with chat_stage_seconds.time("date_parse"):
+                    reminder_date = parse_reminder_date(date_str, message)
+
+                # Create reminder
+                reminder_id = str(uuid.uuid4())
+                reminder_data = {
+                    "id": reminder_id,
+                    "title": title,
+                    "description": description,
+                    "date": reminder_date,
+                    "priority": priority,
+                    "created_at": datetime.now(),
+                    "updated_at": datetime.now(),
+                    "completed": False
+                }
+
+                await reminders_repo.insert(reminder_data)
+                index_document("reminder", reminder_data)
+                schedule_reminder(reminder_data)
+                publish_change("reminder.created", reminder_data)
+                dashboard_cache.invalidate()
+
+                response = f"⏰ Lembrete criado com sucesso!\n\n📅 **{title}**\n{description}\n\nData: {reminder_date.strftime('%d/%m/%Y às %H:%M')}\nPrioridade: {priority}\n\nVocê pode ver seu lembrete na seção 'Lembretes' do menu."
+            else:
+                response = "Entendi que você quer criar um lembrete, mas não consegui extrair todas as informações. Pode repetir especificando título, descrição e quando quer ser lembrado?"
+        except Exception as e:
+            response = f"Entendi que você quer criar um lembrete, mas houve um erro: {str(e)}. Pode tentar novamente?"
+    else:
+        return None
+    
+    return response
+
+def search_answer_expired(answer: dict) -> bool:
+    return answer["answered_at"] < datetime.now() - timedelta(seconds=SEARCH_CACHE_TTL_SECONDS)
+
+async def find_stored_search(key: str):
+    """Most recent stored answer for a normalized query, if answered within the cache TTL.
+
+    Rows written for cache hits carry the original answered_at, so asking
+    again does not make an old answer look fresh.
+    """
+    stored = await searches_repo.find(
+        {
+            "query_hash": key,
+            "answered_at": {"$gte": datetime.now() - timedelta(seconds=SEARCH_CACHE_TTL_SECONDS)}
+        },
+        sort=[("answered_at", -1)],
+        limit=1,
+        projection={"results": 1, "answered_at": 1}
+    )
+    return {"results": stored[0]["results"], "answered_at": stored[0]["answered_at"]} if stored else None
+
+search_cache = TwoTierCache(
+    TTLCache(max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL_SECONDS),
+    find_stored_search
+)
+
+async def get_cached_search(search_query: SearchQuery) -> Optional[dict]:
+    """{"results", "answered_at"} of a still-fresh answer, or None"""
+    if search_query.bypass_cache:
+        return None
+    key = query_hash(search_query.query)
+    answer = await search_cache.get(key)
+    # An answer promoted from Mongo gets a full memory TTL; it must not outlive its own
+    if answer is not None and search_answer_expired(answer):
+        search_cache.invalidate(key)
+        return None
+    return answer
+
+def cache_search_answer(search_query: SearchQuery, results: str) -> dict:
+    answer = {"results": results, "answered_at": datetime.now()}
+    search_cache.set(query_hash(search_query.query), answer)
+    return answer
+
+async def find_stored_code_analysis(key: str):
+    stored = await code_analyses_repo.find_one({"cache_key": key}, {"analysis": 1})
+    return stored["analysis"] if stored else None
+
+code_cache = TwoTierCache(
+    TTLCache(max_entries=CODE_CACHE_MAX_ENTRIES, ttl=CODE_CACHE_TTL_SECONDS),
+    find_stored_code_analysis
+)
+
+async def record_code_analysis(code_request: CodeAnalysis, analysis: str, cached: bool):
+    """Persist an analysis; a cache hit only refreshes the existing row instead of adding a copy"""
+    key = code_cache_key(code_request.code, code_request.language, code_request.task, code_request.description)
+    if cached:
+        matched = await code_analyses_repo.update_one(
+            {"cache_key": key},
+            {"$set": {"timestamp": datetime.now()}, "$inc": {"hits": 1}}
+        )
+        if matched:
+            dashboard_cache.invalidate()
+            return
+    else:
+        code_cache.set(key, analysis)
+    
+    await save_code_analysis(
+        code_request.code,
+        code_request.language,
+        code_request.task,
+        analysis,
+        code_request.description
+    )
+
+async def get_cached_code_analysis(code_request: CodeAnalysis) -> Optional[str]:
+    if code_request.bypass_cache:
+        return None
+    key = code_cache_key(code_request.code, code_request.language, code_request.task, code_request.description)
+    return await code_cache.get(key)
+
+def build_search_prompt(search_query: SearchQuery) -> str:
+    return f"Pesquise e forneça informações detalhadas sobre: {search_query.query}"
+
+def build_code_prompt(code_request: CodeAnalysis) -> str:
+    if code_request.task == "analyze":
+        prompt = f"Analise este código {code_request.language}:\n\n{code_request.code}\n\nForneça uma análise detalhada incluindo: problemas, melhorias, explicações e sugestões."
+    elif code_request.task == "explain":
+        prompt = f"Explique detalhadamente este código {code_request.language}:\n\n{code_request.code}"
+    elif code_request.task == "improve":
+        prompt = f"Melhore este código {code_request.language} e explique as melhorias:\n\n{code_request.code}"
+    elif code_request.task == "generate":
+        prompt = f"Gere código {code_request.language} para: {code_request.description}\n\nForneça o código completo e funcional com explicações."
+    elif code_request.task == "create":
+        prompt = f"Crie um código {code_request.language} que faça: {code_request.description}\n\nForneça o código completo, bem estruturado e com comentários explicativos."
+    else:
+        # Check if user is asking to generate code based on description
+        if code_request.description and not code_request.code.strip():
+            prompt = f"Crie um código {code_request.language} que faça: {code_request.description}\n\nForneça o código completo, bem estruturado e com comentários explicativos."
+        else:
+            prompt = f"Analise este código {code_request.language}:\n\n{code_request.code}"
+    
+    return prompt
+
+async def stream_reply(profile_name: str, prompt: str):
+    """Token stream for a prompt, falling back to a single pooled completion"""
+    if not streaming_available():
+        yield await ask_llm(profile_name, prompt)
+        return
+    
+    profile = llm_pool.profiles[profile_name]
+    completion = []
+    with llm_request_seconds.time(profile_name):
+        async with llm_scheduler.admit(profile.priority), llm_pool.slot():
+            async for token in stream_completion(profile.system_message, prompt, GEMINI_API_KEY, max_tokens=profile.max_tokens):
+                completion.append(token)
+                yield token
+    record_llm_tokens(profile_name, prompt, "".join(completion))
+
+def check_llm_capacity(profile_name: str):
+    """Shed a stream before it starts if its LLM call could not start in time"""
+    llm_scheduler.check(llm_pool.profiles[profile_name].priority)
+
+def llm_busy(e: LlmOverloaded) -> HTTPException:
+    return HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": e.retry_after_header})
+
+def sse_response(events):
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+def event_id(version: int) -> str:
+    return f"{event_bus.epoch}-{version}"
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    """Version a client has seen from an id like "<epoch>-<version>"; -1 if it is from another epoch"""
+    if not value:
+        return None
+    epoch, _, version = value.rpartition("-")
+    if epoch != event_bus.epoch or not version.isdigit():
+        return -1
+    return int(version)
+
+def format_change(event: dict) -> str:
+    return sse_event(
+        {"version": event["version"], "timestamp": event["timestamp"].isoformat(), "data": event["data"]},
+        event=event["type"],
+        event_id=event_id(event["version"])
+    )
+
+async def event_stream(request: Request, since: Optional[int], types: Optional[set] = None):
+    """Replay events after `since`, then follow the bus until the client goes away.
+
+    The replayed events are followed by "ready" (caught up) or "resync"
+    (events were missed and the client must reload from the REST endpoints).
+    A client too slow to keep up with the live events also gets "resync".
+    When the instance drains the bus is closed and the stream ends with
+    "closing"; the client reconnects with its Last-Event-ID, elsewhere.
+    """
+    async with event_bus.subscribe() as queue:
+        backlog = event_bus.since(since) if since is not None and since >= 0 else None
+        last_version = event_bus.version
+        for event in backlog or []:
+            if types is None or event["type"] in types:
+                yield format_change(event)
+        status = "resync" if since is not None and backlog is None else "ready"
+        yield sse_event({"epoch": event_bus.epoch, "version": last_version}, event=status, event_id=event_id(last_version))
+        
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENT_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                yield sse_event({"epoch": event_bus.epoch, "version": last_version}, event="closing", event_id=event_id(last_version))
+                return
+            if queue.overflowed:
+                # This client fell behind and events were dropped: have it reload, then carry on from here
+                queue.overflowed = False
+                last_version = event_bus.version
+                yield sse_event({"epoch": event_bus.epoch, "version": last_version}, event="resync", event_id=event_id(last_version))
+                continue
+            # Published while the backlog was being read, or covered by a resync
+            if event["version"] <= last_version:
+                continue
+            if types is None or event["type"] in types:
+                yield format_change(event)
+
+def cache_counters(field: str) -> dict:
+    return {(name,): cache.stats()[field] for name, cache in METRIC_CACHES.items()}
+
+def cache_hits() -> dict:
+    return {
+        (name,): stats.get("hits", stats.get("memory_hits", 0) + stats.get("store_hits", 0))
+        for name, stats in ((name, cache.stats()) for name, cache in METRIC_CACHES.items())
+    }
+
+def llm_gauges() -> dict:
+    scheduler, pool = llm_scheduler.stats(), llm_pool.stats()
+    return {("in_flight",): scheduler["in_flight"], ("queued",): scheduler["queued"],
+            ("limit",): scheduler["limit"], ("pool_in_use",): pool["in_use"]}
+
+METRIC_CACHES = {
+    "search": search_cache,
+    "code": code_cache,
+    "dashboard": dashboard_cache,
+    "summary": chat_context.summaries,
+    "session": session_store.known,
+}
+
+REGISTRY.callback("cache_hits_total", "Cache hits", ["cache"], cache_hits, type="counter")
+REGISTRY.callback("cache_misses_total", "Cache misses", ["cache"], lambda: cache_counters("misses"), type="counter")
+REGISTRY.callback("cache_hit_ratio", "Cache hit ratio since startup", ["cache"], lambda: cache_counters("hit_ratio"))
+REGISTRY.callback("llm_requests", "LLM calls running or queued, and the adaptive concurrency limit", ["state"], llm_gauges)
+REGISTRY.callback("write_queue_pending", "History writes not yet in Mongo", [], lambda: {(): write_queue.pending})
+REGISTRY.callback("event_subscribers", "Open change event streams", [], lambda: {(): event_bus.stats()["subscribers"]})
+
+async def probe_mongo() -> dict:
+    start = time.perf_counter()
+    await ping()
+    details = {"ping_ms": round((time.perf_counter() - start) * 1000, 1), **pool_usage()}
+    # Queries still work without indexes, only slower
+    missing = await missing_indexes()
+    if missing:
+        details.update(status=DEGRADED, missing_indexes=missing)
+    return details
+
+async def probe_llm() -> dict:
+    """Configuration and local saturation only; calling Gemini on every probe would spend quota"""
+    scheduler, pool = llm_scheduler.stats(), llm_pool.stats()
+    details = {
+        "in_flight": scheduler["in_flight"],
+        "queued": scheduler["queued"],
+        "limit": scheduler["limit"],
+        "avg_latency_ms": scheduler["avg_latency_ms"],
+        "overloads": scheduler["overloads"],
+        "pool_in_use": pool["in_use"],
+        "max_concurrency": pool["max_concurrency"],
+        "saturation": round(pool["in_use"] / pool["max_concurrency"], 3),
+    }
+    if not GEMINI_API_KEY:
+        raise ProbeFailed("GEMINI_API_KEY is not set", details)
+    if scheduler["queued"] >= LLM_QUEUE_MAX or pool["in_use"] >= pool["max_concurrency"]:
+        details["status"] = DEGRADED
+    return details
+
+async def probe_write_queue() -> dict:
+    details = {"pending": write_queue.pending, "max_pending": write_queue.max_pending}
+    if write_queue.pending >= write_queue.max_pending:
+        details["status"] = DEGRADED
+    return details
+
+health_checker = HealthChecker(ttl=HEALTH_PROBE_TTL_SECONDS, timeout=HEALTH_PROBE_TIMEOUT_SECONDS)
+health_checker.register("mongo", probe_mongo, budget_ms=HEALTH_MONGO_BUDGET_MS)
+health_checker.register("llm", probe_llm)
+health_checker.register("write_queue", probe_write_queue, critical=False)
+
+def other_requests_in_flight() -> int:
+    """Requests in progress besides the one asking; event streams are not requests in progress"""
+    return max(int(http_in_flight.total()) - 1, 0)
+
+def set_draining(draining: bool):
+    health_checker.draining = draining
+    # Event streams never finish on their own: end them so draining can complete
+    if draining:
+        event_bus.close()
+    else:
+        event_bus.open()
+
+def check_drain_access(request: Request):
+    if DRAIN_TOKEN:
+        if request.headers.get("x-drain-token") != DRAIN_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid drain token")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1", "localhost"):
+        raise HTTPException(status_code=403, detail="Draining is only allowed from localhost unless DRAIN_TOKEN is set")
 
 # API Endpoints
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/api/health")
+@app.get("/api/health/live")
 async def health():
+    """Liveness: the process serves requests. Dependencies are checked by /api/health/ready"""
     return {"status": "ok", "message": "AI Assistant API is running with Gemini 2.0 Flash"}
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(chat_request: ChatMessage):
+@app.get("/api/health/ready")
+async def readiness():
+    """200 when this instance should receive traffic, 503 when a critical dependency is down or it is draining"""
     try:
-        session_id = get_or_create_session(chat_request.session_id)
-        
-        # Get chat history for context
-        history = list(chats_collection.find(
-            {"session_id": session_id}
-        ).sort("timestamp", -1).limit(10))
-        
-        # Initialize Gemini chat for intent detection
-        intent_chat = LlmChat(
-            api_key=GEMINI_API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="""Você é um analisador de intenções especializado. Analise a mensagem do usuário e determine se ele está pedindo para:
-1. Criar uma nota (palavras-chave: nota, anotar, escrever, salvar, guardar, lembrar disso, anote que)
-2. Criar um lembrete (palavras-chave: lembrete, lembrar, agendar, compromisso, tarefa, fazer, me lembre)
-3. Apenas conversar normalmente
+        report = await health_checker.readiness()
+        report["in_flight_requests"] = other_requests_in_flight()
+        report["open_streams"] = int(http_streams_open.total())
+        return JSONResponse(jsonable_encoder(report), status_code=200 if report["ready"] else 503)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error checking readiness: {str(e)}")
 
-IMPORTANTE: Para lembretes, extraia corretamente a data e hora. Se disser "amanhã", use a data de amanhã. Se disser "15h" ou "3pm", use esse horário.
+@app.post("/api/health/drain")
+async def start_draining(request: Request):
+    """Fail readiness so the load balancer stops routing here and end the event streams;
+    poll in_flight_requests until it reaches 0"""
+    check_drain_access(request)
+    set_draining(True)
+    return {"draining": True, "in_flight_requests": other_requests_in_flight()}
 
-Responda EXATAMENTE em um destes formatos:
-- Se for para criar nota: CRIAR_NOTA|título|conteúdo|categoria
-- Se for para criar lembrete: CRIAR_LEMBRETE|título|descrição|data_hora|prioridade
-- Se for conversa normal: CONVERSAR
+@app.delete("/api/health/drain")
+async def stop_draining(request: Request):
+    check_drain_access(request)
+    set_draining(False)
+    return {"draining": False, "in_flight_requests": other_requests_in_flight()}
 
-Para lembretes, a data_hora deve considerar:
-- "amanhã" = próximo dia
-- "depois de amanhã" = 2 dias
-- "15h" = 15:00 de amanhã se não especificar dia
-- "sexta" = próxima sexta-feira
+@app.get("/api/write-queue")
+async def get_write_queue_stats():
+    return write_queue.stats()
 
-Para categoria use: general, work, personal, study
-Para prioridade use: low, medium, high
+@app.get("/api/llm/pool")
+async def get_llm_pool_stats():
+    return {**llm_pool.stats(), "single_flight": llm_flight.stats(), "scheduler": llm_scheduler.stats()}
 
-Exemplos:
-- "Anote que preciso comprar leite" -> CRIAR_NOTA|Compras|Preciso comprar leite|personal
-- "Me lembre de ligar para o médico amanhã às 15h" -> CRIAR_LEMBRETE|Ligar médico|Ligar para o médico|AMANHA_15H|medium
-- "Lembrete para fazer exercícios" -> CRIAR_LEMBRETE|Exercícios|Fazer exercícios|AMANHA_10H|medium"""
-        ).with_model("gemini", "gemini-2.0-flash").with_max_tokens(200)
+@app.get("/api/events")
+async def stream_events(request: Request, since: Optional[str] = None, types: Optional[str] = None):
+    """Server-sent change events. Reconnecting clients resume from Last-Event-ID (or since=)"""
+    selected = set(types.split(",")) if types else None
+    return sse_response(event_stream(request, parse_event_id(request.headers.get("last-event-id") or since), selected))
+
+@app.get("/api/events/stats")
+async def get_event_stats():
+    return event_bus.stats()
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(chat_request: ChatMessage):
+    try:
+        with chat_stage_seconds.time("session"):
+            session_id = await get_or_create_session(chat_request.session_id, chat_request.message)
         
-        # Analyze intent
-        intent_message = UserMessage(text=chat_request.message)
-        intent_response = await intent_chat.send_message(intent_message)
+        # Get chat history for context
+        with chat_stage_seconds.time("history"):
+            history = await recent_turns(session_id)
+        
+        intent_response = await detect_intent(chat_request.message)
         
         # Process based on intent
-        if intent_response.startswith("CRIAR_NOTA|"):
-            try:
-                parts = intent_response.split("|")
-                if len(parts) >= 4:
-                    _, title, content, category = parts[0], parts[1], parts[2], parts[3]
-                    
-                    # Create note
-                    note_id = str(uuid.uuid4())
-                    note_data = {
-                        "id": note_id,
-                        "title": title,
-                        "content": content,
-                        "category": category,
-                        "tags": [],
-                        "created_at": datetime.now(),
-                        "updated_at": datetime.now(),
-                        "completed": False
-                    }
-                    
-                    notes_collection.insert_one(note_data)
-                    
-                    response = f"✅ Nota criada com sucesso!\n\n📝 **{title}**\n{content}\n\nCategoria: {category}\n\nVocê pode ver sua nota na seção 'Notas' do menu."
-                else:
-                    response = "Entendi que você quer criar uma nota, mas não consegui extrair todas as informações. Pode repetir especificando título e conteúdo?"
-            except Exception as e:
-                response = f"Entendi que você quer criar uma nota, mas houve um erro: {str(e)}. Pode tentar novamente?"
-                
-        elif intent_response.startswith("CRIAR_LEMBRETE|"):
-            try:
-                parts = intent_response.split("|")
-                if len(parts) >= 5:
-                    _, title, description, date_str, priority = parts[0], parts[1], parts[2], parts[3], parts[4]
-                    
-                    # Parse date with more flexibility
-                    try:
-                        # Handle special date strings
-                        if "AMANHA" in date_str.upper():
-                            tomorrow = datetime.now() + timedelta(days=1)
-                            if "15H" in date_str.upper():
-                                reminder_date = tomorrow.replace(hour=15, minute=0, second=0, microsecond=0)
-                            elif "10H" in date_str.upper():
-                                reminder_date = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
-                            else:
-                                reminder_date = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
-                        else:
-                            # Try to parse as ISO format first
-                            reminder_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    except:
-                        try:
-                            # Try different common formats using dateutil
-                            from dateutil import parser
-                            reminder_date = parser.parse(date_str, default=datetime.now() + timedelta(days=1))
-                        except:
-                            # Final fallback: extract time from original message
-                            tomorrow = datetime.now() + timedelta(days=1)
-                            
-                            # Try to extract hour from original message
-                            import re
-                            time_patterns = [
-                                r'(\d{1,2})[h:](\d{2})',  # 15h30, 15:30
-                                r'(\d{1,2})h',             # 15h
-                                r'às (\d{1,2})',          # às 15
-                                r'(\d{1,2}) horas'        # 15 horas
-                            ]
-                            
-                            hour, minute = 10, 0  # default
-                            for pattern in time_patterns:
-                                time_match = re.search(pattern, chat_request.message.lower())
-                                if time_match:
-                                    hour = int(time_match.group(1))
-                                    minute = int(time_match.group(2)) if len(time_match.groups()) > 1 and time_match.group(2) else 0
-                                    break
-                            
-                            # Ensure valid time
-                            if 0 <= hour <= 23 and 0 <= minute <= 59:
-                                reminder_date = tomorrow.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                            else:
-                                reminder_date = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
-                    
-                    # Create reminder
-                    reminder_id = str(uuid.uuid4())
-                    reminder_data = {
-                        "id": reminder_id,
-                        "title": title,
-                        "description": description,
-                        "date": reminder_date,
-                        "priority": priority,
-                        "created_at": datetime.now(),
-                        "completed": False
-                    }
-                    
-                    reminders_collection.insert_one(reminder_data)
-                    
-                    response = f"⏰ Lembrete criado com sucesso!\n\n📅 **{title}**\n{description}\n\nData: {reminder_date.strftime('%d/%m/%Y às %H:%M')}\nPrioridade: {priority}\n\nVocê pode ver seu lembrete na seção 'Lembretes' do menu."
-                else:
-                    response = "Entendi que você quer criar um lembrete, mas não consegui extrair todas as informações. Pode repetir especificando título, descrição e quando quer ser lembrado?"
-            except Exception as e:
-                response = f"Entendi que você quer criar um lembrete, mas houve um erro: {str(e)}. Pode tentar novamente?"
-                
-        else:
+        with chat_stage_seconds.time("action"):
+            response = await run_intent_action(intent_response, chat_request.message)
+        
+        if response is None:
             # Normal conversation
-            chat = LlmChat(
-                api_key=GEMINI_API_KEY,
-                session_id=session_id,
-                system_message="Você é um assistente pessoal de IA avançado e inteligente. Você pode ajudar com pesquisas, análises, desenvolvimento de código, organização de tarefas e muito mais. Seja prestativo, criativo e amigável. Responda sempre em português brasileiro. Se o usuário pedir para criar notas ou lembretes, oriente-o a usar comandos claros como 'crie uma nota sobre...' ou 'me lembre de...'."
-            ).with_model("gemini", "gemini-2.0-flash").with_max_tokens(4096)
-            
-            # Create user message
-            user_message = UserMessage(text=chat_request.message)
-            
-            # Send message and get response
-            response = await chat.send_message(user_message)
+            with chat_stage_seconds.time("context"):
+                prompt = await chat_context.build(session_id, history, chat_request.message, relevant_notes(chat_request.message))
+            with chat_stage_seconds.time("reply_llm"):
+                response = await ask_llm("chat", prompt)
         
         # Save to database
-        save_message(session_id, chat_request.message, response)
+        with chat_stage_seconds.time("persist"):
+            await save_message(session_id, chat_request.message, response)
         
         return ChatResponse(response=response, session_id=session_id)
         
+    except LlmOverloaded as e:
+        raise llm_busy(e)
     except Exception as e:
         error_response = f"Desculpe, ocorreu um erro: {str(e)}. Tente novamente."
-        save_message(session_id, chat_request.message, error_response)
+        await save_message(session_id, chat_request.message, error_response)
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+@app.post("/api/chat/stream")
+async def chat_stream(chat_request: ChatMessage):
+    try:
+        session_id = await get_or_create_session(chat_request.session_id, chat_request.message)
+        
+        # Get chat history for context
+        history = await recent_turns(session_id)
+        
+        intent_response = await detect_intent(chat_request.message)
+        action_response = await run_intent_action(intent_response, chat_request.message)
+        if action_response is None:
+            check_llm_capacity("chat")
+            prompt = await chat_context.build(session_id, history, chat_request.message, relevant_notes(chat_request.message))
+    except LlmOverloaded as e:
+        raise llm_busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+    
+    if action_response is not None:
+        tokens = text_stream(action_response)
+    else:
+        tokens = stream_reply("chat", prompt)
+    
+    async def on_complete(response: str):
+        await save_message(session_id, chat_request.message, response)
+        return {"response": response, "session_id": session_id}
+    
+    return sse_response(relay_stream(tokens, on_complete, meta={"session_id": session_id}))
+
+CHAT_HISTORY_SORT = [("timestamp", -1), ("_id", -1)]
+
+def format_chat(msg: dict) -> dict:
+    return {
+        "id": str(msg["_id"]),
+        "message": msg["message"],
+        "response": msg["response"],
+        "timestamp": msg["timestamp"]
+    }
+
+async def chat_history_lines(session_id: str, query: dict):
+    """The whole history as NDJSON, read one keyset page at a time"""
+    while True:
+        page = await chats_repo.find(query, sort=CHAT_HISTORY_SORT, limit=MAX_PAGE_SIZE)
+        if page:
+            yield "".join(json.dumps(jsonable_encoder(format_chat(msg)), ensure_ascii=False) + "\n" for msg in page)
+        if len(page) < MAX_PAGE_SIZE:
+            return
+        last = [page[-1][field] for field, _ in CHAT_HISTORY_SORT]
+        query = {"$and": [{"session_id": session_id}, keyset_filter(last, CHAT_HISTORY_SORT)]}
+
 @app.get("/api/chat/history/{session_id}")
-async def get_chat_history(session_id: str):
+async def get_chat_history(session_id: str, response: Response, limit: Optional[int] = CHAT_HISTORY_PAGE_SIZE,
+                           after: Optional[str] = None, format: Optional[str] = "json"):
+    """Turns of a session, newest first. With limit=, the X-Next-Cursor header carries the after= value
+    for the next page; format=ndjson streams everything from after= on instead"""
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    try:
+        query = apply_cursor({"session_id": session_id}, after, CHAT_HISTORY_SORT)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if format == "ndjson":
+        return StreamingResponse(chat_history_lines(session_id, query), media_type="application/x-ndjson")
+    
     try:
-        history = list(chats_collection.find(
-            {"session_id": session_id}
-        ).sort("timestamp", 1))
+        history = await chats_repo.find(query, sort=CHAT_HISTORY_SORT, limit=limit)
+        set_next_cursor(response, history, limit, CHAT_HISTORY_SORT)
         
-        return [
-            {
-                "id": str(msg["_id"]),
-                "message": msg["message"],
-                "response": msg["response"],
-                "timestamp": msg["timestamp"]
-            }
-            for msg in history
-        ]
+        return [format_chat(msg) for msg in history]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching history: {str(e)}")
 
+@app.get("/api/chat/compaction")
+async def get_chat_compaction_stats():
+    return chat_compactor.stats()
+
+@app.get("/api/chat/sessions/stats")
+async def get_session_store_stats():
+    return session_store.stats()
+
 @app.get("/api/chat/actions")
 async def get_chat_actions():
     """Get recent notes and reminders created via chat"""
     try:
         # Get recent notes created in last hour (likely from chat)
-        recent_notes = list(notes_collection.find({
+        recent_notes = await notes_repo.find({
             "created_at": {"$gte": datetime.now() - timedelta(hours=1)}
-        }).sort("created_at", -1).limit(5))
+        }, sort=[("created_at", -1)], limit=5)
         
         # Get recent reminders created in last hour (likely from chat)
-        recent_reminders = list(reminders_collection.find({
+        recent_reminders = await reminders_repo.find({
             "created_at": {"$gte": datetime.now() - timedelta(hours=1)}
-        }).sort("created_at", -1).limit(5))
+        }, sort=[("created_at", -1)], limit=5)
         
         return {
             "recent_notes": [
@@ -369,22 +1146,26 @@ async def get_chat_actions():
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching chat actions: {str(e)}")
-async def get_recent_chats():
+@app.get("/api/sessions")
+async def get_sessions(response: Response, limit: Optional[int] = SESSION_LIST_PAGE_SIZE, after: Optional[str] = None,
+                       fields: Optional[str] = None):
+    """Conversations, most recently active first, read from the aggregates kept on each session
+    document. The X-Next-Cursor header carries the after= value for the next page"""
+    projection, selected, cursor_query = parse_list_params(fields, after, limit, SESSION_FIELDS, SESSIONS_SORT)
+    
     try:
-        recent_chats = list(chats_collection.find().sort("timestamp", -1).limit(10))
+        # The rolling summary can be long; a listing never needs it
+        projection = projection or {field: 1 for field in SESSION_FIELDS}
+        sessions = await sessions_repo.find(cursor_query, sort=SESSIONS_SORT, limit=limit or 0, projection=projection)
+        set_next_cursor(response, sessions, limit, SESSIONS_SORT)
         
+        defaults = {"title": "Nova conversa", "turn_count": 0, "last_message": "", "last_response": ""}
         return [
-            {
-                "id": str(msg["_id"]),
-                "message": msg["message"][:100] + "..." if len(msg["message"]) > 100 else msg["message"],
-                "response": msg["response"][:200] + "..." if len(msg["response"]) > 200 else msg["response"],
-                "timestamp": msg["timestamp"],
-                "session_id": msg["session_id"]
-            }
-            for msg in recent_chats
+            {field: session.get(field, defaults.get(field)) for field in selected}
+            for session in sessions
         ]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching recent chats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching sessions: {str(e)}")
 
 @app.delete("/api/chat/{chat_id}")
 async def delete_chat(chat_id: str):
@@ -392,14 +1173,18 @@ async def delete_chat(chat_id: str):
         from bson import ObjectId
         # Try both ObjectId and string ID
         try:
-            result = chats_collection.delete_one({"_id": ObjectId(chat_id)})
+            deleted = await chats_repo.find_one_and_delete({"_id": ObjectId(chat_id)}, {"session_id": 1})
         except:
             # If ObjectId fails, try with string id
-            result = chats_collection.delete_one({"id": chat_id})
+            deleted = await chats_repo.find_one_and_delete({"id": chat_id}, {"session_id": 1})
         
-        if result.deleted_count == 0:
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Chat not found")
+        await session_store.forget_turns(deleted["session_id"])
             
+        publish_change("chat.deleted", {"id": chat_id})
+        dashboard_cache.invalidate()
+        
         return {"message": "Chat deleted successfully"}
         
     except Exception as e:
@@ -420,7 +1205,10 @@ async def create_note(note: Note):
             "completed": False
         }
         
-        notes_collection.insert_one(note_data)
+        await notes_repo.insert(note_data)
+        index_document("note", note_data)
+        publish_change("note.created", note_data)
+        dashboard_cache.invalidate()
         
         return NoteResponse(**note_data)
         
@@ -428,30 +1216,28 @@ async def create_note(note: Note):
         raise HTTPException(status_code=500, detail=f"Error creating note: {str(e)}")
 
 @app.get("/api/notes")
-async def get_notes(category: Optional[str] = None, tag: Optional[str] = None, recent: Optional[bool] = False):
+async def get_notes(response: Response, category: Optional[str] = None, tag: Optional[str] = None, recent: Optional[bool] = False,
+                    limit: Optional[int] = None, after: Optional[str] = None, fields: Optional[str] = None):
+    """Notes newest first. With limit=, the X-Next-Cursor header carries the after= value for the next page"""
+    if recent and limit is None:
+        limit = 10  # Limit to 10 recent notes
+    projection, selected, cursor_query = parse_list_params(fields, after, limit, NOTE_FIELDS, NOTES_SORT)
+    
     try:
         query = {}
         if category:
             query["category"] = category
         if tag:
             query["tags"] = {"$in": [tag]}
+        if cursor_query:
+            query = {"$and": [query, cursor_query]} if query else cursor_query
         
-        notes = list(notes_collection.find(query).sort("created_at", -1))
-        
-        if recent:
-            notes = notes[:10]  # Limit to 10 recent notes
+        notes = await notes_repo.find(query, sort=NOTES_SORT, limit=limit or 0, projection=projection)
+        set_next_cursor(response, notes, limit, NOTES_SORT)
         
+        defaults = {"completed": False}
         return [
-            {
-                "id": note["id"],
-                "title": note["title"],
-                "content": note["content"],
-                "category": note["category"],
-                "tags": note["tags"],
-                "created_at": note["created_at"],
-                "updated_at": note["updated_at"],
-                "completed": note.get("completed", False)
-            }
+            {field: note.get(field, defaults.get(field)) for field in selected}
             for note in notes
         ]
         
@@ -469,14 +1255,15 @@ async def update_note(note_id: str, note: Note):
             "updated_at": datetime.now()
         }
         
-        result = notes_collection.update_one(
-            {"id": note_id},
-            {"$set": update_data}
-        )
+        matched_count = await notes_repo.update(note_id, update_data)
         
-        if result.matched_count == 0:
+        if matched_count == 0:
             raise HTTPException(status_code=404, detail="Note not found")
             
+        index_document("note", {"id": note_id, **update_data})
+        publish_change("note.updated", {"id": note_id, **update_data})
+        dashboard_cache.invalidate()
+        
         return {"message": "Note updated successfully"}
         
     except Exception as e:
@@ -485,14 +1272,14 @@ async def update_note(note_id: str, note: Note):
 @app.put("/api/notes/{note_id}/complete")
 async def complete_note(note_id: str):
     try:
-        result = notes_collection.update_one(
-            {"id": note_id},
-            {"$set": {"completed": True, "updated_at": datetime.now()}}
-        )
+        matched_count = await notes_repo.update(note_id, {"completed": True, "updated_at": datetime.now()})
         
-        if result.matched_count == 0:
+        if matched_count == 0:
             raise HTTPException(status_code=404, detail="Note not found")
             
+        publish_change("note.completed", {"id": note_id, "completed": True})
+        dashboard_cache.invalidate()
+        
         return {"message": "Note completed successfully"}
         
     except Exception as e:
@@ -501,14 +1288,14 @@ async def complete_note(note_id: str):
 @app.put("/api/notes/{note_id}/uncomplete")
 async def uncomplete_note(note_id: str):
     try:
-        result = notes_collection.update_one(
-            {"id": note_id},
-            {"$set": {"completed": False, "updated_at": datetime.now()}}
-        )
+        matched_count = await notes_repo.update(note_id, {"completed": False, "updated_at": datetime.now()})
         
-        if result.matched_count == 0:
+        if matched_count == 0:
             raise HTTPException(status_code=404, detail="Note not found")
             
+        publish_change("note.uncompleted", {"id": note_id, "completed": False})
+        dashboard_cache.invalidate()
+        
         return {"message": "Note uncompleted successfully"}
         
     except Exception as e:
@@ -517,16 +1304,146 @@ async def uncomplete_note(note_id: str):
 @app.delete("/api/notes/{note_id}")
 async def delete_note(note_id: str):
     try:
-        result = notes_collection.delete_one({"id": note_id})
+        deleted_count = await notes_repo.delete(note_id)
         
-        if result.deleted_count == 0:
+        if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Note not found")
             
+        unindex_document("note", note_id)
+        await record_deletion("note", note_id)
+        publish_change("note.deleted", {"id": note_id})
+        dashboard_cache.invalidate()
+        
         return {"message": "Note deleted successfully"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting note: {str(e)}")
 
+# Bulk mutations: one existence lookup and one bulk_write per batch, with a result per item
+BULK_REPOS = {"note": notes_repo, "reminder": reminders_repo}
+
+def check_bulk_size(count: int):
+    if not 1 <= count <= BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {BULK_MAX_ITEMS} items per request")
+
+async def bulk_update(kind: str, ids: List[str], update, status: str):
+    repository = BULK_REPOS[kind]
+    found = {d["id"] for d in await repository.find({"id": {"$in": ids}}, projection={"id": 1, "_id": 0})}
+    targets = [doc_id for doc_id in ids if doc_id in found]
+    errors = (await repository.bulk_write(update_operations(targets, update)))[1] if targets else []
+    return item_results(ids, targets, errors, status)
+
+async def bulk_insert(kind: str, documents: List[dict]) -> tuple:
+    _, errors = await BULK_REPOS[kind].bulk_write(insert_operations(documents))
+    ids = [document["id"] for document in documents]
+    results, succeeded = item_results(ids, ids, errors, "created")
+    created = set(succeeded)
+    documents = [document for document in documents if document["id"] in created]
+    index_documents(kind, documents)
+    for document in documents:
+        publish_change(f"{kind}.created", document)
+    return results, documents
+
+async def bulk_set_completed(kind: str, ids: List[str], completed: bool) -> tuple:
+    status = "completed" if completed else "uncompleted"
+    now = datetime.now()
+    results, succeeded = await bulk_update(kind, ids, {"$set": {"completed": completed, "updated_at": now}}, status)
+    for doc_id in succeeded:
+        publish_change(f"{kind}.{status}", {"id": doc_id, "completed": completed})
+    return results, succeeded
+
+async def bulk_delete(kind: str, ids: List[str]) -> tuple:
+    repository = BULK_REPOS[kind]
+    found = {d["id"] for d in await repository.find({"id": {"$in": ids}}, projection={"id": 1, "_id": 0})}
+    targets = [doc_id for doc_id in ids if doc_id in found]
+    errors = (await repository.bulk_write(delete_operations(targets)))[1] if targets else []
+    results, succeeded = item_results(ids, targets, errors, "deleted")
+    if succeeded:
+        await record_deletions(kind, succeeded)
+    for doc_id in succeeded:
+        unindex_document(kind, doc_id)
+        publish_change(f"{kind}.deleted", {"id": doc_id})
+    return results, succeeded
+
+@app.post("/api/notes/bulk")
+async def bulk_create_notes(batch: BulkNotes):
+    check_bulk_size(len(batch.notes))
+    try:
+        now = datetime.now()
+        documents = [
+            {
+                "id": str(uuid.uuid4()),
+                "title": note.title,
+                "content": note.content,
+                "category": note.category,
+                "tags": note.tags,
+                "created_at": now,
+                "updated_at": now,
+                "completed": False
+            }
+            for note in batch.notes
+        ]
+        results, _ = await bulk_insert("note", documents)
+        dashboard_cache.invalidate()
+        
+        return summary(results)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating notes: {str(e)}")
+
+@app.post("/api/notes/bulk/complete")
+async def bulk_complete_notes(batch: BulkIds):
+    ids = unique_ids(batch.ids)
+    check_bulk_size(len(ids))
+    try:
+        results, _ = await bulk_set_completed("note", ids, True)
+        dashboard_cache.invalidate()
+        return summary(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error completing notes: {str(e)}")
+
+@app.post("/api/notes/bulk/uncomplete")
+async def bulk_uncomplete_notes(batch: BulkIds):
+    ids = unique_ids(batch.ids)
+    check_bulk_size(len(ids))
+    try:
+        results, _ = await bulk_set_completed("note", ids, False)
+        dashboard_cache.invalidate()
+        return summary(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error uncompleting notes: {str(e)}")
+
+@app.post("/api/notes/bulk/retag")
+async def bulk_retag_notes(batch: BulkRetag):
+    """Add and/or remove tags on many notes"""
+    ids = unique_ids(batch.ids)
+    check_bulk_size(len(ids))
+    if not batch.add and not batch.remove:
+        raise HTTPException(status_code=400, detail="Nothing to add or remove")
+    try:
+        update = retag_update(list(batch.add or []), list(batch.remove or []), datetime.now())
+        results, succeeded = await bulk_update("note", ids, update, "retagged")
+        if succeeded:
+            notes = await notes_repo.find({"id": {"$in": succeeded}}, projection={"_id": 0})
+            index_documents("note", notes)
+            for note in notes:
+                publish_change("note.updated", {"id": note["id"], "tags": note["tags"], "updated_at": note["updated_at"]})
+        dashboard_cache.invalidate()
+        return summary(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retagging notes: {str(e)}")
+
+@app.post("/api/notes/bulk/delete")
+async def bulk_delete_notes(batch: BulkIds):
+    ids = unique_ids(batch.ids)
+    check_bulk_size(len(ids))
+    try:
+        results, _ = await bulk_delete("note", ids)
+        dashboard_cache.invalidate()
+        return summary(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting notes: {str(e)}")
+
 @app.post("/api/reminders", response_model=ReminderResponse)
 async def create_reminder(reminder: Reminder):
     try:
@@ -538,10 +1455,15 @@ async def create_reminder(reminder: Reminder):
             "date": reminder.date,
             "priority": reminder.priority,
             "created_at": datetime.now(),
+            "updated_at": datetime.now(),
             "completed": False
         }
         
-        reminders_collection.insert_one(reminder_data)
+        await reminders_repo.insert(reminder_data)
+        index_document("reminder", reminder_data)
+        schedule_reminder(reminder_data)
+        publish_change("reminder.created", reminder_data)
+        dashboard_cache.invalidate()
         
         return ReminderResponse(**reminder_data)
         
@@ -549,45 +1471,122 @@ async def create_reminder(reminder: Reminder):
         raise HTTPException(status_code=500, detail=f"Error creating reminder: {str(e)}")
 
 @app.get("/api/reminders")
-async def get_reminders(upcoming: Optional[bool] = None, recent: Optional[bool] = False):
+async def get_reminders(response: Response, upcoming: Optional[bool] = None, recent: Optional[bool] = False,
+                        limit: Optional[int] = None, after: Optional[str] = None, fields: Optional[str] = None):
+    """Reminders by date. With limit=, the X-Next-Cursor header carries the after= value for the next page"""
+    if recent and limit is None:
+        limit = 10  # Limit to 10 recent reminders
+    projection, selected, cursor_query = parse_list_params(fields, after, limit, REMINDER_FIELDS, REMINDERS_SORT)
+    
     try:
         query = {}
         if upcoming:
             query["date"] = {"$gte": datetime.now()}
             query["completed"] = False
+        if cursor_query:
+            query = {"$and": [query, cursor_query]} if query else cursor_query
         
-        reminders = list(reminders_collection.find(query).sort("date", 1))
+        reminders = await reminders_repo.find(query, sort=REMINDERS_SORT, limit=limit or 0, projection=projection)
+        set_next_cursor(response, reminders, limit, REMINDERS_SORT)
         
-        if recent:
-            reminders = reminders[:10]  # Limit to 10 recent reminders
-            
         return [
-            {
-                "id": reminder["id"],
-                "title": reminder["title"],
-                "description": reminder["description"],
-                "date": reminder["date"],
-                "priority": reminder["priority"],
-                "created_at": reminder["created_at"],
-                "completed": reminder["completed"]
-            }
+            {field: reminder.get(field) for field in selected}
             for reminder in reminders
         ]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching reminders: {str(e)}")
 
+@app.get("/api/reminders/due/stream")
+async def stream_due_reminders(request: Request):
+    """Server-sent reminder.due events, pushed as reminders come due"""
+    return sse_response(event_stream(request, None, {"reminder.due"}))
+
+@app.get("/api/reminders/scheduler")
+async def get_reminder_scheduler_stats():
+    return reminder_scheduler.stats()
+
+@app.post("/api/reminders/bulk")
+async def bulk_create_reminders(batch: BulkReminders):
+    check_bulk_size(len(batch.reminders))
+    try:
+        now = datetime.now()
+        documents = [
+            {
+                "id": str(uuid.uuid4()),
+                "title": reminder.title,
+                "description": reminder.description,
+                "date": reminder.date,
+                "priority": reminder.priority,
+                "created_at": now,
+                "updated_at": now,
+                "completed": False
+            }
+            for reminder in batch.reminders
+        ]
+        results, created = await bulk_insert("reminder", documents)
+        for reminder in created:
+            schedule_reminder(reminder)
+        dashboard_cache.invalidate()
+        
+        return summary(results)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating reminders: {str(e)}")
+
+@app.post("/api/reminders/bulk/complete")
+async def bulk_complete_reminders(batch: BulkIds):
+    ids = unique_ids(batch.ids)
+    check_bulk_size(len(ids))
+    try:
+        results, succeeded = await bulk_set_completed("reminder", ids, True)
+        for reminder_id in succeeded:
+            reminder_scheduler.cancel(reminder_id)
+        dashboard_cache.invalidate()
+        return summary(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error completing reminders: {str(e)}")
+
+@app.post("/api/reminders/bulk/uncomplete")
+async def bulk_uncomplete_reminders(batch: BulkIds):
+    ids = unique_ids(batch.ids)
+    check_bulk_size(len(ids))
+    try:
+        results, succeeded = await bulk_set_completed("reminder", ids, False)
+        if succeeded:
+            projection = {field: 1 for field in REMINDER_DUE_FIELDS}
+            for reminder in await reminders_repo.find({"id": {"$in": succeeded}}, projection=projection):
+                schedule_reminder(reminder)
+        dashboard_cache.invalidate()
+        return summary(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error uncompleting reminders: {str(e)}")
+
+@app.post("/api/reminders/bulk/delete")
+async def bulk_delete_reminders(batch: BulkIds):
+    ids = unique_ids(batch.ids)
+    check_bulk_size(len(ids))
+    try:
+        results, succeeded = await bulk_delete("reminder", ids)
+        for reminder_id in succeeded:
+            reminder_scheduler.cancel(reminder_id)
+        dashboard_cache.invalidate()
+        return summary(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting reminders: {str(e)}")
+
 @app.put("/api/reminders/{reminder_id}/complete")
 async def complete_reminder(reminder_id: str):
     try:
-        result = reminders_collection.update_one(
-            {"id": reminder_id},
-            {"$set": {"completed": True}}
-        )
+        matched_count = await reminders_repo.update(reminder_id, {"completed": True, "updated_at": datetime.now()})
         
-        if result.matched_count == 0:
+        if matched_count == 0:
             raise HTTPException(status_code=404, detail="Reminder not found")
             
+        reminder_scheduler.cancel(reminder_id)
+        publish_change("reminder.completed", {"id": reminder_id, "completed": True})
+        dashboard_cache.invalidate()
+        
         return {"message": "Reminder completed successfully"}
         
     except Exception as e:
@@ -596,14 +1595,17 @@ async def complete_reminder(reminder_id: str):
 @app.put("/api/reminders/{reminder_id}/uncomplete")
 async def uncomplete_reminder(reminder_id: str):
     try:
-        result = reminders_collection.update_one(
-            {"id": reminder_id},
-            {"$set": {"completed": False}}
-        )
+        matched_count = await reminders_repo.update(reminder_id, {"completed": False, "updated_at": datetime.now()})
         
-        if result.matched_count == 0:
+        if matched_count == 0:
             raise HTTPException(status_code=404, detail="Reminder not found")
             
+        reminder = await reminders_repo.get(reminder_id, {field: 1 for field in REMINDER_DUE_FIELDS})
+        if reminder:
+            schedule_reminder(reminder)
+        publish_change("reminder.uncompleted", {"id": reminder_id, "completed": False})
+        dashboard_cache.invalidate()
+        
         return {"message": "Reminder uncompleted successfully"}
         
     except Exception as e:
@@ -612,11 +1614,17 @@ async def uncomplete_reminder(reminder_id: str):
 @app.delete("/api/reminders/{reminder_id}")
 async def delete_reminder(reminder_id: str):
     try:
-        result = reminders_collection.delete_one({"id": reminder_id})
+        deleted_count = await reminders_repo.delete(reminder_id)
         
-        if result.deleted_count == 0:
+        if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Reminder not found")
             
+        unindex_document("reminder", reminder_id)
+        await record_deletion("reminder", reminder_id)
+        reminder_scheduler.cancel(reminder_id)
+        publish_change("reminder.deleted", {"id": reminder_id})
+        dashboard_cache.invalidate()
+        
         return {"message": "Reminder deleted successfully"}
         
     except Exception as e:
@@ -625,38 +1633,80 @@ async def delete_reminder(reminder_id: str):
 @app.post("/api/search")
 async def search(search_query: SearchQuery):
     try:
-        # Initialize Gemini chat for search
-        chat = LlmChat(
-            api_key=GEMINI_API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="Você é um assistente especializado em pesquisas. Forneça respostas precisas, detalhadas e bem estruturadas sobre qualquer tópico pesquisado. Responda sempre em português brasileiro."
-        ).with_model("gemini", "gemini-2.0-flash").with_max_tokens(4096)
-        
-        search_prompt = f"Pesquise e forneça informações detalhadas sobre: {search_query.query}"
+        # Repeated queries are answered from the cache
+        answer = await get_cached_search(search_query)
+        cached = answer is not None
         
-        user_message = UserMessage(text=search_prompt)
-        response = await chat.send_message(user_message)
+        if not cached:
+            search_prompt = build_search_prompt(search_query)
+            # Keyed like the cache, so equivalent spellings of a query share the call
+            response = await ask_llm("search", search_prompt, key=content_hash("search", normalize_query(search_query.query)))
+            answer = cache_search_answer(search_query, response)
+        response = answer["results"]
         
         # Save search to database
-        save_search(search_query.query, response, search_query.type)
+        await save_search(search_query.query, response, search_query.type, answer["answered_at"])
         
         return {
             "query": search_query.query,
             "results": response,
-            "type": search_query.type
+            "type": search_query.type,
+            "cached": cached
         }
         
+    except LlmOverloaded as e:
+        raise llm_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error performing search: {str(e)}")
 
+@app.post("/api/search/stream")
+async def search_stream(search_query: SearchQuery):
+    try:
+        cached_answer = await get_cached_search(search_query)
+        if cached_answer is None:
+            check_llm_capacity("search")
+    except LlmOverloaded as e:
+        raise llm_busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error performing search: {str(e)}")
+    
+    if cached_answer is not None:
+        tokens = text_stream(cached_answer["results"])
+    else:
+        tokens = stream_reply("search", build_search_prompt(search_query))
+    
+    async def on_complete(response: str):
+        answer = cached_answer or cache_search_answer(search_query, response)
+        await save_search(search_query.query, response, search_query.type, answer["answered_at"])
+        return {
+            "query": search_query.query,
+            "results": response,
+            "type": search_query.type,
+            "cached": cached_answer is not None
+        }
+    
+    return sse_response(relay_stream(tokens, on_complete))
+
+@app.get("/api/search/cache")
+async def get_search_cache_stats():
+    return search_cache.stats()
+
 @app.delete("/api/search/{search_id}")
 async def delete_search(search_id: str):
     try:
-        result = searches_collection.delete_one({"id": search_id})
+        search = await searches_repo.get(search_id, {"query_hash": 1})
+        deleted_count = await searches_repo.delete(search_id)
+        
+        if search and search.get("query_hash"):
+            search_cache.invalidate(search["query_hash"])
         
-        if result.deleted_count == 0:
+        if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Search not found")
             
+        unindex_document("search", search_id)
+        publish_change("search.deleted", {"id": search_id})
+        dashboard_cache.invalidate()
+        
         return {"message": "Search deleted successfully"}
         
     except Exception as e:
@@ -665,193 +1715,409 @@ async def delete_search(search_id: str):
 @app.post("/api/code/analyze")
 async def analyze_code(code_request: CodeAnalysis):
     try:
-        # Initialize Gemini chat for code analysis
-        chat = LlmChat(
-            api_key=GEMINI_API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="Você é um especialista em desenvolvimento de software. Analise código, identifique problemas, sugira melhorias, forneça explicações detalhadas e GERE CÓDIGO quando solicitado. Responda sempre em português brasileiro."
-        ).with_model("gemini", "gemini-2.0-flash").with_max_tokens(4096)
-        
-        if code_request.task == "analyze":
-            prompt = f"Analise este código {code_request.language}:\n\n{code_request.code}\n\nForneça uma análise detalhada incluindo: problemas, melhorias, explicações e sugestões."
-        elif code_request.task == "explain":
-            prompt = f"Explique detalhadamente este código {code_request.language}:\n\n{code_request.code}"
-        elif code_request.task == "improve":
-            prompt = f"Melhore este código {code_request.language} e explique as melhorias:\n\n{code_request.code}"
-        elif code_request.task == "generate":
-            prompt = f"Gere código {code_request.language} para: {code_request.description}\n\nForneça o código completo e funcional com explicações."
-        elif code_request.task == "create":
-            prompt = f"Crie um código {code_request.language} que faça: {code_request.description}\n\nForneça o código completo, bem estruturado e com comentários explicativos."
-        else:
-            # Check if user is asking to generate code based on description
-            if code_request.description and not code_request.code.strip():
-                prompt = f"Crie um código {code_request.language} que faça: {code_request.description}\n\nForneça o código completo, bem estruturado e com comentários explicativos."
-            else:
-                prompt = f"Analise este código {code_request.language}:\n\n{code_request.code}"
-            
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        # Identical (code, language, task, description) requests are served from the cache
+        response = await get_cached_code_analysis(code_request)
+        cached = response is not None
+        
+        if not cached:
+            prompt = build_code_prompt(code_request)
+            response = await ask_llm("code", prompt)
         
         # Save code analysis to database
-        save_code_analysis(
-            code_request.code, 
-            code_request.language, 
-            code_request.task, 
-            response, 
-            code_request.description
-        )
+        await record_code_analysis(code_request, response, cached)
         
         return {
             "code": code_request.code,
             "language": code_request.language,
             "task": code_request.task,
             "description": code_request.description,
-            "analysis": response
+            "analysis": response,
+            "cached": cached
         }
         
+    except LlmOverloaded as e:
+        raise llm_busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing code: {str(e)}")
+
+@app.post("/api/code/analyze/stream")
+async def analyze_code_stream(code_request: CodeAnalysis):
+    try:
+        cached_response = await get_cached_code_analysis(code_request)
+        if cached_response is None:
+            check_llm_capacity("code")
+    except LlmOverloaded as e:
+        raise llm_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing code: {str(e)}")
+    
+    if cached_response is not None:
+        tokens = text_stream(cached_response)
+    else:
+        tokens = stream_reply("code", build_code_prompt(code_request))
+    
+    async def on_complete(response: str):
+        await record_code_analysis(code_request, response, cached_response is not None)
+        return {
+            "code": code_request.code,
+            "language": code_request.language,
+            "task": code_request.task,
+            "description": code_request.description,
+            "analysis": response,
+            "cached": cached_response is not None
+        }
+    
+    return sse_response(relay_stream(tokens, on_complete))
+
+@app.get("/api/code/cache")
+async def get_code_cache_stats():
+    return code_cache.stats()
 
 @app.delete("/api/code/{code_id}")
 async def delete_code_analysis(code_id: str):
     try:
-        result = code_analyses_collection.delete_one({"id": code_id})
+        analysis = await code_analyses_repo.get(code_id, {"cache_key": 1, "code_hash": 1})
+        deleted_count = await code_analyses_repo.delete(code_id)
         
-        if result.deleted_count == 0:
+        if analysis and analysis.get("cache_key"):
+            code_cache.invalidate(analysis["cache_key"])
+        
+        if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Code analysis not found")
+        
+        if analysis.get("code_hash"):
+            await delete_unused_code_blob(analysis["code_hash"])
             
+        unindex_document("code", code_id)
+        publish_change("code.deleted", {"id": code_id})
+        dashboard_cache.invalidate()
+        
         return {"message": "Code analysis deleted successfully"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting code analysis: {str(e)}")
 
-@app.get("/api/dashboard")
-async def get_dashboard():
-    try:
-        # Get recent activity
-        recent_chats = chats_collection.count_documents({
-            "timestamp": {"$gte": datetime.now() - timedelta(days=7)}
+async def build_dashboard():
+    """Counters and the merged activity timeline, from a single aggregation round-trip"""
+    counts, recent = await fetch_dashboard_data(db, datetime.now())
+    
+    # Format activities for timeline
+    activities = []
+
+    # Add recent chats
+    for chat in recent["chat"]:
+        activities.append({
+            "id": str(chat["_id"]),
+            "type": "chat",
+            "icon": "💬",
+            "title": "Conversa com IA",
+            "description": chat["message"][:100] + "..." if len(chat["message"]) > 100 else chat["message"],
+            "timestamp": chat["timestamp"],
+            "data": {
+                "message": chat["message"],
+                "response": chat["response"],
+                "session_id": chat["session_id"]
+            }
+        })
+
+    # Add recent notes
+    for note in recent["note"]:
+        activities.append({
+            "id": note["id"],
+            "type": "note",
+            "icon": "📝",
+            "title": f"Nota: {note['title']}",
+            "description": note["content"][:100] + "..." if len(note["content"]) > 100 else note["content"],
+            "timestamp": note["created_at"],
+            "data": {
+                "title": note["title"],
+                "content": note["content"],
+                "category": note["category"],
+                "tags": note["tags"],
+                "completed": note.get("completed", False)
+            }
+        })
+
+    # Add recent reminders
+    for reminder in recent["reminder"]:
+        activities.append({
+            "id": reminder["id"],
+            "type": "reminder",
+            "icon": "📅",
+            "title": f"Lembrete: {reminder['title']}",
+            "description": reminder["description"][:100] + "..." if len(reminder["description"]) > 100 else reminder["description"],
+            "timestamp": reminder["created_at"],
+            "data": {
+                "title": reminder["title"],
+                "description": reminder["description"],
+                "date": reminder["date"],
+                "priority": reminder["priority"],
+                "completed": reminder["completed"]
+            }
+        })
+
+    # Add recent searches
+    for search in recent["search"]:
+        activities.append({
+            "id": search["id"],
+            "type": "search",
+            "icon": "🔍",
+            "title": f"Pesquisa: {search['query']}",
+            "description": search["results"][:100] + "..." if len(search["results"]) > 100 else search["results"],
+            "timestamp": search["timestamp"],
+            "data": {
+                "query": search["query"],
+                "results": search["results"],
+                "type": search["type"]
+            }
+        })
+
+    # Add recent code analyses
+    for code in recent["code"]:
+        title = f"Código: {code['description']}" if code.get('description') else f"Análise {code['language']}"
+        activities.append({
+            "id": code["id"],
+            "type": "code",
+            "icon": "💻",
+            "title": title,
+            "description": code["analysis"][:100] + "..." if len(code["analysis"]) > 100 else code["analysis"],
+            "timestamp": code["timestamp"],
+            "data": {
+                "code": code["code"],
+                "language": code["language"],
+                "task": code["task"],
+                "analysis": code["analysis"],
+                "description": code.get("description", "")
+            }
         })
+
+    # Sort activities by timestamp
+    activities.sort(key=lambda x: x["timestamp"], reverse=True)
+    activities = activities[:15]  # Limit to 15 most recent activities
+
+    return {
+        "recent_chats": counts["recent_chats"],
+        "total_notes": counts["total_notes"],
+        "upcoming_reminders": counts["upcoming_reminders"],
+        "activities": activities
+    }
+
+SYNC_REPOS = {"note": notes_repo, "reminder": reminders_repo}
+SYNC_DEFAULT_LIMIT = 500
+
+@app.get("/api/sync")
+async def sync_changes(cursor: Optional[str] = None, types: Optional[str] = None, limit: Optional[int] = SYNC_DEFAULT_LIMIT):
+    """Notes and reminders created, updated or deleted since cursor (everything without one).
+
+    Returns the changed documents, tombstones for deleted ones and the cursor
+    for the next call; complete is false when there is more to fetch right away.
+    """
+    kinds = [kind.strip() for kind in types.split(",")] if types else SYNC_KINDS
+    unknown = [kind for kind in kinds if kind not in SYNC_KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    try:
+        positions = decode_sync_cursor(cursor) if cursor else {}
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    now = datetime.now()
+    oldest = oldest_position(positions)
+    if oldest is not None and oldest < now - timedelta(seconds=TOMBSTONE_TTL_SECONDS):
+        raise HTTPException(status_code=410, detail="Cursor expired, sync from scratch")
+    
+    try:
+        changes = {}
+        deleted = []
+        complete = True
+        for kind in kinds:
+            documents = await SYNC_REPOS[kind].find(
+                sync_after(positions.get(kind), CHANGES_SORT),
+                sort=CHANGES_SORT,
+                limit=limit,
+                projection={"_id": 0}
+            )
+            changes[kind] = documents
+            complete = complete and len(documents) < limit
+            positions[kind] = next_position(positions.get(kind), documents, limit, CHANGES_SORT, now)
+            
+            # A first sync needs no tombstones, only a position to follow them from
+            stream = tombstone_stream(kind)
+            tombstones = []
+            if stream in positions:
+                tombstones = await tombstones_repo.find(
+                    {"kind": kind, **sync_after(positions[stream], TOMBSTONES_SORT)},
+                    sort=TOMBSTONES_SORT,
+                    limit=limit,
+                    projection={"_id": 0}
+                )
+                deleted.extend({"type": kind, "id": t["id"], "deleted_at": t["deleted_at"]} for t in tombstones)
+                complete = complete and len(tombstones) < limit
+            positions[stream] = next_position(positions.get(stream), tombstones, limit, TOMBSTONES_SORT, now)
         
-        total_notes = notes_collection.count_documents({})
+        return {
+            "changes": changes,
+            "deleted": deleted,
+            "cursor": encode_sync_cursor(positions),
+            "complete": complete
+        }
         
-        upcoming_reminders = reminders_collection.count_documents({
-            "date": {"$gte": datetime.now()},
-            "completed": False
-        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error syncing changes: {str(e)}")
+
+# Export/import of everything the user has, as NDJSON
+BACKUP_REPOS = {
+    "notes": notes_repo,
+    "reminders": reminders_repo,
+    "chats": chats_repo,
+    "chats_archive": chats_archive_repo,
+    "sessions": sessions_repo,
+    "searches": searches_repo,
+    "code_analyses": code_analyses_repo,
+    "code_blobs": code_blobs_repo,
+}
+INDEXED_COLLECTIONS = {"notes": "note", "reminders": "reminder", "searches": "search", "code_analyses": "code"}
+
+@app.get("/api/export")
+async def export_data(collections: Optional[str] = None, gzip: Optional[bool] = False):
+    """Stream the selected collections (all by default) as NDJSON, optionally gzipped"""
+    try:
+        names = parse_collections(collections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"ai-assistant-export-{datetime.now().strftime('%Y%m%d-%H%M%S')}.ndjson"
+    chunks = export_chunks(db, names)
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def invalidate_imported(collection: str, documents: List[dict]):
+    """Drop cached entries the imported documents may have replaced"""
+    for document in documents:
+        if collection == "searches" and document.get("query_hash"):
+            search_cache.invalidate(document["query_hash"])
+        elif collection == "code_analyses" and document.get("cache_key"):
+            code_cache.invalidate(document["cache_key"])
+        elif collection == "sessions":
+            session_store.known.invalidate(document["session_id"])
+            chat_context.forget(document["session_id"])
+
+async def import_batch(collection: str, documents: List[dict]) -> dict:
+    now = datetime.now()
+    result, errors = await BACKUP_REPOS[collection].bulk_write([upsert_operation(collection, d, now) for d in documents])
+    
+    failed = {error["index"] for error in errors}
+    written = [document for i, document in enumerate(documents) if i not in failed]
+    invalidate_imported(collection, written)
+    kind = INDEXED_COLLECTIONS.get(collection)
+    if kind:
+        index_documents(kind, written)
+    if collection == "reminders":
+        for reminder in written:
+            if not reminder.get("completed"):
+                schedule_reminder(reminder)
+    
+    return {
+        "upserted": result.get("nUpserted", 0),
+        "matched": result.get("nMatched", 0),
+        "failed": len(errors),
+    }
+
+@app.post("/api/import")
+async def import_data(request: Request):
+    """Upsert an NDJSON export (plain or gzipped request body), keyed on each collection's id"""
+    try:
+        report = await import_lines(ndjson_lines(request.stream()), import_batch)
+    except (InvalidImport, zlib.error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing data: {str(e)}")
+    finally:
+        dashboard_cache.invalidate()
+    
+    publish_change("data.imported", report["collections"])
+    return report
+
+@app.get("/api/find")
+async def find(q: str, types: Optional[str] = None, limit: Optional[int] = 20):
+    """Ranked full-text search over notes, reminders, past searches and code analyses"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    if not 1 <= limit <= FIND_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {FIND_MAX_LIMIT}")
+    kinds = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    unknown = [t for t in kinds or [] if t not in SEARCHABLE]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+    
+    try:
+        start = time.perf_counter()
+        results = find_index.search(q, kinds, limit)
         
-        # Get recent activities for timeline
-        recent_chat_activities = list(chats_collection.find().sort("timestamp", -1).limit(3))
-        recent_note_activities = list(notes_collection.find().sort("created_at", -1).limit(3))
-        recent_reminder_activities = list(reminders_collection.find().sort("created_at", -1).limit(3))
-        recent_search_activities = list(searches_collection.find().sort("timestamp", -1).limit(3))
-        recent_code_activities = list(code_analyses_collection.find().sort("timestamp", -1).limit(3))
-        
-        # Format activities for timeline
-        activities = []
-        
-        # Add recent chats
-        for chat in recent_chat_activities:
-            activities.append({
-                "id": str(chat["_id"]),
-                "type": "chat",
-                "icon": "💬",
-                "title": "Conversa com IA",
-                "description": chat["message"][:100] + "..." if len(chat["message"]) > 100 else chat["message"],
-                "timestamp": chat["timestamp"],
-                "data": {
-                    "message": chat["message"],
-                    "response": chat["response"],
-                    "session_id": chat["session_id"]
-                }
-            })
-        
-        # Add recent notes
-        for note in recent_note_activities:
-            activities.append({
-                "id": note["id"],
-                "type": "note",
-                "icon": "📝",
-                "title": f"Nota: {note['title']}",
-                "description": note["content"][:100] + "..." if len(note["content"]) > 100 else note["content"],
-                "timestamp": note["created_at"],
-                "data": {
-                    "title": note["title"],
-                    "content": note["content"],
-                    "category": note["category"],
-                    "tags": note["tags"],
-                    "completed": note.get("completed", False)
-                }
-            })
-        
-        # Add recent reminders
-        for reminder in recent_reminder_activities:
-            activities.append({
-                "id": reminder["id"],
-                "type": "reminder",
-                "icon": "📅",
-                "title": f"Lembrete: {reminder['title']}",
-                "description": reminder["description"][:100] + "..." if len(reminder["description"]) > 100 else reminder["description"],
-                "timestamp": reminder["created_at"],
-                "data": {
-                    "title": reminder["title"],
-                    "description": reminder["description"],
-                    "date": reminder["date"],
-                    "priority": reminder["priority"],
-                    "completed": reminder["completed"]
-                }
-            })
-        
-        # Add recent searches
-        for search in recent_search_activities:
-            activities.append({
-                "id": search["id"],
-                "type": "search",
-                "icon": "🔍",
-                "title": f"Pesquisa: {search['query']}",
-                "description": search["results"][:100] + "..." if len(search["results"]) > 100 else search["results"],
-                "timestamp": search["timestamp"],
-                "data": {
-                    "query": search["query"],
-                    "results": search["results"],
-                    "type": search["type"]
-                }
-            })
-        
-        # Add recent code analyses
-        for code in recent_code_activities:
-            title = f"Código: {code['description']}" if code.get('description') else f"Análise {code['language']}"
-            activities.append({
-                "id": code["id"],
-                "type": "code",
-                "icon": "💻",
-                "title": title,
-                "description": code["analysis"][:100] + "..." if len(code["analysis"]) > 100 else code["analysis"],
-                "timestamp": code["timestamp"],
-                "data": {
-                    "code": code["code"],
-                    "language": code["language"],
-                    "task": code["task"],
-                    "analysis": code["analysis"],
-                    "description": code.get("description", "")
-                }
-            })
+        return {
+            "query": q,
+            "results": results,
+            "took_ms": round((time.perf_counter() - start) * 1000, 3),
+            "complete": find_index.ready
+        }
         
-        # Sort activities by timestamp
-        activities.sort(key=lambda x: x["timestamp"], reverse=True)
-        activities = activities[:15]  # Limit to 15 most recent activities
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching: {str(e)}")
+
+@app.get("/api/find/stats")
+async def get_find_index_stats():
+    return {**find_index.stats(), "vectors": note_vectors.stats()}
+
+@app.get("/api/dashboard")
+async def get_dashboard():
+    try:
+        snapshot = await dashboard_cache.get(build_dashboard)
         
         return {
-            "recent_chats": recent_chats,
-            "total_notes": total_notes,
-            "upcoming_reminders": upcoming_reminders,
+            "recent_chats": snapshot["recent_chats"],
+            "total_notes": snapshot["total_notes"],
+            "upcoming_reminders": snapshot["upcoming_reminders"],
             "last_activity": datetime.now(),
-            "activities": activities
+            "activities": snapshot["activities"]
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching dashboard data: {str(e)}")
 
+@app.on_event("startup")
+async def startup():
+    set_draining(False)
+    write_queue.start()
+    reminder_scheduler.start()
+    chat_compactor.start()
+    asyncio.create_task(load_indexes())
+    asyncio.create_task(load_pending_reminders())
+    try:
+        report = await ensure_indexes()
+        logger.info("Indexes reconciled: %s", report)
+        logger.info("updated_at backfilled: %s", await backfill_updated_at())
+        logger.info("session aggregates backfilled: %d", await backfill_session_aggregates())
+    except Exception as e:
+        # The API can still serve requests without indexes, just slower
+        logger.warning("Could not reconcile indexes: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown():
+    set_draining(True)
+    await reminder_scheduler.stop()
+    await chat_compactor.stop()
+    await chat_context.wait_idle()
+    await write_queue.close()
+    close_client()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,125 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+TITLE_LENGTH = 80
+
+
+def preview(text: str, length: int) -> str:
+    text = text or ""
+    return text[:length] + "..." if len(text) > length else text
+
+
+def session_title(first_message: str) -> str:
+    return preview(" ".join((first_message or "").split()), TITLE_LENGTH) or "Nova conversa"
+
+
+def turn_updates(turns: List[dict]) -> Dict[str, dict]:
+    """One aggregate update per session for a batch of turns, in the order they were saved.
+
+    Each update stores the id of the last turn it covers as last_turn_id.
+    """
+    updates = {}
+    for turn in turns:
+        update = updates.setdefault(turn["session_id"], {
+            "$inc": {"turn_count": 0},
+            "$max": {"last_activity": turn["timestamp"]},
+            "$set": {},
+        })
+        update["$inc"]["turn_count"] += 1
+        update["$max"]["last_activity"] = max(update["$max"]["last_activity"], turn["timestamp"])
+        update["$set"] = {
+            "last_message": preview(turn["message"], 100),
+            "last_response": preview(turn["response"], 200),
+            "last_turn_id": turn["turn_id"],
+        }
+    return updates
+
+
+class TurnWriter:
+    """Applies queued turns to the session documents.
+
+    Has the insert_many() WriteBehindQueue writes through, so turns are
+    queued with the chat rows they belong to and a batch of them costs one
+    bulk_write, with a single update per session.
+
+    The queue retries a whole batch after a transient error, and $inc is not
+    idempotent, so each update only matches while the session's
+    last_turn_id differs from the one it sets: an update that was applied
+    before the error is skipped on the retry. Returns how many turns were
+    recorded; turns of a session whose update failed are left out.
+    """
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    async def insert_many(self, turns: List[dict], ordered: bool = True) -> int:
+        updates = turn_updates(turns)
+        operations = [
+            UpdateOne({"session_id": session_id, "last_turn_id": {"$ne": update["$set"]["last_turn_id"]}}, update)
+            for session_id, update in updates.items()
+        ]
+        _, errors = await self.sessions.bulk_write(operations)
+        counts = [update["$inc"]["turn_count"] for update in updates.values()]
+        failed = 0
+        for error in errors:
+            failed += counts[error["index"]]
+            logger.error("Could not update session aggregates: %s", error.get("errmsg"))
+        return len(turns) - failed
+
+
+class SessionStore:
+    """Resolves chat sessions and keeps their aggregates up to date.
+
+    Session ids already seen by this process are remembered in an LRU, so
+    resolving a known session costs no round-trip; an unknown one is created
+    with a single atomic upsert. Each saved turn updates the session
+    document's turn_count, last_activity, title and last message previews
+    in place, so sessions can be listed without reading the chats. The
+    rolling summary pointer (summary, summary_upto) is kept on the same
+    document by ConversationContext, and archived_turns by ChatCompactor.
+    With a write_queue, turns are recorded in the background through it.
+    """
+
+    def __init__(self, sessions, max_cached: int = 10000, write_queue=None):
+        self.sessions = sessions
+        self.known = TTLCache(max_entries=max_cached, ttl=24 * 3600)
+        self.turns = TurnWriter(sessions)
+        self.write_queue = write_queue
+        self.upserts = 0
+
+    async def resolve(self, session_id: Optional[str], first_message: str = "") -> str:
+        """Create the session if it does not exist yet; returns its id"""
+        if self.known.get(session_id):
+            return session_id
+        now = datetime.now()
+        self.upserts += 1
+        await self.sessions.insert_if_missing(session_id, {
+            "created_at": now,
+            "title": session_title(first_message),
+            "turn_count": 0,
+            "last_activity": now,
+        })
+        self.known.set(session_id, True)
+        return session_id
+
+    async def record_turn(self, session_id: str, message: str, response: str, timestamp: datetime):
+        turn = {"turn_id": uuid.uuid4().hex, "session_id": session_id, "message": message, "response": response,
+                "timestamp": timestamp}
+        if self.write_queue is None:
+            await self.turns.insert_many([turn])
+        else:
+            await self.write_queue.put(self.turns, turn)
+
+    async def forget_turns(self, session_id: str, count: int = 1):
+        await self.sessions.update_one({"session_id": session_id}, {"$inc": {"turn_count": -count}})
+
+    def stats(self) -> dict:
+        return {"upserts": self.upserts, "known": self.known.stats()}
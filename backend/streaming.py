@@ -0,0 +1,82 @@
+import json
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+try:
+    # litellm ships with emergentintegrations and is what LlmChat calls under the hood;
+    # LlmChat itself only returns the finished completion, so streaming goes through it directly
+    import litellm
+except ImportError:
+    litellm = None
+
+STREAM_MODEL = "gemini/gemini-2.0-flash"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # keep nginx/ingress from buffering the event stream
+}
+
+
+def streaming_available() -> bool:
+    return litellm is not None
+
+
+def sse_event(data: dict, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    lines = f"id: {event_id}\n" if event_id else ""
+    if event:
+        lines += f"event: {event}\n"
+    return f"{lines}data: {payload}\n\n"
+
+
+def build_messages(system_message: str, prompt: str) -> List[dict]:
+    # Conversation history, when there is any, is already part of the prompt
+    return [{"role": "system", "content": system_message}, {"role": "user", "content": prompt}]
+
+
+async def stream_completion(system_message: str, prompt: str, api_key: str, max_tokens: int = 4096) -> AsyncIterator[str]:
+    """Yield completion tokens as the model produces them.
+
+    Only available when litellm is installed (see streaming_available());
+    callers fall back to a complete reply otherwise.
+    """
+    if litellm is None:
+        raise RuntimeError("Token streaming is not available")
+
+    response = await litellm.acompletion(
+        model=STREAM_MODEL,
+        messages=build_messages(system_message, prompt),
+        api_key=api_key,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+    async for chunk in response:
+        token = chunk.choices[0].delta.content
+        if token:
+            yield token
+
+
+async def relay_stream(tokens: AsyncIterator[str], on_complete: Callable[[str], Awaitable[dict]],
+                       meta: Optional[dict] = None) -> AsyncIterator[str]:
+    """Forward tokens as SSE events, then persist the full text through on_complete.
+
+    on_complete returns the payload of the final "done" event.
+    """
+    if meta:
+        yield sse_event(meta, event="meta")
+
+    parts = []
+    try:
+        async for token in tokens:
+            parts.append(token)
+            yield sse_event({"token": token})
+        done = await on_complete("".join(parts))
+        yield sse_event(done, event="done")
+    except Exception as e:
+        yield sse_event({"detail": str(e)}, event="error")
+
+
+async def text_stream(text: str) -> AsyncIterator[str]:
+    """Wrap an already complete reply so it can go through relay_stream"""
+    yield text
@@ -0,0 +1,67 @@
+import base64
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import json_util
+
+from pagination import InvalidCursor, keyset_filter
+
+# Delta sync helpers. A sync cursor holds, per stream (each synced
+# collection and its tombstones), the (timestamp, id) of the last
+# document the client has; the next sync returns what changed after it, in
+# timestamp order, through the same keyset filters the list endpoints use.
+#
+# A write can carry a timestamp slightly older than a concurrent read that
+# already went past it, so unless a page was cut short the cursor never
+# moves beyond now - SETTLE. Clients get the last few seconds again and
+# apply changes by id, which makes that harmless.
+
+SYNC_KINDS = ["note", "reminder"]
+
+CHANGES_SORT = [("updated_at", 1), ("id", 1)]
+TOMBSTONES_SORT = [("deleted_at", 1), ("id", 1)]
+
+SETTLE = timedelta(seconds=5)
+
+
+def encode_sync_cursor(positions: Dict[str, Optional[list]]) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(positions).encode("utf-8")).decode("ascii")
+
+
+def decode_sync_cursor(cursor: str) -> Dict[str, Optional[list]]:
+    try:
+        positions = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(positions, dict) or not all(
+        value is None or _is_position(value) for value in positions.values()
+    ):
+        raise InvalidCursor("Invalid cursor")
+    return positions
+
+
+def _is_position(value) -> bool:
+    """[timestamp, id], as next_position writes it"""
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], datetime) and isinstance(value[1], str)
+
+
+def tombstone_stream(kind: str) -> str:
+    return f"{kind}.deleted"
+
+
+def oldest_position(positions: Dict[str, Optional[list]]) -> Optional[datetime]:
+    times = [value[0] for value in positions.values() if value]
+    return min(times) if times else None
+
+
+def after(position: Optional[list], sort: list) -> dict:
+    return keyset_filter(position, sort) if position else {}
+
+
+def next_position(position: Optional[list], documents: List[dict], limit: int, sort: list, now: datetime) -> list:
+    """Where the next sync of this stream starts"""
+    if len(documents) == limit:
+        # More to fetch: continue right after this page
+        return [documents[-1][field] for field, _ in sort]
+    settled = [now - SETTLE, ""]
+    return max(position, settled) if position else settled
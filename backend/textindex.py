@@ -0,0 +1,301 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# What /api/find covers: per kind, the Mongo collection, the field shown as
+# the result title, the field used for the snippet and the indexed fields
+# with their weights (a title match counts more than a body match).
+SEARCHABLE = {
+    "note": {
+        "collection": "notes",
+        "title": "title",
+        "snippet": "content",
+        "fields": {"title": 3, "tags": 2, "category": 1, "content": 1},
+    },
+    "reminder": {
+        "collection": "reminders",
+        "title": "title",
+        "snippet": "description",
+        "fields": {"title": 3, "description": 1},
+    },
+    "search": {
+        "collection": "searches",
+        "title": "query",
+        "snippet": "results",
+        "fields": {"query": 3, "results": 1},
+    },
+    "code": {
+        "collection": "code_analyses",
+        "title": "description",
+        "snippet": "analysis",
+        "fields": {"description": 2, "language": 1, "analysis": 1},
+    },
+}
+
+SNIPPET_CHARS = 160
+
+STOPWORDS = set("""
+a o as os e de do da dos das em no na nos nas um uma uns umas para pra por pelo pela pelos pelas
+com sem sob sobre que se nao ao aos ou mas como mais menos muito muita ja so ate entre depois antes
+eu tu ele ela nos vos eles elas voce voces me te lhe lhes meu minha meus minhas teu tua seu sua seus suas
+nosso nossa este esta estes estas esse essa esses essas isto isso aquilo aquele aquela quando onde qual quem
+ser ter foi era sao esta estao tem ha the and of to in is for on with
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Light Portuguese stemmer: plural and derivational suffixes, then a final
+# vowel so that gender/number variants share a stem (reunião/reuniões,
+# novo/nova, programação/programar). Rules apply to accent-folded words.
+PLURAL_RULES = [("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("ns", "m"),
+                ("res", "r"), ("zes", "z"), ("ses", "s"), ("les", "l")]
+SUFFIXES = ["amentos", "imentos", "amento", "imento", "mente", "acoes", "icoes", "acao", "icao",
+            "ancia", "encia", "adora", "ador", "edor", "idor", "avel", "ivel", "ista", "ismo",
+            "ando", "endo", "indo", "ado", "ada", "ido", "ida", "oso", "osa", "ivo", "iva",
+            "ar", "er", "ir"]
+MIN_STEM = 3
+
+
+@lru_cache(maxsize=100000)
+def stem(word: str) -> str:
+    if len(word) <= MIN_STEM or word.isdigit():
+        return word
+    for suffix, replacement in PLURAL_RULES:
+        if word.endswith(suffix):
+            word = word[:-len(suffix)] + replacement
+            break
+    else:
+        if word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    if len(word) > MIN_STEM and word[-1] in "aeo":
+        word = word[:-1]
+    return word
+
+
+def fold(text: str) -> str:
+    """Lowercase ASCII version of text (accents removed, other symbols dropped)"""
+    return unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+
+
+def words(text: str) -> List[str]:
+    """Accent-folded words of text, without stopwords"""
+    return [w for w in TOKEN_RE.findall(fold(text)) if w not in STOPWORDS]
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded, stemmed terms of text, without stopwords"""
+    return [stem(w) for w in words(text)]
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+def field_text(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return str(value or "")
+
+
+class TextIndex:
+    """In-memory BM25 index over the user's notes, reminders, searches and code analyses.
+
+    Documents are added, replaced and removed one at a time as the API
+    writes them. Posting lists are kept as dicts for cheap updates and
+    turned into numpy arrays on first use, so a query is a few vectorized
+    passes over the postings of its terms. Query terms that are not in the
+    vocabulary are matched to terms one edit away, and the last query word
+    also matches as a prefix (as-you-type search); both count for less
+    than an exact match.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    FUZZY_WEIGHT = 0.5
+    MAX_EXPANSIONS = 20
+
+    def __init__(self, capacity: int = 1024):
+        self._keys: List[Optional[Tuple[str, str]]] = []
+        self._docids: Dict[Tuple[str, str], int] = {}
+        self._free: List[int] = []
+        self._terms: List[Optional[Counter]] = []
+        self._meta: List[Optional[dict]] = []
+        self._lengths = np.zeros(capacity, dtype=np.float32)
+        self._kinds = np.full(capacity, -1, dtype=np.int8)
+        self._kind_codes = {kind: code for code, kind in enumerate(SEARCHABLE)}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # Folded (unstemmed) words seen so far -> their stem, bucketed by first two letters
+        self._words: Dict[str, Dict[str, str]] = defaultdict(dict)
+        self._total_length = 0.0
+        self.ready = False
+
+    def __len__(self):
+        return len(self._docids)
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        docid = len(self._keys)
+        if docid >= len(self._lengths):
+            self._lengths = np.concatenate([self._lengths, np.zeros(len(self._lengths), dtype=np.float32)])
+            self._kinds = np.concatenate([self._kinds, np.full(len(self._kinds), -1, dtype=np.int8)])
+        self._keys.append(None)
+        self._terms.append(None)
+        self._meta.append(None)
+        return docid
+
+    def add(self, kind: str, document: dict):
+        """Index (or re-index) a document of the given kind; it must have an id"""
+        spec = SEARCHABLE[kind]
+        key = (kind, document["id"])
+        self.remove(kind, document["id"])
+
+        terms = Counter()
+        for field, weight in spec["fields"].items():
+            for word, count in Counter(words(field_text(document.get(field)))).items():
+                term = stem(word)
+                terms[term] += weight * count
+                self._words[word[:2]][word] = term
+
+        docid = self._allocate()
+        self._keys[docid] = key
+        self._docids[key] = docid
+        self._terms[docid] = terms
+        self._meta[docid] = {
+            "title": field_text(document.get(spec["title"]))[:SNIPPET_CHARS],
+            "snippet": field_text(document.get(spec["snippet"]))[:SNIPPET_CHARS],
+        }
+        length = float(sum(terms.values()))
+        self._lengths[docid] = length
+        self._kinds[docid] = self._kind_codes[kind]
+        self._total_length += length
+
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+            postings[docid] = tf
+            self._arrays.pop(term, None)
+
+    def add_many(self, kind: str, documents: Iterable[dict]):
+        for document in documents:
+            self.add(kind, document)
+
+    def remove(self, kind: str, doc_id: str) -> bool:
+        docid = self._docids.pop((kind, doc_id), None)
+        if docid is None:
+            return False
+
+        for term in self._terms[docid]:
+            postings = self._postings[term]
+            del postings[docid]
+            if not postings:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+
+        self._total_length -= float(self._lengths[docid])
+        self._lengths[docid] = 0
+        self._kinds[docid] = -1
+        self._keys[docid] = self._terms[docid] = self._meta[docid] = None
+        self._free.append(docid)
+        return True
+
+    def _postings_array(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float32, count=len(postings)),
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    def _expand(self, word: str, prefix: bool) -> List[Tuple[str, float]]:
+        """Vocabulary terms to score for one query word, with their weights"""
+        term = stem(word)
+        if term in self._postings and not prefix:
+            return [(term, 1.0)]
+
+        matches = {}
+        if term in self._postings:
+            matches[term] = 1.0
+        # Typos and prefixes are matched on whole words, before stemming
+        for candidate, candidate_term in self._words.get(word[:2], {}).items():
+            if candidate_term in matches or candidate_term not in self._postings:
+                continue
+            if prefix and candidate.startswith(word):
+                matches[candidate_term] = self.FUZZY_WEIGHT
+            elif len(word) > 3 and term not in self._postings and within_one_edit(word, candidate):
+                matches[candidate_term] = self.FUZZY_WEIGHT
+            if len(matches) >= self.MAX_EXPANSIONS:
+                break
+        return list(matches.items())
+
+    def search(self, query: str, kinds: Optional[List[str]] = None, limit: int = 20) -> List[dict]:
+        query_words = words(query)
+        if not query_words or not self._docids:
+            return []
+
+        n = len(self._keys)
+        avgdl = self._total_length / len(self._docids) or 1.0
+        scores = np.zeros(n, dtype=np.float32)
+        for position, word in enumerate(query_words):
+            # The last word may still be being typed
+            prefix = position == len(query_words) - 1 and not query.endswith(tuple(" .?!"))
+            for term, weight in self._expand(word, prefix):
+                ids, tfs = self._postings_array(term)
+                idf = math.log(1 + (len(self._docids) - len(ids) + 0.5) / (len(ids) + 0.5))
+                norm = self.K1 * (1 - self.B + self.B * self._lengths[ids] / avgdl)
+                scores[ids] += weight * idf * tfs * (self.K1 + 1) / (tfs + norm)
+
+        if kinds:
+            allowed = np.isin(self._kinds[:n], [self._kind_codes[k] for k in kinds])
+            scores[~allowed] = 0
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+
+        return [
+            {
+                "type": self._keys[docid][0],
+                "id": self._keys[docid][1],
+                **self._meta[docid],
+                "score": round(float(scores[docid]), 4),
+            }
+            for docid in hits
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "documents": len(self._docids),
+            "terms": len(self._postings),
+            "by_type": {
+                kind: int(np.count_nonzero(self._kinds[:len(self._keys)] == code))
+                for kind, code in self._kind_codes.items()
+            },
+        }
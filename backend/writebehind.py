@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from bson.errors import BSONError
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class WriteQueueClosed(RuntimeError):
+    pass
+
+
+def is_permanent(error: BaseException) -> bool:
+    """Errors that retrying the same documents cannot fix, e.g. a document
+    too large or impossible to encode as BSON"""
+    return isinstance(error, (BSONError, TypeError, ValueError))
+
+
+class WriteBehindQueue:
+    """Buffers inserts and writes them in the background with insert_many.
+
+    Each repository's documents are written in the order they were queued.
+    A batch takes up to max_batch queued documents and writes them with one
+    ordered insert_many per repository, so documents for different
+    collections queued alternately still share round-trips. At most max_pending documents are buffered
+    (queued or being written); past that, put() waits, which is reported as
+    backpressure. Failed batches are retried with backoff, resuming after
+    the last written document, so nothing is lost or written twice while
+    Mongo is slow or briefly unavailable. A document that can never be
+    written (too large, not encodable) is dropped and logged instead, so it
+    cannot hold up the rest. A repository whose insert_many returns fewer
+    than it was given has failed the rest itself; they are counted as
+    failed. close() flushes everything that was queued.
+    """
+
+    def __init__(self, max_batch: int = 500, max_pending: int = 10000, flush_interval: float = 0.05,
+                 retry_backoff: float = 0.5, max_backoff: float = 5.0,
+                 on_flush: Optional[Callable[[], None]] = None):
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.on_flush = on_flush
+
+        self._pending = deque()
+        self._writing = 0
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closing = False
+
+        self.queued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.high_water = 0
+        self.backpressure_waits = 0
+        self.backpressure_seconds = 0.0
+        self.flush_seconds_total = 0.0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + self._writing
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._closing = False
+            self._worker = asyncio.create_task(self._run())
+
+    async def put(self, repository, document: dict):
+        """Queue a document for insertion, waiting while the buffer is full"""
+        if self._closing:
+            raise WriteQueueClosed("Write queue is closed")
+        self.start()
+
+        if self.pending >= self.max_pending:
+            self.backpressure_waits += 1
+            start = time.perf_counter()
+            while self.pending >= self.max_pending:
+                self._space.clear()
+                await self._space.wait()
+            self.backpressure_seconds += time.perf_counter() - start
+
+        self._pending.append((repository, document))
+        self.queued += 1
+        self.high_water = max(self.high_water, self.pending)
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def flush(self):
+        """Wait until everything queued so far has been written"""
+        await self._idle.wait()
+
+    async def close(self, timeout: float = 10.0):
+        """Stop accepting documents and write out the buffer"""
+        self._closing = True
+        self._wakeup.set()
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._worker), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Write queue did not drain in %ss; %d documents not written", timeout, self.pending)
+            self._worker.cancel()
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._idle.set()
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            if len(self._pending) < self.max_batch and not self._closing:
+                # Give concurrent requests a moment to add to this batch
+                await asyncio.sleep(self.flush_interval)
+
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            self._writing = len(batch)
+            start = time.perf_counter()
+            by_repository: Dict[object, List[dict]] = {}
+            for repository, document in batch:
+                by_repository.setdefault(repository, []).append(document)
+            for repository, documents in by_repository.items():
+                await self._write(repository, documents)
+            self.last_flush_seconds = time.perf_counter() - start
+            self.flush_seconds_total += self.last_flush_seconds
+            self.batches += 1
+            self._writing = 0
+            self._space.set()
+
+            if self.on_flush is not None:
+                self.on_flush()
+
+    async def _write(self, repository, documents: List[dict]):
+        delay = self.retry_backoff
+        while documents:
+            try:
+                written = await repository.insert_many(documents, ordered=True)
+                self.written += written
+                self.failed += len(documents) - written
+                return
+            except BulkWriteError as e:
+                # Ordered insert: everything before the first error was written, nothing after it
+                self.written += e.details.get("nInserted", 0)
+                error = e.details["writeErrors"][0]
+                if error.get("code") == DUPLICATE_KEY:
+                    # Already stored (e.g. by an attempt that timed out after writing)
+                    self.written += 1
+                else:
+                    self.failed += 1
+                    logger.error("Dropping document that cannot be inserted: %s", error.get("errmsg"))
+                documents = documents[error["index"] + 1:]
+            except Exception as e:
+                if is_permanent(e):
+                    await self._isolate(repository, documents, e)
+                    return
+                self.retries += 1
+                logger.warning("Batch insert of %d documents failed, retrying in %.1fs: %s", len(documents), delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    async def _isolate(self, repository, documents: List[dict], error: BaseException):
+        """Write a batch that hit a permanent error in halves, dropping only the documents that cause it"""
+        if len(documents) == 1:
+            self.failed += 1
+            logger.error("Dropping document that cannot be inserted: %s", error)
+            return
+        middle = len(documents) // 2
+        await self._write(repository, documents[:middle])
+        await self._write(repository, documents[middle:])
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "high_water": self.high_water,
+            "queued": self.queued,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "avg_batch_size": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 3),
+            "avg_flush_ms": round(self.flush_seconds_total * 1000 / self.batches, 3) if self.batches else 0.0,
+            "backpressure_waits": self.backpressure_waits,
+            "backpressure_seconds": round(self.backpressure_seconds, 3),
+        }
@@ -76,6 +76,74 @@ const App = () => {
     scrollToBottom();
   }, [messages]);
 
+  // Server push: patch the lists from change events instead of reloading them
+  useEffect(() => {
+    if (!isAuthenticated || !window.EventSource) return;
+
+    const source = new EventSource(`${BACKEND_URL}/api/events`);
+    let dashboardTimer = null;
+    const refreshDashboard = () => {
+      clearTimeout(dashboardTimer);
+      dashboardTimer = setTimeout(loadDashboard, 300);
+    };
+    const reloadAll = () => {
+      loadNotes();
+      loadReminders();
+      loadDashboard();
+    };
+    // Versions are consecutive, so a gap means events were missed
+    let lastVersion = null;
+    const missed = (version) => {
+      const gap = lastVersion !== null && version !== lastVersion + 1;
+      lastVersion = version;
+      return gap;
+    };
+    const on = (type, handler) => {
+      source.addEventListener(type, (event) => {
+        const change = JSON.parse(event.data);
+        if (missed(change.version)) {
+          reloadAll();
+          return;
+        }
+        handler(change.data);
+        refreshDashboard();
+      });
+    };
+    const byDate = (a, b) => new Date(a.date) - new Date(b.date);
+    const merge = (setList) => (data) => setList(prev => prev.map(item => item.id === data.id ? {...item, ...data} : item));
+    const remove = (setList) => (data) => setList(prev => prev.filter(item => item.id !== data.id));
+
+    on('note.created', (note) => setNotes(prev => [note, ...prev.filter(item => item.id !== note.id)]));
+    ['note.updated', 'note.completed', 'note.uncompleted'].forEach(type => on(type, merge(setNotes)));
+    on('note.deleted', remove(setNotes));
+    on('reminder.created', (reminder) => setReminders(prev => [...prev.filter(item => item.id !== reminder.id), reminder].sort(byDate)));
+    ['reminder.completed', 'reminder.uncompleted'].forEach(type => on(type, merge(setReminders)));
+    on('reminder.deleted', remove(setReminders));
+    on('reminder.due', (reminder) => {
+      if (window.Notification && Notification.permission === 'granted') {
+        new Notification(`⏰ ${reminder.title}`, { body: reminder.description });
+      }
+    });
+    ['chat.created', 'chat.deleted', 'search.created', 'search.deleted', 'code.created', 'code.deleted'].forEach(type => on(type, () => {}));
+    on('data.imported', reloadAll);
+    // Caught up after (re)connecting; resync means events were missed (e.g. the server restarted
+    // or this client fell behind), so reload everything once
+    source.addEventListener('ready', (event) => { lastVersion = JSON.parse(event.data).version; });
+    source.addEventListener('resync', (event) => {
+      lastVersion = JSON.parse(event.data).version;
+      reloadAll();
+    });
+
+    if (window.Notification && Notification.permission === 'default') {
+      Notification.requestPermission();
+    }
+
+    return () => {
+      clearTimeout(dashboardTimer);
+      source.close();
+    };
+  }, [isAuthenticated]);
+
   useEffect(() => {
     if (activeTab === 'notes' && isAuthenticated) {
       loadNotes();
@@ -172,30 +240,17 @@ const App = () => {
         const aiMessage = { text: data.response, sender: 'ai', timestamp: new Date() };
         setMessages(prev => [...prev, aiMessage]);
         
-        // Check if a note or reminder was created
-        if (data.response.includes('✅ Nota criada') || data.response.includes('⏰ Lembrete criado')) {
-          // Refresh immediately and show notification
-          if (data.response.includes('✅ Nota criada')) {
-            loadNotes(); // Refresh notes immediately
-            setTimeout(() => {
-              alert('✅ Nota criada! Veja na seção Notas.');
-            }, 500);
-          } 
-          
-          if (data.response.includes('⏰ Lembrete criado')) {
-            loadReminders(); // Refresh reminders immediately
-            setTimeout(() => {
-              alert('⏰ Lembrete criado! Veja na seção Lembretes.');
-            }, 500);
-          }
-          
-          // Refresh dashboard
+        // Check if a note or reminder was created (the lists update from server events)
+        if (data.response.includes('✅ Nota criada')) {
+          setTimeout(() => {
+            alert('✅ Nota criada! Veja na seção Notas.');
+          }, 500);
+        }
+        
+        if (data.response.includes('⏰ Lembrete criado')) {
           setTimeout(() => {
-            loadDashboard();
-          }, 300);
-        } else {
-          // Always refresh dashboard for normal chats
-          loadDashboard();
+            alert('⏰ Lembrete criado! Veja na seção Lembretes.');
+          }, 500);
         }
       } else {
         throw new Error(data.detail || 'Error sending message');
@@ -266,7 +321,6 @@ const App = () => {
 
       const data = await response.json();
       setSearchResults(data.results);
-      loadDashboard();
     } catch (error) {
       console.error('Error searching:', error);
       setSearchResults('Erro na pesquisa. Tente novamente.');
@@ -303,7 +357,6 @@ const App = () => {
 
       const data = await response.json();
       setCodeAnalysis(data.analysis);
-      loadDashboard();
     } catch (error) {
       console.error('Error analyzing code:', error);
       setCodeAnalysis('Erro na análise. Tente novamente.');
@@ -331,8 +384,6 @@ const App = () => {
 
       if (response.ok) {
         setNoteForm({ title: '', content: '', category: 'general', tags: '' });
-        loadNotes();
-        loadDashboard();
       }
     } catch (error) {
       console.error('Error saving note:', error);
@@ -358,8 +409,6 @@ const App = () => {
 
       if (response.ok) {
         setReminderForm({ title: '', description: '', date: '', priority: 'medium' });
-        loadReminders();
-        loadDashboard();
       }
     } catch (error) {
       console.error('Error saving reminder:', error);
@@ -381,11 +430,6 @@ const App = () => {
         setNotes(prev => prev.map(note => 
           note.id === noteId ? {...note, completed: !completed} : note
         ));
-        
-        setTimeout(() => {
-          loadNotes();
-          loadDashboard();
-        }, 100);
       } else {
         throw new Error('Falha ao atualizar nota');
       }
@@ -412,11 +456,6 @@ const App = () => {
         setReminders(prev => prev.map(reminder => 
           reminder.id === reminderId ? {...reminder, completed: !completed} : reminder
         ));
-        
-        setTimeout(() => {
-          loadReminders();
-          loadDashboard();
-        }, 100);
       } else {
         throw new Error('Falha ao atualizar lembrete');
       }
@@ -471,10 +510,6 @@ const App = () => {
         
         setShowActivityModal(false);
         
-        setTimeout(() => {
-          loadDashboard();
-        }, 100);
-        
         alert('Item deletado com sucesso!');
       } else {
         const errorData = await response.json();
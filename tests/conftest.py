@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend is run as a flat set of modules (uvicorn server:app), so make
+# them importable the same way here.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
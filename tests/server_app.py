@@ -0,0 +1,113 @@
+"""Runs server.py in-process for endpoint tests.
+
+MongoDB is replaced by mongomock_motor and Gemini by FakeLlmChat, so the
+tests need neither a database nor network access. The app is started once
+per test run: its queues and schedulers are bound to the event loop of the
+TestClient that started them.
+"""
+import atexit
+import sys
+import types
+import unittest
+from unittest import mock
+
+try:
+    import mongomock_motor
+except ImportError:
+    mongomock_motor = None
+
+INTENT_MARKER = "analisador de intenções"
+
+
+class FakeLlmChat:
+    """Answers locally: CONVERSAR to the intent profile, an echo otherwise"""
+
+    calls = 0
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.system_message = system_message or ""
+        self.messages = []
+
+    def with_model(self, provider, model):
+        return self
+
+    def with_max_tokens(self, max_tokens):
+        return self
+
+    async def send_message(self, message):
+        FakeLlmChat.calls += 1
+        if INTENT_MARKER in self.system_message:
+            return "CONVERSAR"
+        return "resposta para: " + message.text[:50]
+
+
+class _UserMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+def _provide_llm_sdk():
+    """The provider SDK is a private package; tests only need its two names"""
+    try:
+        import emergentintegrations.llm.chat  # noqa: F401
+    except ImportError:
+        package = types.ModuleType("emergentintegrations")
+        llm = types.ModuleType("emergentintegrations.llm")
+        chat = types.ModuleType("emergentintegrations.llm.chat")
+        chat.LlmChat, chat.UserMessage = FakeLlmChat, _UserMessage
+        package.llm, llm.chat = llm, chat
+        sys.modules.update({"emergentintegrations": package, "emergentintegrations.llm": llm,
+                            "emergentintegrations.llm.chat": chat})
+
+
+_server = None
+_client = None
+
+
+def load_server():
+    global _server, _client
+    if _server is not None:
+        return _server, _client
+
+    from fastapi.testclient import TestClient
+
+    _provide_llm_sdk()
+    # database.py may already be imported by other tests with a real client
+    sys.modules.pop("database", None)
+    with mock.patch("motor.motor_asyncio.AsyncIOMotorClient", mongomock_motor.AsyncMongoMockClient):
+        import server
+    # mongomock's client options are a Mock
+    sys.modules["database"].client.options.pool_options.max_pool_size = 100
+    server.llm_pool.factory = lambda profile: FakeLlmChat(system_message=profile.system_message)
+
+    _server, _client = server, TestClient(server.app)
+    _client.__enter__()
+    atexit.register(_client.__exit__, None, None, None)
+    return _server, _client
+
+
+@unittest.skipUnless(mongomock_motor, "mongomock_motor not installed")
+class ServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.client = load_server()
+
+    def setUp(self):
+        self.call(self.reset)
+
+    async def reset(self):
+        await self.server.write_queue.flush()
+        for name in await self.server.db.list_collection_names():
+            await self.server.db[name].delete_many({})
+        self.server.dashboard_cache.invalidate()
+        self.server.search_cache.memory.invalidate()
+        self.server.code_cache.memory.invalidate()
+        self.server.session_store.known.invalidate()
+        self.server.chat_context.summaries.invalidate()
+
+    def call(self, fn, *args):
+        """Run a coroutine function on the app's event loop"""
+        return self.client.portal.call(fn, *args)
+
+    def flush(self):
+        self.call(self.server.write_queue.flush)
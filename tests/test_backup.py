@@ -0,0 +1,190 @@
+import asyncio
+import gzip
+import json
+import time
+import tracemalloc
+import unittest
+from datetime import datetime
+
+from bson import ObjectId
+
+from backup import InvalidImport, export_chunks, gzip_chunks, import_lines, ndjson_lines, parse_collections
+from tests.server_app import ServerTestCase
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents():
+            yield document
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query):
+        return FakeCursor(self.documents)
+
+
+def notes(count):
+    """Generated on demand, like documents coming off a Mongo cursor"""
+    return lambda: ({"_id": ObjectId(), "id": str(i), "title": f"nota {i}", "content": "x" * 200,
+                     "created_at": datetime(2025, 1, 1, 12, 0, 0, 123000)} for i in range(count))
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+async def from_bytes(data, chunk_size=7):
+    for i in range(0, len(data), chunk_size):
+        yield data[i:i + chunk_size]
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+
+    async def write(self, collection, documents):
+        self.batches.append((collection, documents))
+        return {"upserted": len(documents), "matched": 0, "failed": 0}
+
+
+class BackupTest(unittest.TestCase):
+    def setUp(self):
+        self.database = {
+            "notes": FakeCollection(notes(5)),
+            "chats": FakeCollection(lambda: iter([{"_id": ObjectId("65a000000000000000000001"), "session_id": "s", "message": "oi"}])),
+        }
+
+    def test_round_trip_plain_and_gzip(self):
+        for compress in (False, True):
+            chunks = export_chunks(self.database, ["notes", "chats"], batch_size=2)
+            if compress:
+                chunks = gzip_chunks(chunks)
+            data = b"".join(asyncio.run(collect(chunks)))
+            if compress:
+                self.assertEqual(gzip.decompress(data).count(b"\n"), 6)
+
+            recorder = Recorder()
+            report = asyncio.run(import_lines(ndjson_lines(from_bytes(data)), recorder.write, batch_size=2))
+            self.assertEqual(report["collections"]["notes"]["upserted"], 5)
+            self.assertEqual([len(docs) for name, docs in recorder.batches if name == "notes"], [2, 2, 1])
+
+            note = recorder.batches[0][1][0]
+            self.assertNotIn("_id", note)
+            self.assertEqual(note["created_at"], datetime(2025, 1, 1, 12, 0, 0, 123000))
+            chat = [docs for name, docs in recorder.batches if name == "chats"][0][0]
+            self.assertEqual(chat["_id"], ObjectId("65a000000000000000000001"))
+
+    def test_bad_lines_are_skipped_and_reported(self):
+        body = b"\n".join([
+            json.dumps({"collection": "notes", "document": {"id": "1", "title": "ok"}}).encode(),
+            b"{not json",
+            json.dumps({"collection": "users", "document": {"id": "2"}}).encode(),
+            json.dumps({"collection": "notes", "document": {"title": "sem id"}}).encode(),
+            b"",
+        ])
+        recorder = Recorder()
+        report = asyncio.run(import_lines(ndjson_lines(from_bytes(body)), recorder.write))
+        self.assertEqual(report["collections"], {"notes": {"upserted": 1, "matched": 0, "failed": 0}})
+        self.assertEqual(report["skipped"], 3)
+        self.assertEqual([error["line"] for error in report["errors"]], [2, 3, 4])
+
+        with self.assertRaises(ValueError):
+            parse_collections("notes,users")
+        with self.assertRaises(InvalidImport):
+            asyncio.run(collect(ndjson_lines(from_bytes(b"x" * (16 * 2**20 + 10), chunk_size=2**20))))
+
+    def test_memory_is_flat_in_dataset_size(self):
+        """Peak memory of a gzipped export + import, 4k vs 40k notes"""
+        peaks = {}
+        for count in (4000, 40000):
+            database = {"notes": FakeCollection(notes(count))}
+
+            async def discard(collection, documents):
+                return {"upserted": len(documents)}
+
+            async def pipe():
+                chunks = gzip_chunks(export_chunks(database, ["notes"], batch_size=100))
+                return await import_lines(ndjson_lines(chunks), discard, batch_size=100)
+
+            start = time.perf_counter()
+            report = asyncio.run(pipe())
+            elapsed = time.perf_counter() - start
+            self.assertEqual(report["collections"]["notes"]["upserted"], count)
+
+            tracemalloc.start()
+            asyncio.run(pipe())
+            peaks[count] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"\n{count} notes: export+import {count / elapsed:.0f} docs/s, peak {peaks[count] / 2**20:.1f} MiB")
+
+        self.assertLess(peaks[40000], peaks[4000] * 1.5)
+
+
+class ImportEndpointTest(ServerTestCase):
+    def test_imported_notes_reach_sync_clients(self):
+        exported_at = datetime(2020, 1, 1)
+        cursor = self.client.get("/api/sync").json()["cursor"]
+        body = "\n".join(json.dumps({"collection": collection, "document": document}) for collection, document in [
+            ("notes", {"id": "n1", "title": "Antiga", "content": "...", "updated_at": {"$date": "2020-01-01T00:00:00Z"}}),
+            ("reminders", {"id": "r1", "title": "Lembrete", "completed": True, "reminder_date": "2020-01-02T00:00:00"}),
+            ("searches", {"id": "s1", "query": "ia", "results": "...", "timestamp": {"$date": "2020-01-01T00:00:00Z"}}),
+        ]) + "\n"
+
+        report = self.client.post("/api/import", content=body.encode()).json()
+        self.assertEqual(report["collections"]["notes"], {"upserted": 1, "matched": 0, "failed": 0})
+        self.assertEqual(report["skipped"], 0)
+
+        changes = self.client.get("/api/sync", params={"cursor": cursor}).json()["changes"]
+        self.assertEqual([note["id"] for note in changes["note"]], ["n1"])
+        self.assertEqual([reminder["id"] for reminder in changes["reminder"]], ["r1"])
+        self.assertGreater(changes["note"][0]["updated_at"], exported_at.isoformat())
+        # Only the synced collections are restamped
+        search = self.call(self.server.searches_repo.get, "s1")
+        self.assertEqual(search["timestamp"], exported_at)
+
+    def test_import_replaces_cached_answers_and_summaries(self):
+        server = self.server
+        self.client.post("/api/search", json={"query": "O que é IA?"})
+        self.client.post("/api/chat", json={"message": "Oi", "session_id": "s"})
+        self.flush()
+        self.call(server.chat_context.get_summary, "s")
+        answered_at = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        body = "\n".join(json.dumps({"collection": collection, "document": document}) for collection, document in [
+            ("searches", {"id": "imported", "query": "O que é IA?", "query_hash": server.query_hash("O que é IA?"),
+                          "results": "resposta importada", "answered_at": {"$date": answered_at + "Z"}}),
+            ("sessions", {"session_id": "s", "summary": "resumo importado", "summary_upto": {"$date": answered_at + "Z"}}),
+        ]) + "\n"
+        self.assertEqual(self.client.post("/api/import", content=body.encode()).status_code, 200)
+
+        # The import's answer is newer than the cached one, and the cache no longer hides it
+        self.call(server.db.searches.delete_many, {"id": {"$ne": "imported"}})
+        answer = self.client.post("/api/search", json={"query": "O que é IA?"}).json()
+        self.assertEqual((answer["cached"], answer["results"]), (True, "resposta importada"))
+        self.assertEqual(self.call(server.chat_context.get_summary, "s")["text"], "resumo importado")
+
+    def test_export_round_trip(self):
+        self.client.post("/api/notes", json={"title": "Nota", "content": "..."})
+        self.flush()
+        exported = self.client.get("/api/export", params={"collections": "notes"}).content
+        self.call(self.server.db.notes.delete_many, {})
+
+        report = self.client.post("/api/import", content=exported).json()
+        self.assertEqual(report["collections"]["notes"]["upserted"], 1)
+        self.assertEqual(len(self.client.get("/api/notes").json()), 1)
+        self.assertEqual(self.client.post("/api/import", content=b"\x1f\x8bnot gzip").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+import unittest
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from bulk import item_results, retag_update, summary, unique_ids, update_operations
+from database import Repository
+
+# Set to a scratch MongoDB (e.g. mongodb://localhost:27017) to run the throughput benchmark
+BENCHMARK_MONGO_URL = os.environ.get("MONGO_BENCHMARK_URL")
+
+
+class BulkResultsTest(unittest.TestCase):
+    def test_per_item_status_in_request_order(self):
+        ids = ["a", "missing", "b", "c"]
+        targets = ["a", "b", "c"]
+        errors = [{"index": 1, "errmsg": "Document failed validation"}]
+        results, succeeded = item_results(ids, targets, errors, "completed")
+
+        self.assertEqual(succeeded, ["a", "c"])
+        self.assertEqual([r["status"] for r in results], ["completed", "not_found", "error", "completed"])
+        self.assertEqual(results[2]["error"], "Document failed validation")
+        self.assertEqual({k: v for k, v in summary(results).items() if k != "results"}, {"succeeded": 2, "failed": 2})
+
+    def test_operations(self):
+        self.assertEqual(unique_ids(["b", "a", "b"]), ["b", "a"])
+        operations = update_operations(["a", "b"], {"$set": {"completed": True}})
+        self.assertEqual(operations[1], UpdateOne({"id": "b"}, {"$set": {"completed": True}}))
+
+        now = datetime(2025, 1, 1)
+        stage = retag_update(["new"], ["old"], now)[0]["$set"]
+        self.assertEqual(stage["updated_at"], now)
+        self.assertEqual(stage["tags"]["$concatArrays"][1], ["new"])
+
+
+@unittest.skipUnless(BENCHMARK_MONGO_URL, "MONGO_BENCHMARK_URL not set")
+class BulkThroughputBenchmark(unittest.TestCase):
+    """Completing N reminders: N update_one round-trips vs. one bulk_write"""
+
+    SIZES = [10, 100, 1000]
+
+    def test_bulk_write_vs_per_item(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        async def run():
+            client = AsyncIOMotorClient(BENCHMARK_MONGO_URL)
+            database = client[f"ai_assistant_bulk_benchmark_{os.getpid()}"]
+            repository = Repository(database.reminders)
+            results = []
+            try:
+                await database.reminders.create_index("id", unique=True)
+                for size in self.SIZES:
+                    await database.reminders.delete_many({})
+                    await database.reminders.insert_many([{"id": str(i), "completed": False} for i in range(size)])
+                    ids = [str(i) for i in range(size)]
+
+                    start = time.perf_counter()
+                    for doc_id in ids:
+                        await repository.update(doc_id, {"completed": True, "updated_at": datetime.now()})
+                    per_item = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    await repository.bulk_write(update_operations(ids, {"$set": {"completed": False, "updated_at": datetime.now()}}))
+                    bulk = time.perf_counter() - start
+                    results.append((size, per_item, bulk))
+            finally:
+                await client.drop_database(database.name)
+                client.close()
+            return results
+
+        results = asyncio.run(run())
+        print()
+        for size, per_item, bulk in results:
+            print(f"{size:>5} reminders: per-item {size / per_item:8.0f}/s, bulk_write {size / bulk:8.0f}/s ({per_item / bulk:.1f}x)")
+
+        size, per_item, bulk = results[-1]
+        self.assertLess(bulk, per_item)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import asyncio
+import time
+import unittest
+
+from cache import SingleFlight, SnapshotCache, TTLCache, TwoTierCache, content_hash, normalize_query, query_hash
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = TTLCache(max_entries=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_expiry_and_counters(self):
+        cache = TTLCache(max_entries=10, ttl=0.01)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 0))
+
+    def test_normalized_query_key(self):
+        self.assertEqual(normalize_query("  Inteligência   ARTIFICIAL? "), "inteligencia artificial")
+        self.assertEqual(query_hash("artificial intelligence"), query_hash("Artificial  Intelligence"))
+        self.assertNotEqual(query_hash("artificial intelligence"), query_hash("machine learning"))
+
+    def test_content_hash_is_exact(self):
+        self.assertEqual(content_hash("x = 1", "python", "analyze"), content_hash("x = 1", "python", "analyze"))
+        self.assertNotEqual(content_hash("x = 1", "python"), content_hash("X = 1", "python"))
+        # Part boundaries matter: ("ab", "c") and ("a", "bc") must not collide
+        self.assertNotEqual(content_hash("ab", "c"), content_hash("a", "bc"))
+
+
+class TwoTierCacheTest(unittest.TestCase):
+    def test_store_hits_are_promoted_to_memory(self):
+        lookups = []
+
+        async def lookup(key):
+            lookups.append(key)
+            return "stored" if key == "known" else None
+
+        cache = TwoTierCache(TTLCache(max_entries=10, ttl=60), lookup)
+
+        async def run():
+            return [await cache.get("known"), await cache.get("known"), await cache.get("unknown")]
+
+        self.assertEqual(asyncio.run(run()), ["stored", "stored", None])
+        self.assertEqual(lookups, ["known", "unknown"])
+        stats = cache.stats()
+        self.assertEqual((stats["memory_hits"], stats["store_hits"], stats["misses"]), (1, 1, 1))
+
+
+class SnapshotCacheTest(unittest.TestCase):
+    def test_concurrent_misses_build_once(self):
+        cache = SnapshotCache(ttl=60)
+        builds = []
+
+        async def build():
+            builds.append(1)
+            await asyncio.sleep(0.01)
+            return {"total_notes": len(builds)}
+
+        async def run():
+            return await asyncio.gather(*(cache.get(build) for _ in range(10)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(builds), 1)
+        self.assertTrue(all(r == {"total_notes": 1} for r in results))
+
+    def test_invalidate_during_build_is_not_stored(self):
+        cache = SnapshotCache(ttl=60)
+
+        async def build():
+            cache.invalidate()  # a write lands while the snapshot is being computed
+            return "stale"
+
+        async def fresh():
+            return "fresh"
+
+        async def run():
+            return await cache.get(build), await cache.get(fresh), await cache.get(fresh)
+
+        self.assertEqual(asyncio.run(run()), ("stale", "fresh", "fresh"))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_thundering_herd_collapses_to_one_call(self):
+        """N identical concurrent requests -> outbound LLM calls, with and without coalescing"""
+        calls = {"n": 0}
+
+        async def fake_llm():
+            calls["n"] += 1
+            await asyncio.sleep(0.05)
+            return "resposta"
+
+        async def herd(size, flight):
+            if flight is None:
+                return await asyncio.gather(*(fake_llm() for _ in range(size)))
+            return await asyncio.gather(*(flight.do("search:ia", fake_llm) for _ in range(size)))
+
+        print()
+        for size in [10, 100, 1000]:
+            calls["n"] = 0
+            asyncio.run(herd(size, None))
+            uncoalesced = calls["n"]
+
+            calls["n"] = 0
+            flight = SingleFlight()
+            start = time.perf_counter()
+            results = asyncio.run(herd(size, flight))
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{size:>5} concurrent requests: {uncoalesced} LLM calls -> {calls['n']} with single-flight ({elapsed:.0f} ms)")
+
+            self.assertEqual(results, ["resposta"] * size)
+            self.assertEqual(calls["n"], 1)
+            self.assertEqual(flight.stats()["coalesced"], size - 1)
+            self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_distinct_keys_and_later_calls_are_not_shared(self):
+        flight = SingleFlight()
+
+        async def value(v):
+            await asyncio.sleep(0.01)
+            return v
+
+        async def run():
+            first = await asyncio.gather(flight.do("a", lambda: value(1)), flight.do("b", lambda: value(2)))
+            second = await flight.do("a", lambda: value(3))
+            return first, second
+
+        self.assertEqual(asyncio.run(run()), ([1, 2], 3))
+        self.assertEqual(flight.stats()["calls"], 3)
+        self.assertEqual(flight.stats()["coalesced"], 0)
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("quota")
+
+        async def run():
+            return await asyncio.gather(*(flight.do("k", failing) for _ in range(5)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(flight.stats()["failures"], 1)
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_cancelled_caller_does_not_cancel_shared_call(self):
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            return "ok"
+
+        async def run():
+            leader = asyncio.ensure_future(flight.do("k", slow))
+            follower = asyncio.ensure_future(flight.do("k", slow))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(asyncio.run(run()), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from database import delete_orphan_code_blobs
+from tests.server_app import ServerTestCase
+
+CODE = "def soma(a, b):\n    return a + b\n"
+
+
+class CodeBlobCleanupTest(ServerTestCase):
+    def analyze(self, task):
+        response = self.client.post("/api/code/analyze", json={"code": CODE, "language": "python", "task": task})
+        self.assertEqual(response.status_code, 200)
+
+    def test_blob_is_deleted_with_its_last_analysis(self):
+        server = self.server
+        self.analyze("analyze")
+        self.analyze("optimize")
+        self.flush()
+        analyses = self.call(server.code_analyses_repo.find, {})
+        self.assertEqual(len({a["code_hash"] for a in analyses}), 1)
+        self.assertEqual(self.call(server.code_blobs_repo.count), 1)
+
+        self.assertEqual(self.client.delete(f"/api/code/{analyses[0]['id']}").status_code, 200)
+        self.assertEqual(self.call(server.code_blobs_repo.count), 1)
+        self.assertEqual(self.client.delete(f"/api/code/{analyses[1]['id']}").status_code, 200)
+        self.assertEqual(self.call(server.code_blobs_repo.count), 0)
+
+    def test_migration_deletes_orphaned_blobs(self):
+        server = self.server
+        self.analyze("analyze")
+        self.flush()
+
+        async def add_orphans():
+            await server.db.code_blobs.insert_many([{"hash": f"orphan{i}", "code": "x"} for i in range(5)])
+            return await delete_orphan_code_blobs(server.db, batch_size=2)
+
+        self.assertEqual(self.call(add_orphans), 5)
+        self.assertEqual(self.call(server.code_blobs_repo.count), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
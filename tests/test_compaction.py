@@ -0,0 +1,167 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+
+from compaction import ChatCompactor
+from context import ConversationContext
+from tests.server_app import ServerTestCase
+
+
+def matches(document, query):
+    for field, condition in query.items():
+        value = document.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, bound in condition.items():
+            if op == "$in" and value not in bound:
+                return False
+            if (op == "$lt" and not value < bound) or (op == "$lte" and not value <= bound) or (op == "$gt" and not value > bound):
+                return False
+    return True
+
+
+class FakeChats:
+    def __init__(self, turns):
+        self.turns = turns
+
+    async def find(self, query, sort=None, limit=0, projection=None):
+        docs = sorted((t for t in self.turns if matches(t, query)), key=lambda t: t["timestamp"], reverse=sort[0][1] < 0)
+        return docs[:limit] if limit else docs
+
+    async def delete_many(self, query):
+        before = len(self.turns)
+        self.turns = [t for t in self.turns if not matches(t, query)]
+        return before - len(self.turns)
+
+
+class FakeArchive:
+    def __init__(self, fail=False):
+        self.docs = {}
+        self.fail = fail
+
+    async def bulk_write(self, operations, ordered=False):
+        if self.fail:
+            return {}, [{"index": 0, "errmsg": "disk full"}]
+        for op in operations:
+            self.docs[op._filter["_id"]] = op._doc
+        return {"nUpserted": len(operations)}, []
+
+
+class FakeSessions:
+    def __init__(self):
+        self.docs = {}
+
+    async def get(self, session_id, projection=None):
+        return self.docs.get(session_id)
+
+    async def update(self, session_id, fields):
+        self.docs.setdefault(session_id, {}).update(fields)
+        return 1
+
+    async def update_one(self, query, update):
+        doc = self.docs.setdefault(query["session_id"], {})
+        for field, value in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + value
+        doc.update(update.get("$set", {}))
+        return 1
+
+
+def make_turns(session_id, count):
+    start = datetime(2025, 1, 1)
+    return [
+        {"_id": f"{session_id}-{i}", "session_id": session_id, "message": f"pergunta {i}", "response": f"resposta {i}",
+         "timestamp": start + timedelta(minutes=i)}
+        for i in range(count)
+    ]
+
+
+class ChatCompactorTest(unittest.TestCase):
+    def setUp(self):
+        self.summary_calls = 0
+
+    async def summarize(self, previous, turns):
+        self.summary_calls += 1
+        return f"{previous} +{len(turns)}".strip()
+
+    def compactor(self, turns, archive=None, **kwargs):
+        self.chats, self.archive, self.sessions = FakeChats(turns), archive or FakeArchive(), FakeSessions()
+        context = ConversationContext(self.chats, self.sessions, self.summarize, summary_batch=50)
+        return ChatCompactor(self.chats, self.archive, self.sessions, context, **kwargs)
+
+    def test_archives_only_summarized_turns_beyond_retention(self):
+        compactor = self.compactor(make_turns("s", 130) + make_turns("other", 5), retention_turns=20, batch_size=30)
+
+        async def run():
+            moved = []
+            for _ in range(2):
+                compactor.touch("s")
+                compactor.touch("other")
+                moved.append(await compactor.run_once())
+            return moved
+
+        moved = asyncio.run(run())
+        # 110 turns are beyond the window: summarized 50 at a time and archived in one pass
+        self.assertEqual(moved, [110, 0])
+        live = [t for t in self.chats.turns if t["session_id"] == "s"]
+        self.assertEqual(len(live), 20)
+        self.assertEqual(live[0]["message"], "pergunta 110")
+        self.assertEqual(len(self.archive.docs), 110)
+        self.assertEqual(self.sessions.docs["s"]["archived_turns"], 110)
+        self.assertEqual(self.sessions.docs["s"]["summary"], "+50 +50 +10")
+        self.assertNotIn("other", self.sessions.docs)
+        self.assertEqual(compactor.stats()["archived"], 110)
+
+    def test_nothing_is_deleted_when_archiving_fails(self):
+        compactor = self.compactor(make_turns("s", 60), archive=FakeArchive(fail=True), retention_turns=10)
+        compactor.touch("s")
+        self.assertEqual(asyncio.run(compactor.run_once()), 0)
+        self.assertEqual(len(self.chats.turns), 60)
+        self.assertEqual(compactor.stats()["failures"], 1)
+
+    def test_long_session_keeps_a_bounded_live_history(self):
+        compactor = self.compactor(make_turns("s", 10000), retention_turns=200, batch_size=500, max_summaries=20)
+
+        async def run():
+            # Touched once: each pass folds 20 x 50 turns and leaves the session queued for the next
+            compactor.touch("s")
+            moved = []
+            while compactor.stats()["pending_sessions"]:
+                moved.append(await compactor.run_once())
+            return moved
+
+        moved = asyncio.run(run())
+        self.assertEqual(moved[:2], [1000, 1000])
+        self.assertEqual(sum(moved), 9800)
+        self.assertEqual(len(self.chats.turns), 200)
+        self.assertEqual(self.sessions.docs["s"]["archived_turns"], 9800)
+        self.assertEqual(self.summary_calls, 196)
+
+
+class CompactionSweepTest(ServerTestCase):
+    def test_sessions_with_thousands_of_turns_are_swept(self):
+        server = self.server
+        turns = make_turns("long", 3000)
+
+        async def seed():
+            await server.db.chats.insert_many(turns)
+            await server.db.sessions.insert_many([
+                {"session_id": "long", "turn_count": len(turns), "last_activity": turns[-1]["timestamp"]},
+                {"session_id": "short", "turn_count": 10},
+            ])
+        self.call(seed)
+
+        self.assertEqual(self.call(server.chat_compactor.sweep), 1)
+        while server.chat_compactor.stats()["pending_sessions"]:
+            self.call(server.chat_compactor.run_once)
+
+        live = self.call(server.chats_repo.count, {"session_id": "long"})
+        session = self.call(server.sessions_repo.get, "long")
+        self.assertEqual(live, server.CHAT_RETENTION_TURNS)
+        self.assertEqual(session["archived_turns"], 3000 - server.CHAT_RETENTION_TURNS)
+        self.assertEqual(self.call(server.chat_compactor.sweep), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
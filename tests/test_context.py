@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+
+from context import ConversationContext, estimate_tokens
+
+
+class FakeChats:
+    def __init__(self, turns):
+        self.turns = turns
+
+    async def find(self, query, sort=None, limit=0, projection=None):
+        bounds = query["timestamp"]
+        docs = [
+            t for t in self.turns
+            if t["timestamp"] < bounds["$lt"] and ("$gt" not in bounds or t["timestamp"] > bounds["$gt"])
+        ]
+        return docs[:limit] if limit else docs
+
+
+class FakeSessions:
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    async def get(self, session_id, projection=None):
+        self.reads += 1
+        return self.docs.get(session_id)
+
+    async def update(self, session_id, fields):
+        self.docs.setdefault(session_id, {}).update(fields)
+        return 1
+
+
+def make_turns(count, size=40):
+    start = datetime(2025, 1, 1)
+    return [
+        {"message": f"pergunta {i} " + "x" * size, "response": f"resposta {i} " + "y" * size, "timestamp": start + timedelta(minutes=i)}
+        for i in range(count)
+    ]
+
+
+class ConversationContextTest(unittest.TestCase):
+    def setUp(self):
+        self.summarized = []
+
+    async def summarize(self, previous, turns):
+        self.summarized.append(len(turns))
+        return (previous + " " if previous else "") + f"[{len(turns)} turnos]"
+
+    def context(self, turns, **kwargs):
+        self.sessions = FakeSessions()
+        return ConversationContext(FakeChats(turns), self.sessions, self.summarize, **kwargs)
+
+    def test_first_message_is_sent_as_is(self):
+        ctx = self.context([])
+        self.assertEqual(asyncio.run(ctx.build("s", [], "Olá")), "Olá")
+
+    def test_recent_turns_within_budget(self):
+        turns = make_turns(10)
+        ctx = self.context(turns, token_budget=120, max_turns=10, summary_min_turns=5)
+
+        async def run():
+            prompt = await ctx.build("s", turns, "e agora?")
+            await ctx.wait_idle()
+            return prompt
+
+        prompt = asyncio.run(run())
+        self.assertLessEqual(estimate_tokens(prompt), 120 + 10)
+        self.assertIn("resposta 9", prompt)
+        self.assertNotIn("resposta 0", prompt)
+        self.assertTrue(prompt.endswith("Mensagem atual do usuário:\ne agora?"))
+        # Turns that fell out of the window were folded into the stored summary
+        kept = sum(1 for t in turns if t["response"] in prompt)
+        self.assertEqual(self.summarized, [len(turns) - kept])
+        self.assertEqual(self.sessions.docs["s"]["summary_upto"], turns[-kept - 1]["timestamp"])
+
+    def test_summary_is_incremental_and_cached(self):
+        turns = make_turns(30)
+        ctx = self.context(turns, token_budget=150, max_turns=10)
+
+        async def run():
+            await ctx.build("s", turns[10:20], "a")
+            await ctx.wait_idle()
+            prompt = await ctx.build("s", turns[20:], "b")
+            await ctx.wait_idle()
+            return prompt
+
+        prompt = asyncio.run(run())
+        self.assertIn("Resumo da conversa anterior:", prompt)
+        # Each turn is summarized once: the second refresh only sees turns newer than the first summary
+        upto = [t["timestamp"] for t in turns].index(self.sessions.docs["s"]["summary_upto"])
+        self.assertEqual(len(self.summarized), 2)
+        self.assertEqual(sum(self.summarized), upto + 1)
+        self.assertEqual(self.sessions.reads, 1)
+
+    def test_summary_calls_wait_for_a_batch_of_turns(self):
+        turns = make_turns(25)
+        ctx = self.context(turns, token_budget=2000, max_turns=10, summary_min_turns=10)
+
+        async def run():
+            # One chat message after another: each sees the last 10 turns before it
+            for count in range(1, len(turns) + 1):
+                await ctx.build("s", turns[max(count - 10, 0):count], f"mensagem {count}")
+                await ctx.wait_idle()
+
+        asyncio.run(run())
+        # 15 turns left the window; they are folded in one call once 10 were waiting, not one call per message
+        self.assertEqual(self.summarized, [10])
+        self.assertEqual(self.sessions.docs["s"]["summary_upto"], turns[9]["timestamp"])
+
+    def test_relevant_notes_come_first_and_share_the_budget(self):
+        turns = make_turns(3)
+        ctx = self.context(turns, token_budget=200, max_turns=10)
+        notes = ["Receita de bolo: farinha e ovos", "x" * 2000]
+        prompt = asyncio.run(ctx.build("s", turns, "qual a receita?", notes))
+        self.assertTrue(prompt.startswith("Notas e lembretes do usuário que podem ser relevantes:\n- Receita de bolo"))
+        self.assertNotIn("x" * 100, prompt)
+        self.assertIn("resposta 2", prompt)
+        self.assertLessEqual(estimate_tokens(prompt), 200 + 10)
+
+    def test_oversized_turn_is_truncated(self):
+        turns = make_turns(1, size=100000)
+        ctx = self.context(turns, token_budget=2000, max_turn_tokens=600)
+        prompt = asyncio.run(ctx.build("s", turns, "resuma"))
+        self.assertIn("pergunta 0", prompt)
+        self.assertLess(estimate_tokens(prompt), 700)
+
+    def test_prompt_size_stays_flat(self):
+        """Prompt tokens for a growing session: budgeted context vs. full history"""
+        budget = 2000
+        print()
+        for count in [10, 100, 1000]:
+            turns = make_turns(count, size=200)
+            ctx = self.context(turns, token_budget=budget, max_turns=count)
+
+            async def run():
+                prompt = await ctx.build("s", turns, "ok")
+                await ctx.wait_idle()
+                return prompt
+
+            prompt = asyncio.run(run())
+            full = sum(estimate_tokens(t["message"] + t["response"]) for t in turns)
+            print(f"{count:>5} turns  full history {full:>7} tokens  budgeted {estimate_tokens(prompt):>5} tokens")
+            self.assertLessEqual(estimate_tokens(prompt), budget + 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from datetime import datetime
+
+from dashboard import ACTIVITY_SOURCES, COUNTERS, dashboard_pipeline, split_results
+
+
+class DashboardPipelineTest(unittest.TestCase):
+    def test_single_pipeline_covers_every_source_and_counter(self):
+        pipeline = dashboard_pipeline(datetime(2025, 1, 8))
+        unions = [stage["$unionWith"] for stage in pipeline if "$unionWith" in stage]
+
+        self.assertEqual(pipeline[0], {"$sort": {"timestamp": -1}})
+        self.assertEqual([u["coll"] for u in unions[:4]], [c for c, _, _ in ACTIVITY_SOURCES[1:]])
+        self.assertEqual(len(unions), len(ACTIVITY_SOURCES) - 1 + len(COUNTERS))
+
+        upcoming = unions[-1]["pipeline"][0]["$match"]
+        self.assertEqual(upcoming, {"date": {"$gte": datetime(2025, 1, 8)}, "completed": False})
+
+        code = next(u for u in unions if u["coll"] == "code_analyses")
+        self.assertTrue(any("$lookup" in stage for stage in code["pipeline"]))
+
+    def test_split_results(self):
+        docs = [
+            {"_kind": "chat", "message": "oi"},
+            {"_kind": "code", "analysis": "a", "code_hash": "h", "_blob": [{"hash": "h", "code": "x = 1"}]},
+            {"_kind": "code", "analysis": "b", "code": "inline"},
+            {"_kind": "count", "_name": "total_notes", "value": 4},
+        ]
+        counts, recent = split_results(docs)
+
+        self.assertEqual(counts, {"recent_chats": 0, "total_notes": 4, "upcoming_reminders": 0})
+        self.assertEqual([d["code"] for d in recent["code"]], ["x = 1", "inline"])
+        self.assertEqual(recent["chat"], [{"message": "oi"}])
+        self.assertEqual(recent["note"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
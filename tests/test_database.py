@@ -0,0 +1,95 @@
+import asyncio
+import time
+import unittest
+
+from database import Repository
+
+MONGO_LATENCY = 0.05
+CONCURRENT_REQUESTS = 50
+
+
+class SlowCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(MONGO_LATENCY)
+        return list(self.docs)
+
+    def batch_size(self, n):
+        self.fetch_size = n
+        return self
+
+    async def __aiter__(self):
+        # Documents held by the cursor: at most one fetched batch at a time
+        for start in range(0, len(self.docs), self.fetch_size):
+            for document in self.docs[start:start + self.fetch_size]:
+                yield document
+
+
+class SlowCollection:
+    """In-process stand-in for a Motor collection with a fixed round-trip latency"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, document):
+        await asyncio.sleep(MONGO_LATENCY)
+        self.docs.append(document)
+
+    def find(self, query=None, projection=None):
+        return SlowCursor([d for d in self.docs if all(d.get(k) == v for k, v in (query or {}).items())])
+
+    async def count_documents(self, query):
+        await asyncio.sleep(MONGO_LATENCY)
+        return len(self.docs)
+
+
+class RepositoryConcurrencyTest(unittest.TestCase):
+    def test_concurrent_requests_run_in_parallel(self):
+        """Concurrent handlers must overlap their Mongo round-trips instead of queueing"""
+        repo = Repository(SlowCollection())
+
+        async def handler(i):
+            await repo.insert({"id": str(i), "session_id": "s"})
+            return await repo.find({"session_id": "s"}, sort=[("timestamp", -1)], limit=10)
+
+        async def run():
+            start = time.perf_counter()
+            results = await asyncio.gather(*(handler(i) for i in range(CONCURRENT_REQUESTS)))
+            return time.perf_counter() - start, results
+
+        elapsed, results = asyncio.run(run())
+        serial = CONCURRENT_REQUESTS * 2 * MONGO_LATENCY
+        print(f"\n{CONCURRENT_REQUESTS} requests: {elapsed * 1000:.0f} ms (serial would be {serial * 1000:.0f} ms)")
+
+        self.assertEqual(len(results), CONCURRENT_REQUESTS)
+        self.assertTrue(all(len(r) <= 10 for r in results))
+        self.assertLess(elapsed, serial / 5)
+
+    def test_find_batches(self):
+        collection = SlowCollection()
+        collection.docs = [{"id": str(i)} for i in range(2500)]
+        repo = Repository(collection)
+
+        async def run():
+            return [len(batch) async for batch in repo.find_batches({}, batch_size=1000)]
+
+        self.assertEqual(asyncio.run(run()), [1000, 1000, 500])
+
+    def test_count(self):
+        collection = SlowCollection()
+        repo = Repository(collection)
+        asyncio.run(repo.insert({"id": "a"}))
+        self.assertEqual(asyncio.run(repo.count()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import random
+import statistics
+import time
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from embeddings import HashingEmbedder, VectorIndex, quantize
+
+
+class HashingEmbedderTest(unittest.TestCase):
+    def test_unit_length_and_related_texts_are_closer(self):
+        embedder = HashingEmbedder()
+        bolo, receita, reuniao = (embedder.embed(t) for t in ["receita de bolo de cenoura", "qual a receita do bolo?", "reunião com o cliente"])
+        self.assertAlmostEqual(float(bolo @ bolo), 1.0, places=5)
+        self.assertGreater(float(bolo @ receita), float(bolo @ reuniao))
+
+    def test_quantization_keeps_cosine(self):
+        vectors = HashingEmbedder().embed_many(["nota %d sobre projeto %d" % (i, i * 7) for i in range(50)])
+        codes, scales = quantize(vectors)
+        restored = codes.astype(np.float32) * scales[:, None]
+        exact, approx = vectors @ vectors[0], restored @ vectors[0]
+        self.assertLess(float(np.abs(exact - approx).max()), 0.02)
+
+
+class VectorIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = VectorIndex(capacity=2)
+        self.index.add_many("note", [
+            {"id": "bolo", "title": "Receita de bolo", "content": "farinha, ovos, açúcar, forno 180 graus"},
+            {"id": "cliente", "title": "Reunião com cliente", "content": "apresentar proposta de orçamento"},
+            {"id": "wifi", "title": "Senha do wifi", "content": "rede de casa"},
+        ])
+        self.index.add("reminder", {"id": "dentista", "title": "Consulta no dentista", "description": "levar exames",
+                                    "date": datetime(2030, 1, 2, 10)})
+
+    def top(self, text, **kwargs):
+        hits = self.index.search(text, k=1, **kwargs)
+        return hits[0]["id"] if hits else None
+
+    def test_retrieves_the_note_a_message_is_about(self):
+        self.assertEqual(self.top("qual era a receita do bolo?"), "bolo")
+        self.assertEqual(self.top("o que vou apresentar ao cliente"), "cliente")
+        self.assertEqual(self.top("quando é a consulta do dentista"), "dentista")
+        self.assertIn("02/01/2030 10:00", self.index.search("dentista", k=1)[0]["snippet"])
+
+    def test_incremental_updates_and_filters(self):
+        self.index.add("note", {"id": "bolo", "title": "Lista de compras", "content": "leite e pão"})
+        self.assertNotEqual(self.top("receita de bolo com farinha"), "bolo")
+        self.assertEqual(self.top("lista de compras"), "bolo")
+
+        self.assertTrue(self.index.remove("note", "cliente"))
+        self.assertIsNone(self.top("apresentar proposta", min_score=0.2))
+        self.assertEqual(self.top("dentista", kinds=["note"], min_score=0.2), None)
+        self.index.add("note", {"id": "novo", "title": "Aniversário da Ana"})
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.top("aniversario"), "novo")
+
+    def test_top_k_latency_at_100k_notes(self):
+        """Top-5 retrieval latency over 100k notes"""
+        rng = random.Random(3)
+        vocabulary = ["reunião", "projeto", "cliente", "orçamento", "médico", "exame", "viagem", "compras", "bolo",
+                      "receita", "academia", "treino", "aniversário", "família", "senha", "banco"] + [f"termo{i}" for i in range(3000)]
+        notes = [
+            {"id": str(i), "title": " ".join(rng.choices(vocabulary, k=3)), "content": " ".join(rng.choices(vocabulary, k=25))}
+            for i in range(100000)
+        ]
+
+        index = VectorIndex()
+        start = time.perf_counter()
+        for i in range(0, len(notes), 1000):
+            index.add_many("note", notes[i:i + 1000])
+        build = time.perf_counter() - start
+
+        messages = ["qual a receita do bolo?", "tenho reunião com o cliente sobre o orçamento do projeto",
+                    "preciso marcar exame no médico", "termo42 e termo1001", "senha do banco"]
+        timings = []
+        for _ in range(20):
+            for message in messages:
+                start = time.perf_counter()
+                index.search(message, k=5)
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p50, p95 = statistics.median(timings), timings[int(len(timings) * 0.95)]
+        print(f"\n100000 notes: embedded in {build:.1f} s, {index.stats()['bytes'] / 2**20:.1f} MiB, top-5 p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+        self.assertLess(p50, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import unittest
+
+from events import Broadcaster, EventBus
+from tests.server_app import ServerTestCase
+
+
+class FakeRequest:
+    headers = {}
+
+    async def is_disconnected(self):
+        return False
+
+
+class BroadcasterTest(unittest.TestCase):
+    def test_slow_subscribers_lose_oldest_events(self):
+        async def scenario():
+            broadcaster = Broadcaster(max_queue=2)
+            async with broadcaster.subscribe() as queue:
+                for i in range(5):
+                    broadcaster.publish({"n": i})
+                received = [queue.get_nowait()["n"] for _ in range(queue.qsize())]
+            broadcaster.publish({"n": 5})  # nobody listening
+            return received, broadcaster.stats()
+
+        received, stats = asyncio.run(scenario())
+        self.assertEqual(received, [3, 4])
+        self.assertEqual(stats, {"subscribers": 0, "closed": False, "published": 6, "dropped": 3})
+
+    def test_close_ends_current_and_new_subscriptions(self):
+        async def scenario():
+            broadcaster = Broadcaster(max_queue=2)
+            async with broadcaster.subscribe() as queue:
+                broadcaster.publish({"n": 0})
+                broadcaster.publish({"n": 1})
+                broadcaster.close()
+                received = [await queue.get(), await queue.get()]
+            async with broadcaster.subscribe() as late:
+                received.append(await late.get())
+            broadcaster.open()
+            async with broadcaster.subscribe() as reopened:
+                return received, reopened.empty()
+
+        received, empty = asyncio.run(scenario())
+        self.assertEqual(received, [{"n": 1}, None, None])
+        self.assertTrue(empty)
+
+
+class EventBusTest(unittest.TestCase):
+    def test_versions_increase_and_missed_events_replay(self):
+        bus = EventBus(history=3)
+        for i in range(5):
+            event = bus.publish("note.created", {"id": str(i)})
+        self.assertEqual(event["version"], 5)
+
+        self.assertEqual([e["data"]["id"] for e in bus.since(3)], ["3", "4"])
+        self.assertEqual(len(bus.since(2)), 3)
+        self.assertEqual(bus.since(5), [])
+        self.assertIsNone(bus.since(1))  # version 2 is no longer kept
+
+    def test_subscribers_receive_versioned_events(self):
+        async def scenario():
+            bus = EventBus()
+            async with bus.subscribe() as queue:
+                bus.publish("reminder.due", {"id": "r"})
+                bus.publish("note.deleted", {"id": "n"})
+                return [(e["version"], e["type"]) for e in [queue.get_nowait(), queue.get_nowait()]], bus.stats()
+
+        received, stats = asyncio.run(scenario())
+        self.assertEqual(received, [(1, "reminder.due"), (2, "note.deleted")])
+        self.assertEqual(stats["version"], 2)
+        self.assertEqual(stats["history"], 2)
+
+
+class EventStreamTest(ServerTestCase):
+    def get_events(self, **kwargs):
+        """Everything /api/events sends; the bus is closed so the stream ends after the replay"""
+        self.server.set_draining(True)
+        try:
+            response = self.client.get("/api/events", **kwargs)
+        finally:
+            self.server.set_draining(False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "text/event-stream; charset=utf-8")
+        return [parse_sse(message) for message in response.text.split("\n\n") if message.strip()]
+
+    def test_endpoint_replays_after_last_event_id(self):
+        server = self.server
+        seen = server.event_bus.version
+        note = self.client.post("/api/notes", json={"title": "Nota", "content": "..."}).json()
+        self.client.delete(f"/api/notes/{note['id']}")
+
+        events = self.get_events(headers={"Last-Event-ID": server.event_id(seen)})
+        self.assertEqual([name for name, _ in events], ["note.created", "note.deleted", "ready", "closing"])
+        self.assertEqual(events[0][1]["data"]["id"], note["id"])
+        self.assertEqual(events[1][1]["version"], seen + 2)
+
+        filtered = self.get_events(params={"since": server.event_id(seen), "types": "note.deleted"})
+        self.assertEqual([name for name, _ in filtered], ["note.deleted", "ready", "closing"])
+        # An id from before a restart cannot be replayed
+        self.assertEqual(self.get_events(params={"since": "oldepoch-3"})[0][0], "resync")
+
+    def read(self, stream):
+        """Event name and data of the next SSE message"""
+        async def next_event():
+            return parse_sse(await stream.__anext__())
+        return self.call(next_event)
+
+    def test_slow_client_is_told_to_resync(self):
+        server = self.server
+        stream = server.event_stream(FakeRequest(), None)
+        name, ready = self.read(stream)
+        self.assertEqual(name, "ready")
+
+        # A burst larger than the subscriber queue, e.g. a bulk create, while the client is not reading
+        for i in range(server.event_bus.max_queue + 50):
+            server.publish_change("note.updated", {"id": str(i)})
+        name, resync = self.read(stream)
+        self.assertEqual(name, "resync")
+        self.assertEqual(resync["version"], server.event_bus.version)
+
+        # Events queued before the resync are covered by it; the stream carries on after it
+        server.publish_change("note.deleted", {"id": "x"})
+        name, change = self.read(stream)
+        self.assertEqual(name, "note.deleted")
+        self.assertEqual(change["version"], resync["version"] + 1)
+        self.call(stream.aclose)
+
+    def test_reconnect_replays_missed_events(self):
+        first = self.server.publish_change("note.created", {"id": "a"})
+        self.server.publish_change("note.deleted", {"id": "a"})
+        stream = self.server.event_stream(FakeRequest(), first["version"])
+        name, change = self.read(stream)
+        self.assertEqual((name, change["data"]), ("note.deleted", {"id": "a"}))
+        self.assertEqual(self.read(stream)[0], "ready")
+        self.call(stream.aclose)
+        self.assertEqual(self.client.get("/api/events/stats").json()["subscribers"], 0)
+
+
+def parse_sse(message: str):
+    fields = dict(line.split(": ", 1) for line in message.strip().splitlines() if not line.startswith(":"))
+    return fields.get("event"), json.loads(fields["data"])
+
+
+if __name__ == "__main__":
+    unittest.main()
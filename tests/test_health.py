@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+
+from health import DEGRADED, DOWN, OK, HealthChecker, ProbeFailed
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class HealthCheckerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.calls = {"mongo": 0, "llm": 0}
+        self.mongo_delay = 0.0
+        self.llm_configured = True
+
+    async def probe_mongo(self):
+        self.calls["mongo"] += 1
+        await asyncio.sleep(self.mongo_delay)
+        return {"connections_in_use": 3}
+
+    async def probe_llm(self):
+        self.calls["llm"] += 1
+        if not self.llm_configured:
+            raise ProbeFailed("GEMINI_API_KEY is not set", {"in_flight": 0})
+        return {"status": DEGRADED, "saturation": 1.0}
+
+    def checker(self, **kwargs):
+        checker = HealthChecker(ttl=5, timeout=0.2, clock=self.clock, **kwargs)
+        checker.register("mongo", self.probe_mongo, budget_ms=50)
+        checker.register("llm", self.probe_llm, critical=False)
+        return checker
+
+    def test_probes_are_cached_and_shared(self):
+        checker = self.checker()
+        self.mongo_delay = 0.01
+
+        async def poll(times):
+            return await asyncio.gather(*(checker.readiness() for _ in range(times)))
+
+        reports = asyncio.run(poll(20))
+        self.assertEqual(self.calls, {"mongo": 1, "llm": 1})
+        self.assertTrue(all(report["ready"] for report in reports))
+
+        self.clock.now = 4.9
+        report = asyncio.run(checker.readiness())
+        self.assertEqual(self.calls["mongo"], 1)
+        self.assertEqual(report["checks"]["mongo"]["age_seconds"], 4.9)
+
+        self.clock.now = 5.0
+        asyncio.run(checker.readiness())
+        self.assertEqual(self.calls["mongo"], 2)
+
+    def test_statuses(self):
+        checker = self.checker()
+        report = asyncio.run(checker.readiness())
+        self.assertEqual(report["status"], "ready")
+        self.assertEqual(report["checks"]["mongo"]["status"], OK)
+        self.assertEqual(report["checks"]["mongo"]["connections_in_use"], 3)
+        self.assertEqual(report["degraded"], ["llm"])
+
+        # Over budget: degraded but still ready; a non-critical failure never blocks readiness
+        self.mongo_delay, self.llm_configured = 0.1, False
+        self.clock.now = 10
+        report = asyncio.run(checker.readiness())
+        self.assertEqual(report["checks"]["mongo"]["status"], DEGRADED)
+        self.assertEqual(report["checks"]["llm"]["status"], DOWN)
+        self.assertEqual(report["checks"]["llm"]["error"], "GEMINI_API_KEY is not set")
+        self.assertEqual(report["status"], "ready")
+
+        # Past the timeout the critical probe is down
+        self.mongo_delay = 0.5
+        self.clock.now = 20
+        report = asyncio.run(checker.readiness())
+        self.assertEqual(report["status"], "not_ready")
+        self.assertEqual(report["failing"], ["mongo"])
+        self.assertIn("timed out", report["checks"]["mongo"]["error"])
+
+    def test_draining(self):
+        checker = self.checker()
+        checker.draining = True
+        report = asyncio.run(checker.readiness())
+        self.assertEqual(report["status"], "draining")
+        self.assertFalse(report["ready"])
+        checker.draining = False
+        self.assertTrue(asyncio.run(checker.readiness())["ready"])
+
+
+if __name__ == "__main__":
+    unittest.main()
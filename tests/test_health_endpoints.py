@@ -0,0 +1,64 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from metrics import http_streams_open
+from tests.server_app import ServerTestCase
+from tests.test_events import parse_sse
+
+
+class HealthEndpointTest(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(self.server, "DRAIN_TOKEN", "secret")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.set_draining, False)
+
+    def drain(self, method):
+        return self.client.request(method, "/api/health/drain", headers={"x-drain-token": "secret"})
+
+    def test_liveness_and_readiness(self):
+        self.assertEqual(self.client.get("/api/health/live").json()["status"], "ok")
+        response = self.client.get("/api/health/ready")
+        report = response.json()
+        self.assertIn("mongo", report["checks"])
+        self.assertEqual(report["in_flight_requests"], 0)
+        self.assertEqual(response.status_code, 200 if report["ready"] else 503)
+
+    def test_drain_requires_the_token(self):
+        self.assertEqual(self.client.post("/api/health/drain").status_code, 403)
+        self.assertFalse(self.server.health_checker.draining)
+
+    def test_draining_ends_open_event_streams(self):
+        results = {}
+        thread = threading.Thread(target=lambda: results.update(response=self.client.get("/api/events")))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while http_streams_open.total() < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        # An open stream is not a request in flight, or draining would never finish
+        report = self.client.get("/api/health/ready").json()
+        self.assertEqual(report["open_streams"], 1)
+        self.assertEqual(report["in_flight_requests"], 0)
+
+        drained = self.drain("POST")
+        self.assertEqual(drained.json(), {"draining": True, "in_flight_requests": 0})
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        messages = [parse_sse(message) for message in results["response"].text.split("\n\n") if message.strip()]
+        self.assertEqual([event for event, _ in messages], ["ready", "closing"])
+
+        response = self.client.get("/api/health/ready")
+        self.assertEqual((response.status_code, response.json()["status"]), (503, "draining"))
+        # Streams opened while draining end right away
+        self.assertIn("event: closing", self.client.get("/api/reminders/due/stream").text)
+
+        self.assertEqual(self.drain("DELETE").json()["draining"], False)
+        self.assertEqual(self.client.get("/api/events/stats").json()["closed"], False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+
+from database import INDEXES, ensure_indexes
+
+# Set to a scratch MongoDB (e.g. mongodb://localhost:27017) to run the latency benchmark
+BENCHMARK_MONGO_URL = os.environ.get("MONGO_BENCHMARK_URL")
+
+
+class FakeCollection:
+    def __init__(self, existing=None):
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+        self.indexes.update(existing or {})
+        self.dropped = []
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+    async def drop_index(self, name):
+        self.dropped.append(name)
+        del self.indexes[name]
+
+    async def create_indexes(self, models):
+        for model in models:
+            spec = model.document
+            self.indexes[spec["name"]] = {"key": list(spec["key"].items()), "unique": spec.get("unique", False)}
+            if "expireAfterSeconds" in spec:
+                self.indexes[spec["name"]]["expireAfterSeconds"] = spec["expireAfterSeconds"]
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+class EnsureIndexesTest(unittest.TestCase):
+    def test_creates_missing_and_is_idempotent(self):
+        database = FakeDatabase()
+        first = asyncio.run(ensure_indexes(database))
+        second = asyncio.run(ensure_indexes(database))
+
+        self.assertIn("created session_timestamp", first["chats"])
+        self.assertTrue(all(actions == [] for actions in second.values()))
+        for collection_name, declared in INDEXES.items():
+            self.assertEqual(
+                set(database[collection_name].indexes) - {"_id_"},
+                {name for name, _, _ in declared},
+            )
+
+    def test_rebuilds_changed_definition(self):
+        database = FakeDatabase()
+        database["notes"] = FakeCollection({"id_unique": {"key": [("id", ASCENDING)], "unique": False}})
+        report = asyncio.run(ensure_indexes(database, {"notes": INDEXES["notes"]}))
+
+        self.assertIn("rebuilt id_unique", report["notes"])
+        self.assertEqual(database["notes"].dropped, ["id_unique"])
+        self.assertTrue(database["notes"].indexes["id_unique"]["unique"])
+
+
+@unittest.skipUnless(BENCHMARK_MONGO_URL, "MONGO_BENCHMARK_URL not set")
+class IndexLatencyBenchmark(unittest.TestCase):
+    """Query latency vs. collection size, before and after ensure_indexes"""
+
+    SIZES = [1000, 10000, 100000]
+
+    def test_latency_scaling(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        async def timed(coro_factory, repeat=20):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                await coro_factory()
+            return (time.perf_counter() - start) * 1000 / repeat
+
+        async def run():
+            client = AsyncIOMotorClient(BENCHMARK_MONGO_URL)
+            database = client[f"ai_assistant_index_benchmark_{os.getpid()}"]
+            now = datetime.now()
+            results = []
+            try:
+                for size in self.SIZES:
+                    await client.drop_database(database.name)
+                    await database.chats.insert_many([
+                        {"session_id": f"s{i % 500}", "message": "m", "response": "r", "timestamp": now - timedelta(seconds=i)}
+                        for i in range(size)
+                    ])
+                    await database.reminders.insert_many([
+                        {"id": str(i), "date": now + timedelta(minutes=i - size // 2), "completed": i % 3 == 0, "created_at": now}
+                        for i in range(size)
+                    ])
+
+                    queries = {
+                        "chat history": lambda: database.chats.find({"session_id": "s7"}).sort("timestamp", -1).limit(10).to_list(None),
+                        "upcoming reminders": lambda: database.reminders.find({"date": {"$gte": now}, "completed": False}).sort("date", 1).limit(10).to_list(None),
+                        "reminder by id": lambda: database.reminders.find_one({"id": str(size - 1)}),
+                    }
+                    before = {name: await timed(q) for name, q in queries.items()}
+                    await ensure_indexes(database, {"chats": INDEXES["chats"], "reminders": INDEXES["reminders"]})
+                    after = {name: await timed(q) for name, q in queries.items()}
+                    results.append((size, before, after))
+            finally:
+                await client.drop_database(database.name)
+                client.close()
+            return results
+
+        results = asyncio.run(run())
+        print()
+        for size, before, after in results:
+            for name in before:
+                print(f"{size:>7} docs  {name:<20} {before[name]:8.2f} ms -> {after[name]:6.2f} ms")
+
+        size, before, after = results[-1]
+        for name in before:
+            self.assertLess(after[name], before[name])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import time
+import unittest
+from datetime import datetime
+
+from intent import classify_intent, parse_reminder_date, fold
+
+# Labelled messages: "note", "reminder" or "chat"
+CORPUS = [
+    ("Anote que preciso comprar leite", "note"),
+    ("anota aí: senha do wifi é banana123", "note"),
+    ("Crie uma nota sobre a reunião de planejamento do projeto", "note"),
+    ("Faça uma nota: ideias para o aniversário da Ana", "note"),
+    ("Nova nota: livros para ler nas férias", "note"),
+    ("Anotar que o relatório trimestral vence dia 30", "note"),
+    ("Salve isso: o código do portão é 4521", "note"),
+    ("Guarde que o cliente prefere contato por email", "note"),
+    ("Por favor, anote que a prova de cálculo cobre os capítulos 3 e 4", "note"),
+    ("Adicione uma nota com a receita de bolo de cenoura", "note"),
+    ("anote isso: comprar pilhas AA", "note"),
+    ("Crie uma nota com os tópicos para estudar para a prova", "note"),
+    ("Me lembre de ligar para o médico amanhã às 15h", "reminder"),
+    ("Lembrete para fazer exercícios", "reminder"),
+    ("me lembra de pagar a conta de luz sexta", "reminder"),
+    ("Agende reunião com o cliente na quinta às 14h", "reminder"),
+    ("Crie um lembrete para buscar as crianças na escola hoje às 17h", "reminder"),
+    ("Não me deixe esquecer de regar as plantas amanhã", "reminder"),
+    ("Me avise para tomar o remédio às 20h", "reminder"),
+    ("Lembre-me de enviar o relatório depois de amanhã às 9h", "reminder"),
+    ("Marque dentista para segunda às 10:30", "reminder"),
+    ("Me lembre de comprar presente para minha mãe, é urgente", "reminder"),
+    ("Agendar corte de cabelo sábado às 11h", "reminder"),
+    ("lembrete: reunião de equipe amanhã 9h", "reminder"),
+    ("Oi, tudo bem?", "chat"),
+    ("Olá! Como você está hoje?", "chat"),
+    ("Bom dia", "chat"),
+    ("Hello, can you introduce yourself?", "chat"),
+    ("O que é aprendizado de máquina?", "chat"),
+    ("Como funciona a fotossíntese?", "chat"),
+    ("Explique a diferença entre lista e tupla em Python", "chat"),
+    ("Me explique o que é uma API REST", "chat"),
+    ("Qual a capital da Austrália?", "chat"),
+    ("Escreva um poema sobre o mar", "chat"),
+    ("Obrigado pela ajuda!", "chat"),
+    ("Quais são as vantagens do MongoDB?", "chat"),
+    ("Traduza 'good morning' para o francês", "chat"),
+    ("Me conte uma piada", "chat"),
+    ("Resuma a história do Brasil em um parágrafo", "chat"),
+    ("Você pode me ajudar a planejar minha semana?", "chat"),
+    ("Gere ideias de nomes para uma cafeteria", "chat"),
+    ("Por que o céu é azul?", "chat"),
+    ("Tchau, até mais", "chat"),
+    ("Valeu!", "chat"),
+    ("Descreva o funcionamento de um motor a combustão", "chat"),
+    ("Como faço para criar uma nota no app?", "chat"),
+    ("Quanto é 15% de 230?", "chat"),
+    ("Fale sobre inteligência artificial", "chat"),
+    ("Estou me sentindo cansado hoje", "chat"),
+    ("Preciso ir ao dentista sexta", "reminder"),
+    ("Reunião amanhã às 10h com o time", "reminder"),
+    ("Me ajude a escrever um email para meu chefe", "chat"),
+    ("O que eu devo anotar numa reunião?", "chat"),
+    ("Tenho tarefa de matemática", "chat"),
+    ("Quero salvar dinheiro este ano, alguma dica?", "chat"),
+    # Command words that are also nouns or recall questions
+    ("Marca de carro mais confiável", "chat"),
+    ("Agenda cultural de SP neste fim de semana", "chat"),
+    ("me lembra o nome daquele filme", "chat"),
+    ("Lembra quando fomos à praia", "chat"),
+    ("Marque as alternativas corretas: a) b) c)", "chat"),
+    ("Marca consulta com o dentista amanhã às 9h", "reminder"),
+]
+
+LABELS = {"CRIAR_NOTA": "note", "CRIAR_LEMBRETE": "reminder", "CONVERSAR": "chat"}
+
+
+def predict(message):
+    result = classify_intent(message)
+    if result is None:
+        return None
+    return LABELS[result.split("|")[0]]
+
+
+class IntentClassifierTest(unittest.TestCase):
+    def test_corpus_accuracy_and_latency(self):
+        """Offline benchmark: settled messages must be right, ambiguous ones go to the LLM"""
+        settled, correct, deferred = 0, 0, 0
+        chat_total, chat_settled = 0, 0
+        errors = []
+
+        start = time.perf_counter()
+        for _ in range(20):
+            predictions = [predict(message) for message, _ in CORPUS]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / (20 * len(CORPUS))
+
+        for (message, label), prediction in zip(CORPUS, predictions):
+            if label == "chat":
+                chat_total += 1
+            if prediction is None:
+                deferred += 1
+                continue
+            settled += 1
+            if label == "chat":
+                chat_settled += 1
+            if prediction == label:
+                correct += 1
+            else:
+                errors.append((message, label, prediction))
+
+        accuracy = correct / settled
+        print(f"\nsettled {settled}/{len(CORPUS)}, accuracy {accuracy:.1%}, "
+              f"plain chat settled {chat_settled}/{chat_total}, {elapsed_ms:.3f} ms/message")
+
+        self.assertEqual(errors, [])
+        self.assertGreaterEqual(settled / len(CORPUS), 0.7)
+        self.assertGreaterEqual(chat_settled / chat_total, 0.8)
+        self.assertLess(elapsed_ms, 1.0)
+
+    def test_note_extraction(self):
+        result = classify_intent("Anote que preciso comprar leite")
+        self.assertEqual(result, "CRIAR_NOTA|Preciso comprar leite|Preciso comprar leite|personal")
+
+    def test_reminder_extraction(self):
+        now = datetime(2025, 6, 4, 9, 0)  # a Wednesday
+        result = classify_intent("Me lembre de ligar para o médico amanhã às 15h", now=now)
+        self.assertEqual(
+            result,
+            "CRIAR_LEMBRETE|Ligar para o médico|Ligar para o médico amanhã às 15h|2025-06-05T15:00:00|medium",
+        )
+
+    def test_reminder_dates(self):
+        now = datetime(2025, 6, 4, 9, 0)  # a Wednesday
+        self.assertEqual(parse_reminder_date(fold("sexta às 3pm"), now), datetime(2025, 6, 6, 15, 0))
+        self.assertEqual(parse_reminder_date(fold("depois de amanhã 9h30"), now), datetime(2025, 6, 6, 9, 30))
+        self.assertEqual(parse_reminder_date(fold("quarta"), now), datetime(2025, 6, 11, 10, 0))
+        self.assertEqual(parse_reminder_date(fold("hoje às 18h"), now), datetime(2025, 6, 4, 18, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from llm import LlmClientPool
+
+
+class FakeChat:
+    """Stand-in for a configured LlmChat that keeps its conversation in .messages"""
+
+    created = 0
+    in_flight = 0
+    max_in_flight = 0
+
+    def __init__(self, profile):
+        FakeChat.created += 1
+        self.profile = profile
+        self.messages = [{"role": "system", "content": profile.system_message}]
+
+    async def send_message(self, text):
+        FakeChat.in_flight += 1
+        FakeChat.max_in_flight = max(FakeChat.max_in_flight, FakeChat.in_flight)
+        history = len(self.messages)
+        self.messages.append({"role": "user", "content": text})
+        await asyncio.sleep(0.01)
+        FakeChat.in_flight -= 1
+        return history
+
+
+class StatelessChat:
+    def __init__(self, profile):
+        pass
+
+
+class LlmClientPoolTest(unittest.TestCase):
+    def setUp(self):
+        FakeChat.created = FakeChat.in_flight = FakeChat.max_in_flight = 0
+
+    def ask(self, pool, profile, text):
+        async def run():
+            async with pool.client(profile) as chat:
+                return await chat.send_message(text)
+        return run()
+
+    def test_clients_are_reused_with_a_clean_history(self):
+        pool = LlmClientPool(FakeChat, max_concurrency=4)
+        pool.register("search", "Você pesquisa.")
+
+        async def run():
+            return [await self.ask(pool, "search", f"q{i}") for i in range(5)]
+
+        # Every call sees only the system message, never earlier requests
+        self.assertEqual(asyncio.run(run()), [1, 1, 1, 1, 1])
+        stats = pool.stats()["profiles"]["search"]
+        self.assertEqual((stats["created"], stats["reused"]), (1, 4))
+
+    def test_concurrency_is_bounded(self):
+        pool = LlmClientPool(FakeChat, max_concurrency=3, max_idle=10)
+        pool.register("code", "Você analisa código.")
+
+        async def run():
+            await asyncio.gather(*(self.ask(pool, "code", str(i)) for i in range(20)))
+
+        asyncio.run(run())
+        self.assertEqual(FakeChat.max_in_flight, 3)
+        self.assertEqual(FakeChat.created, 3)
+        self.assertEqual(pool.stats()["in_use"], 0)
+
+    def test_clients_that_cannot_be_reset_or_fail_are_discarded(self):
+        pool = LlmClientPool(StatelessChat)
+        pool.register("intent", "Classifique.", max_tokens=200)
+
+        async def checkout():
+            async with pool.client("intent"):
+                pass
+
+        asyncio.run(checkout())
+        self.assertEqual(pool.stats()["profiles"]["intent"]["discarded"], 1)
+
+        failing = LlmClientPool(FakeChat)
+        failing.register("chat", "Converse.")
+
+        async def fail():
+            async with failing.client("chat"):
+                raise RuntimeError("provider error")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(fail())
+        self.assertEqual(failing.stats()["profiles"]["chat"]["idle"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import MetricsMiddleware, MongoCommandMetrics, Registry, http_requests, mongo_command_seconds
+from tests.server_app import ServerTestCase
+
+
+class RegistryTest(unittest.TestCase):
+    def test_text_format(self):
+        registry = Registry()
+        requests = registry.counter("requests_total", "Requests", ["route"])
+        latency = registry.histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0))
+        registry.callback("ratio", "Hit ratio", ["cache"], lambda: {("search",): 0.5})
+
+        requests.inc('/a"b')
+        requests.inc('/a"b', amount=2)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe("/a", value=value)
+
+        text = registry.render()
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{route="/a\\"b"} 3', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1.0"} 3', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{route="/a"} 4', text)
+        self.assertIn('ratio{cache="search"} 0.5', text)
+
+        with self.assertRaises(ValueError):
+            registry.counter("requests_total", "again")
+
+    def test_failing_callback_is_left_out(self):
+        registry = Registry()
+        registry.counter("ok_total", "Fine").inc()
+        registry.callback("broken", "Raises", [], lambda: 1 / 0)
+        text = registry.render()
+        self.assertIn("ok_total 1", text)
+        self.assertNotIn("broken", text)
+
+    def test_recording_overhead(self):
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency", ["route"])
+        count = 100000
+        start = time.perf_counter()
+        for i in range(count):
+            with latency.time("/api/notes"):
+                pass
+        per_sample = (time.perf_counter() - start) / count
+        print(f"\nhistogram timer: {per_sample * 1e6:.2f} us per sample")
+        self.assertEqual(latency.count("/api/notes"), count)
+        self.assertLess(per_sample, 50e-6)
+
+
+class MiddlewareTest(unittest.TestCase):
+    def test_requests_are_labelled_by_route_template(self):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            return {"id": item_id}
+
+        @app.get("/boom")
+        async def boom():
+            raise RuntimeError("boom")
+
+        before = http_requests.value("GET", "/items/{item_id}", "200")
+        with TestClient(app, raise_server_exceptions=False) as client:
+            client.get("/items/1")
+            client.get("/items/2")
+            client.get("/boom")
+            client.get("/missing")
+
+        self.assertEqual(http_requests.value("GET", "/items/{item_id}", "200") - before, 2)
+        self.assertGreaterEqual(http_requests.value("GET", "/boom", "500"), 1)
+        self.assertGreaterEqual(http_requests.value("GET", "unmatched", "404"), 1)
+
+
+class MongoCommandMetricsTest(unittest.TestCase):
+    def test_latency_by_collection(self):
+        listener = MongoCommandMetrics()
+        before = mongo_command_seconds.count("notes_test", "find")
+
+        def event(command_name, command=None, request_id=1):
+            return SimpleNamespace(command_name=command_name, command=command or {}, request_id=request_id,
+                                   operation_id=request_id, duration_micros=1500)
+
+        listener.started(event("find", {"find": "notes_test", "filter": {}}))
+        listener.succeeded(event("find"))
+        listener.started(event("getMore", {"getMore": 123, "collection": "notes_test"}, request_id=2))
+        listener.failed(event("getMore", request_id=2))
+        # Commands without a collection (ping, hello) are not recorded
+        listener.started(event("ping", {"ping": 1}, request_id=3))
+        listener.succeeded(event("ping", request_id=3))
+
+        self.assertEqual(mongo_command_seconds.count("notes_test", "find") - before, 1)
+        self.assertEqual(mongo_command_seconds.count("notes_test", "getMore"), 1)
+        self.assertEqual(listener._collections, {})
+
+
+class MetricsEndpointTest(ServerTestCase):
+    def test_scrape_covers_routes_chat_stages_and_llm(self):
+        note = self.client.post("/api/notes", json={"title": "Nota", "content": "..."}).json()
+        self.client.put(f"/api/notes/{note['id']}", json={"title": "Nota", "content": "editada"})
+        self.assertEqual(self.client.post("/api/chat", json={"message": "Como vai?"}).status_code, 200)
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.headers["content-type"], "text/plain; version=0.0.4; charset=utf-8")
+        text = response.text
+        self.assertIn('http_requests_total{method="POST",route="/api/notes",status="200"}', text)
+        self.assertIn('http_requests_total{method="PUT",route="/api/notes/{note_id}",status="200"}', text)
+        self.assertNotIn(note["id"], text)
+        self.assertIn('chat_stage_duration_seconds_count{stage="reply_llm"}', text)
+        self.assertIn('llm_request_duration_seconds_count{profile="chat"}', text)
+        self.assertIn('cache_hit_ratio{cache="search"}', text)
+        self.assertIn("http_requests_in_flight", text)
+        # The scrape itself is not counted
+        self.assertNotIn('route="/metrics"', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
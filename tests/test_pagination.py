@@ -0,0 +1,48 @@
+import unittest
+from datetime import datetime
+
+from pagination import InvalidCursor, apply_cursor, build_projection, decode_cursor, encode_cursor, keyset_filter
+
+SORT = [("created_at", -1), ("id", -1)]
+
+
+class PaginationTest(unittest.TestCase):
+    def test_cursor_round_trip(self):
+        doc = {"id": "abc", "created_at": datetime(2025, 1, 2, 3, 4, 5, 123000), "content": "x"}
+        self.assertEqual(decode_cursor(encode_cursor(doc, SORT), SORT), [doc["created_at"], "abc"])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not-a-cursor", SORT)
+
+    def test_keyset_filter_breaks_ties_on_id(self):
+        ts = datetime(2025, 1, 1)
+        self.assertEqual(keyset_filter([ts, "m"], SORT), {"$or": [
+            {"created_at": {"$lt": ts}},
+            {"created_at": ts, "id": {"$lt": "m"}},
+        ]})
+        self.assertEqual(keyset_filter([ts, "m"], [("date", 1), ("id", 1)]), {"$or": [
+            {"date": {"$gt": ts}},
+            {"date": ts, "id": {"$gt": "m"}},
+        ]})
+
+    def test_apply_cursor_keeps_filters(self):
+        cursor = encode_cursor({"id": "m", "created_at": datetime(2025, 1, 1)}, SORT)
+        query = apply_cursor({"category": "work"}, cursor, SORT)
+        self.assertEqual(query["$and"][0], {"category": "work"})
+        self.assertEqual(apply_cursor({"category": "work"}, None, SORT), {"category": "work"})
+
+    def test_projection(self):
+        allowed = ["id", "title", "content", "created_at"]
+        self.assertEqual(build_projection(None, allowed, ["created_at", "id"]), (None, allowed))
+
+        projection, selected = build_projection("title", allowed, ["created_at", "id"])
+        self.assertEqual(selected, ["id", "title"])
+        self.assertEqual(projection, {"id": 1, "title": 1, "created_at": 1, "_id": 0})
+
+        with self.assertRaises(ValueError):
+            build_projection("title,secret", allowed, ["id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import statistics
+import time
+import unittest
+from datetime import datetime
+
+from reminder_scheduler import ReminderScheduler
+
+
+def at(offset):
+    """A reminder date `offset` seconds from now"""
+    return datetime.fromtimestamp(time.time() + offset)
+
+
+class ReminderSchedulerTest(unittest.TestCase):
+    def test_fires_in_due_order_and_follows_updates(self):
+        fired = []
+
+        async def scenario():
+            scheduler = ReminderScheduler(on_due=lambda r: fired.append(r["id"]))
+            scheduler.load([{"id": "c", "date": at(0.06)}, {"id": "a", "date": at(0.02)}, {"id": "gone", "date": at(0.03)}])
+            scheduler.start()
+            scheduler.schedule({"id": "b", "date": at(0.04)})
+            scheduler.schedule({"id": "late", "date": at(0.01)})
+            scheduler.schedule({"id": "late", "date": at(0.08)})  # moved later
+            scheduler.schedule({"id": "first", "date": at(0.005)})  # wakes the sleeping runner
+            self.assertTrue(scheduler.cancel("gone"))
+            self.assertFalse(scheduler.cancel("unknown"))
+            await asyncio.sleep(0.15)
+            await scheduler.stop()
+            return scheduler.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual(fired, ["first", "a", "b", "c", "late"])
+        self.assertEqual(stats["pending"], 0)
+        self.assertEqual(stats["fired"], 5)
+        self.assertLess(stats["lag_ms_max"], 50)
+
+    def test_overdue_reminders_fire_immediately_and_handler_errors_are_contained(self):
+        fired = []
+
+        def on_due(reminder):
+            if reminder["id"] == "broken":
+                raise RuntimeError("subscriber failed")
+            fired.append(reminder["id"])
+
+        scheduler = ReminderScheduler(on_due=on_due)
+        scheduler.load([{"id": "broken", "date": at(-60)}, {"id": "overdue", "date": at(-30)}, {"id": "future", "date": at(3600)}])
+        next_in = scheduler.fire_due()
+        self.assertEqual(fired, ["overdue"])
+        self.assertAlmostEqual(next_in, 3600, delta=5)
+        self.assertEqual(len(scheduler), 1)
+
+    def test_cancelled_entries_are_compacted(self):
+        scheduler = ReminderScheduler(on_due=lambda r: None)
+        for i in range(5000):
+            scheduler.schedule({"id": "moving", "date": at(1000 + i)})
+        self.assertEqual(len(scheduler), 1)
+        self.assertLess(scheduler.stats()["heap_size"], 1100)
+        for i in range(5000):
+            scheduler.schedule({"id": str(i), "date": at(1000)})
+            scheduler.cancel(str(i))
+        self.assertLess(scheduler.stats()["heap_size"], 1100)
+
+    def test_dispatch_latency_with_a_million_pending(self):
+        """Schedule/cancel cost and firing lag as the number of pending reminders grows"""
+        rng = random.Random(5)
+        now = time.time()
+        results = {}
+
+        async def measure(pending):
+            fired = asyncio.Event()
+            scheduler = ReminderScheduler(on_due=lambda r: r["id"] == "probe" and fired.set())
+            # Pending reminders spread over the next year
+            scheduler.load({"id": str(i), "date": datetime.fromtimestamp(now + 3600 + rng.random() * 365 * 86400)}
+                           for i in range(pending))
+            scheduler.start()
+
+            timings = []
+            for i in range(2000):
+                start = time.perf_counter()
+                scheduler.schedule({"id": f"new{i}", "date": datetime.fromtimestamp(now + 7200 + i)})
+                scheduler.cancel(str(i))
+                timings.append((time.perf_counter() - start) * 1e6)
+
+            scheduler.schedule({"id": "probe", "date": at(0.02)})
+            await asyncio.wait_for(fired.wait(), 5)
+            await scheduler.stop()
+            return statistics.median(timings), scheduler.stats()["lag_ms_max"]
+
+        for pending in [10000, 100000, 1000000]:
+            results[pending] = asyncio.run(measure(pending))
+            print(f"\n{pending} pending: schedule+cancel p50 {results[pending][0]:.1f} us, firing lag {results[pending][1]:.2f} ms")
+
+        self.assertLess(results[1000000][0], 100)
+        self.assertLess(results[1000000][1], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
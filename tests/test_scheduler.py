@@ -0,0 +1,152 @@
+import asyncio
+import time
+import unittest
+
+from scheduler import LlmOverloaded, LlmScheduler, is_overload_error
+
+
+class FakeProvider:
+    """LLM backend with fixed latency that answers 429 above `capacity` concurrent calls"""
+
+    def __init__(self, latency=0.01, capacity=None):
+        self.latency = latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.calls = 0
+        self.rejected = 0
+
+    async def complete(self, prompt):
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            if self.capacity is not None and self.in_flight > self.capacity:
+                self.rejected += 1
+                raise RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded")
+            await asyncio.sleep(self.latency)
+            return f"ok {prompt}"
+        finally:
+            self.in_flight -= 1
+
+
+async def call(scheduler, provider, prompt, priority=1, timeout=None):
+    async with scheduler.admit(priority, timeout):
+        return await provider.complete(prompt)
+
+
+class LlmSchedulerTest(unittest.TestCase):
+    def test_chat_is_served_before_queued_background_work(self):
+        scheduler = LlmScheduler(rate=1000, burst=1000, initial_limit=1, max_limit=1)
+        provider = FakeProvider(latency=0.01)
+        order = []
+
+        async def tracked(name, priority):
+            await call(scheduler, provider, name, priority)
+            order.append(name)
+
+        async def run():
+            first = asyncio.ensure_future(tracked("first", 1))
+            await asyncio.sleep(0)
+            others = [asyncio.ensure_future(tracked(f"code{i}", 1)) for i in range(3)]
+            await asyncio.sleep(0)
+            chat = asyncio.ensure_future(tracked("chat", 0))
+            await asyncio.gather(first, chat, *others)
+
+        asyncio.run(run())
+        self.assertEqual(order[:2], ["first", "chat"])
+
+    def test_queued_call_expires_at_its_deadline(self):
+        scheduler = LlmScheduler(rate=1000, burst=1000, initial_limit=1, max_limit=1)
+        provider = FakeProvider(latency=0.2)
+
+        async def run():
+            busy = asyncio.ensure_future(call(scheduler, provider, "slow"))
+            await asyncio.sleep(0)
+            scheduler.avg_latency = 0.01  # optimistic estimate, so the call is queued rather than shed
+            with self.assertRaises(LlmOverloaded) as ctx:
+                await call(scheduler, provider, "late", timeout=0.05)
+            await busy
+            return ctx.exception
+
+        error = asyncio.run(run())
+        self.assertEqual(error.retry_after_header, "1")
+        self.assertEqual(scheduler.expired, 1)
+        self.assertEqual(scheduler.in_flight, 0)
+
+    def test_sheds_immediately_when_wait_exceeds_deadline(self):
+        scheduler = LlmScheduler(rate=1000, burst=1000, initial_limit=1, max_limit=1)
+        provider = FakeProvider(latency=0.2)
+        scheduler.avg_latency = 5.0
+
+        async def run():
+            busy = asyncio.ensure_future(call(scheduler, provider, "slow"))
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            with self.assertRaises(LlmOverloaded) as ctx:
+                await call(scheduler, provider, "shed", timeout=1.0)
+            elapsed = time.perf_counter() - start
+            busy.cancel()
+            return ctx.exception, elapsed
+
+        error, elapsed = asyncio.run(run())
+        self.assertLess(elapsed, 0.01)
+        self.assertGreaterEqual(int(error.retry_after_header), 5)
+        self.assertEqual(scheduler.shed, 1)
+
+    def test_token_bucket_limits_rate(self):
+        scheduler = LlmScheduler(rate=50, burst=5, initial_limit=64, max_limit=64)
+        provider = FakeProvider(latency=0)
+
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(*(call(scheduler, provider, i) for i in range(20)))
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(run())
+        # 5 calls from the burst, the other 15 at 50/s
+        self.assertGreaterEqual(elapsed, 0.25)
+        self.assertLess(elapsed, 1.0)
+
+    def test_overload_errors_are_classified(self):
+        self.assertTrue(is_overload_error(RuntimeError("429 Too Many Requests")))
+        self.assertTrue(is_overload_error(RuntimeError("RESOURCE_EXHAUSTED")))
+        self.assertTrue(is_overload_error(asyncio.TimeoutError()))
+        self.assertFalse(is_overload_error(ValueError("invalid prompt")))
+
+    def test_aimd_converges_to_provider_capacity(self):
+        """Burst of calls against a provider that rejects above 4 concurrent calls"""
+
+        async def burst(scheduler, provider, size):
+            results = await asyncio.gather(
+                *(call(scheduler, provider, i) for i in range(size)),
+                return_exceptions=True
+            )
+            return sum(1 for r in results if isinstance(r, str))
+
+        print()
+        outcomes = {}
+        for name, kwargs in [
+            ("fixed limit 16", dict(initial_limit=16, min_limit=16, max_limit=16)),
+            ("adaptive", dict(initial_limit=16, min_limit=1, max_limit=16)),
+        ]:
+            scheduler = LlmScheduler(rate=10000, burst=10000, max_queue=1000, timeout=10, **kwargs)
+            scheduler.avg_latency = 0.01
+            provider = FakeProvider(latency=0.01, capacity=4)
+            ok = asyncio.run(burst(scheduler, provider, 400))
+            outcomes[name] = (ok, provider.rejected)
+            print(f"{name:<15} {ok}/400 succeeded, {provider.rejected} provider 429s, final window {scheduler.limit:.1f}")
+
+        self.assertGreater(outcomes["adaptive"][0], outcomes["fixed limit 16"][0])
+        self.assertLess(outcomes["adaptive"][1], outcomes["fixed limit 16"][1])
+
+    def test_provider_overload_surfaces_as_overloaded(self):
+        scheduler = LlmScheduler(rate=1000, burst=1000, initial_limit=2)
+        provider = FakeProvider(latency=0.01, capacity=0)
+
+        with self.assertRaises(LlmOverloaded):
+            asyncio.run(call(scheduler, provider, "x"))
+        self.assertEqual(scheduler.limit, 1)
+        self.assertEqual(scheduler.overloads, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
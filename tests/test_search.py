@@ -0,0 +1,43 @@
+import unittest
+from datetime import datetime, timedelta
+
+from tests.server_app import FakeLlmChat, ServerTestCase
+
+
+class SearchCacheEndpointTest(ServerTestCase):
+    def search(self, query):
+        response = self.client.post("/api/search", json={"query": query})
+        self.assertEqual(response.status_code, 200)
+        self.flush()
+        return response.json()
+
+    def test_repeated_hits_do_not_keep_an_answer_fresh(self):
+        calls = FakeLlmChat.calls
+        self.assertFalse(self.search("O que é IA?")["cached"])
+        self.assertTrue(self.search("o que é  ia")["cached"])
+        self.assertEqual(FakeLlmChat.calls - calls, 1)
+
+        rows = self.call(self.server.searches_repo.find, {})
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(len({row["answered_at"] for row in rows}), 1)
+
+        # The answer was produced past the TTL; the hit row written a moment ago must not revive it
+        async def age_answer():
+            answered_at = datetime.now() - timedelta(seconds=self.server.SEARCH_CACHE_TTL_SECONDS + 1)
+            await self.server.db.searches.update_many({}, {"$set": {"answered_at": answered_at}})
+        self.call(age_answer)
+        self.server.search_cache.memory.invalidate()
+        self.assertFalse(self.search("o que é ia")["cached"])
+        self.assertEqual(FakeLlmChat.calls - calls, 2)
+
+    def test_deleted_search_is_not_served(self):
+        first = self.search("Qual a capital da França?")
+        self.assertFalse(first["cached"])
+        search_id = self.call(self.server.searches_repo.find, {})[0]["id"]
+
+        self.assertEqual(self.client.delete(f"/api/search/{search_id}").status_code, 200)
+        self.assertFalse(self.search("Qual a capital da França?")["cached"])
+
+
+if __name__ == "__main__":
+    unittest.main()
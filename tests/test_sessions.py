@@ -0,0 +1,256 @@
+import asyncio
+import os
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from sessions import SessionStore, preview, session_title
+from tests.server_app import ServerTestCase
+from writebehind import WriteBehindQueue
+
+# Set to a scratch MongoDB (e.g. mongodb://localhost:27017) to run the session listing benchmark
+BENCHMARK_MONGO_URL = os.environ.get("MONGO_BENCHMARK_URL")
+
+
+class FakeSessions:
+    """Applies the subset of Mongo updates SessionStore uses, counting round-trips"""
+
+    def __init__(self):
+        self.docs = {}
+        self.round_trips = 0
+        # Apply the next bulk write, then fail as if the reply was lost
+        self.lose_reply = False
+        self.rejected = set()
+
+    async def insert_if_missing(self, session_id, document):
+        self.round_trips += 1
+        if session_id in self.docs:
+            return False
+        self.docs[session_id] = {**document, "session_id": session_id}
+        return True
+
+    def apply(self, query, update):
+        doc = self.docs[query["session_id"]]
+        marker = query.get("last_turn_id", {}).get("$ne")
+        if marker is not None and doc.get("last_turn_id") == marker:
+            return
+        for field, value in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + value
+        for field, value in update.get("$max", {}).items():
+            doc[field] = max(doc[field], value) if doc.get(field) else value
+        doc.update(update.get("$set", {}))
+
+    async def update_one(self, query, update):
+        self.round_trips += 1
+        self.apply(query, update)
+        return 1
+
+    async def bulk_write(self, operations, ordered=False):
+        self.round_trips += 1
+        errors = []
+        for index, operation in enumerate(operations):
+            if operation._filter["session_id"] in self.rejected:
+                errors.append({"index": index, "errmsg": "document failed validation"})
+                continue
+            self.apply(operation._filter, operation._doc)
+        if self.lose_reply:
+            self.lose_reply = False
+            raise ConnectionError("connection reset")
+        return {"nModified": len(operations) - len(errors)}, errors
+
+
+class SessionStoreTest(unittest.TestCase):
+    def test_known_sessions_resolve_without_round_trips(self):
+        sessions = FakeSessions()
+        store = SessionStore(sessions)
+
+        async def run():
+            for _ in range(100):
+                await store.resolve("s", "Primeira pergunta")
+            await store.resolve("t", "")
+
+        asyncio.run(run())
+        self.assertEqual(sessions.round_trips, 2)
+        self.assertEqual(sessions.docs["s"]["title"], "Primeira pergunta")
+        self.assertEqual(sessions.docs["t"]["title"], "Nova conversa")
+        self.assertNotIn("messages", sessions.docs["s"])
+
+        # Another process already created it: the upsert leaves it untouched
+        sessions.docs["u"] = {"session_id": "u", "title": "Existente", "turn_count": 7}
+        asyncio.run(store.resolve("u", "outra"))
+        self.assertEqual(sessions.docs["u"]["title"], "Existente")
+
+    def test_turns_update_aggregates_incrementally(self):
+        sessions = FakeSessions()
+        store = SessionStore(sessions)
+        start = datetime.now() + timedelta(hours=1)
+
+        async def run():
+            await store.resolve("s", "oi")
+            for i in range(3):
+                await store.record_turn("s", f"pergunta {i}", "r" * 300, start + timedelta(minutes=i))
+            # A turn flushed late does not move last_activity backwards
+            await store.record_turn("s", "atrasada", "ok", start)
+            await store.forget_turns("s")
+
+        asyncio.run(run())
+        session = sessions.docs["s"]
+        self.assertEqual(session["turn_count"], 3)
+        self.assertEqual(session["last_activity"], start + timedelta(minutes=2))
+        self.assertEqual(session["last_message"], "atrasada")
+
+    def test_queued_turns_share_one_write(self):
+        sessions = FakeSessions()
+        start = datetime.now()
+
+        async def run():
+            queue = WriteBehindQueue(flush_interval=0.01)
+            store = SessionStore(sessions, write_queue=queue)
+            await store.resolve("s", "oi")
+            await store.resolve("t", "oi")
+            trips = sessions.round_trips
+            for i in range(10):
+                await store.record_turn("s" if i % 2 else "t", f"pergunta {i}", "ok", start + timedelta(seconds=i))
+            # Recording a turn only queues it
+            self.assertEqual(sessions.round_trips, trips)
+            await queue.close()
+            return sessions.round_trips - trips
+
+        self.assertEqual(asyncio.run(run()), 1)
+        self.assertEqual(sessions.docs["s"]["turn_count"], 5)
+        self.assertEqual(sessions.docs["s"]["last_message"], "pergunta 9")
+        self.assertEqual(sessions.docs["t"]["last_activity"], start + timedelta(seconds=8))
+
+    def test_retried_turns_are_counted_once_and_failures_reported(self):
+        sessions = FakeSessions()
+        sessions.lose_reply = True
+        sessions.rejected.add("bad")
+
+        async def run():
+            queue = WriteBehindQueue(flush_interval=0.01, retry_backoff=0.001)
+            store = SessionStore(sessions, write_queue=queue)
+            for session_id in ("s", "t", "bad"):
+                await store.resolve(session_id, "oi")
+            for i in range(6):
+                await store.record_turn(("s", "t", "bad")[i % 3], f"pergunta {i}", "ok", datetime.now())
+            await queue.close()
+            return queue.stats()
+
+        stats = asyncio.run(run())
+        # The first attempt was applied but looked failed; the retry must not add the turns again
+        self.assertEqual(stats["retries"], 1)
+        self.assertEqual(sessions.docs["s"]["turn_count"], 2)
+        self.assertEqual(sessions.docs["t"]["turn_count"], 2)
+        self.assertEqual((stats["written"], stats["failed"]), (4, 2))
+
+    def test_previews(self):
+        self.assertEqual(preview("abc", 5), "abc")
+        self.assertEqual(preview("abcdef", 5), "abcde...")
+        self.assertEqual(session_title("  como   fazer\nisso "), "como fazer isso")
+
+
+class SessionListEndpointTest(ServerTestCase):
+    def chat(self, session_id, message):
+        response = self.client.post("/api/chat", json={"message": message, "session_id": session_id})
+        self.assertEqual(response.status_code, 200)
+
+    def test_lists_most_recent_conversations_with_aggregates(self):
+        self.chat("a", "Primeira pergunta")
+        self.chat("b", "Outra conversa")
+        self.chat("a", "Segunda pergunta")
+        self.flush()
+
+        first = self.client.get("/api/sessions", params={"limit": 1})
+        self.assertEqual(first.status_code, 200)
+        [session] = first.json()
+        self.assertEqual(session["session_id"], "a")
+        self.assertEqual(session["title"], "Primeira pergunta")
+        self.assertEqual(session["turn_count"], 2)
+        self.assertEqual(session["last_message"], "Segunda pergunta")
+        self.assertNotIn("summary", session)
+
+        second = self.client.get("/api/sessions", params={"limit": 1, "after": first.headers["X-Next-Cursor"]})
+        self.assertEqual([s["session_id"] for s in second.json()], ["b"])
+        fields = self.client.get("/api/sessions", params={"fields": "session_id,turn_count"}).json()
+        self.assertEqual(fields, [{"session_id": "a", "turn_count": 2}, {"session_id": "b", "turn_count": 1}])
+        self.assertEqual(self.client.get("/api/sessions", params={"fields": "summary"}).status_code, 400)
+
+
+@unittest.skipUnless(BENCHMARK_MONGO_URL, "MONGO_BENCHMARK_URL not set")
+class SessionListingBenchmark(unittest.TestCase):
+    """Listing the 50 most recent conversations over 1M chat rows:
+    $group over chats vs. reading the aggregates on the session documents"""
+
+    CHATS = 1_000_000
+    SESSIONS = 10_000
+    PAGE = 50
+
+    def test_listing_reads_session_aggregates(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo import DESCENDING
+
+        from database import backfill_session_aggregates, ensure_indexes
+
+        async def timed(coro_fn, repeat=5):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = await coro_fn()
+                best = min(best, time.perf_counter() - start)
+            return best, result
+
+        async def run():
+            client = AsyncIOMotorClient(BENCHMARK_MONGO_URL)
+            database = client[f"ai_assistant_sessions_benchmark_{os.getpid()}"]
+            try:
+                await ensure_indexes(database)
+                start = datetime(2025, 1, 1)
+                await database.sessions.insert_many(
+                    [{"session_id": f"s{i:05d}", "created_at": start} for i in range(self.SESSIONS)]
+                )
+                batch = []
+                for i in range(self.CHATS):
+                    batch.append({"session_id": f"s{i % self.SESSIONS:05d}", "message": f"pergunta {i}",
+                                  "response": "resposta", "timestamp": start + timedelta(seconds=i)})
+                    if len(batch) == 10_000:
+                        await database.chats.insert_many(batch, ordered=False)
+                        batch = []
+
+                backfill_start = time.perf_counter()
+                updated = await backfill_session_aggregates(database)
+                backfill = time.perf_counter() - backfill_start
+
+                async def group_over_chats():
+                    return await database.chats.aggregate([
+                        {"$sort": {"timestamp": 1}},
+                        {"$group": {"_id": "$session_id", "turn_count": {"$sum": 1},
+                                    "last_activity": {"$last": "$timestamp"}, "last_message": {"$last": "$message"}}},
+                        {"$sort": {"last_activity": -1}},
+                        {"$limit": self.PAGE},
+                    ], allowDiskUse=True).to_list(length=None)
+
+                async def read_aggregates():
+                    return await database.sessions.find(
+                        {}, {"session_id": 1, "title": 1, "turn_count": 1, "last_activity": 1, "last_message": 1}
+                    ).sort([("last_activity", DESCENDING), ("session_id", DESCENDING)]).limit(self.PAGE).to_list(length=None)
+
+                grouped, expected = await timed(group_over_chats, repeat=2)
+                listed, sessions = await timed(read_aggregates)
+                return updated, backfill, grouped, listed, expected, sessions
+            finally:
+                await client.drop_database(database.name)
+                client.close()
+
+        updated, backfill, grouped, listed, expected, sessions = asyncio.run(run())
+        print(f"\n{self.CHATS} chats / {self.SESSIONS} sessions: backfill {backfill:.1f}s, "
+              f"$group over chats {grouped * 1000:.0f} ms, session aggregates {listed * 1000:.1f} ms "
+              f"({grouped / listed:.0f}x)")
+
+        self.assertEqual(updated, self.SESSIONS)
+        self.assertEqual([s["session_id"] for s in sessions], [e["_id"] for e in expected])
+        self.assertEqual(sessions[0]["turn_count"], self.CHATS // self.SESSIONS)
+        self.assertLess(listed * 10, grouped)
+
+
+if __name__ == "__main__":
+    unittest.main()
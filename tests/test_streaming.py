@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+import unittest
+from types import SimpleNamespace
+
+import streaming
+from streaming import relay_stream, stream_completion
+
+TOKENS = ["Olá", ", ", "tudo", " bem", "?"] * 4
+TOKEN_DELAY = 0.02
+
+
+class FakeLiteLLM:
+    """Stand-in for litellm that emits tokens with a delay between them"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def acompletion(self, **kwargs):
+        self.calls.append(kwargs)
+
+        async def chunks():
+            for token in TOKENS:
+                await asyncio.sleep(TOKEN_DELAY)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None))])
+
+        return chunks()
+
+
+def parse_events(raw_events):
+    events = []
+    for raw in raw_events:
+        event, data = "message", None
+        for line in raw.strip().split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+class StreamingTest(unittest.TestCase):
+    def setUp(self):
+        self.original = streaming.litellm
+        self.fake = FakeLiteLLM()
+        streaming.litellm = self.fake
+
+    def tearDown(self):
+        streaming.litellm = self.original
+
+    def test_first_token_arrives_before_completion(self):
+        saved = []
+
+        async def on_complete(text):
+            saved.append(text)
+            return {"response": text}
+
+        async def run():
+            start = time.perf_counter()
+            first_token_at, raw = None, []
+            tokens = stream_completion("system", "oi", api_key="key")
+            async for event in relay_stream(tokens, on_complete, meta={"session_id": "s"}):
+                raw.append(event)
+                if first_token_at is None and '"token"' in event:
+                    first_token_at = time.perf_counter() - start
+            return first_token_at, time.perf_counter() - start, raw
+
+        first_token_at, total, raw = asyncio.run(run())
+        events = parse_events(raw)
+        print(f"\ntime to first token {first_token_at * 1000:.0f} ms, full stream {total * 1000:.0f} ms")
+
+        self.assertLess(first_token_at, total / 5)
+        self.assertEqual(events[0], ("meta", {"session_id": "s"}))
+        self.assertEqual([d["token"] for e, d in events if e == "message"], TOKENS)
+        self.assertEqual(events[-1], ("done", {"response": "".join(TOKENS)}))
+        self.assertEqual(saved, ["".join(TOKENS)])
+
+        messages = self.fake.calls[0]["messages"]
+        self.assertEqual([m["role"] for m in messages], ["system", "user"])
+        self.assertTrue(self.fake.calls[0]["stream"])
+
+    def test_error_is_reported_and_nothing_saved(self):
+        saved = []
+
+        async def broken():
+            yield "parcial"
+            raise RuntimeError("quota exceeded")
+
+        async def on_complete(text):
+            saved.append(text)
+            return {}
+
+        async def run():
+            return [event async for event in relay_stream(broken(), on_complete)]
+
+        events = parse_events(asyncio.run(run()))
+        self.assertEqual(events[-1], ("error", {"detail": "quota exceeded"}))
+        self.assertEqual(saved, [])
+
+    def test_unavailable_without_litellm(self):
+        streaming.litellm = None
+        self.assertFalse(streaming.streaming_available())
+
+        async def run():
+            return [t async for t in stream_completion("system", "oi", api_key="key")]
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
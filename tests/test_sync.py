@@ -0,0 +1,76 @@
+import unittest
+from datetime import datetime, timedelta
+
+from pagination import InvalidCursor
+from sync import CHANGES_SORT, SETTLE, decode_sync_cursor, encode_sync_cursor, next_position, oldest_position
+from tests.server_app import ServerTestCase
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def doc(minutes_ago, doc_id):
+    return {"id": doc_id, "updated_at": NOW - timedelta(minutes=minutes_ago)}
+
+
+class SyncCursorTest(unittest.TestCase):
+    def test_cursor_round_trip(self):
+        positions = {"note": [datetime(2025, 1, 2, 3, 4, 5, 123000), "abc"], "note.deleted": None}
+        self.assertEqual(decode_sync_cursor(encode_sync_cursor(positions)), positions)
+        self.assertEqual(oldest_position(positions), datetime(2025, 1, 2, 3, 4, 5, 123000))
+
+    def test_invalid_cursor(self):
+        for cursor in ["not-a-cursor", encode_sync_cursor({"note": [1, 2, 3]}), encode_sync_cursor({"note": [1, "x"]}),
+                       encode_sync_cursor({"note": [datetime(2025, 1, 1), 5]}), encode_sync_cursor([])]:
+            with self.assertRaises(InvalidCursor):
+                decode_sync_cursor(cursor)
+
+    def test_full_page_continues_after_its_last_document(self):
+        page = [doc(10, "a"), doc(0, "b")]
+        self.assertEqual(next_position(None, page, 2, CHANGES_SORT, NOW), [NOW, "b"])
+
+    def test_partial_page_stops_short_of_recent_writes(self):
+        settled = [NOW - SETTLE, ""]
+        self.assertEqual(next_position(None, [doc(10, "a"), doc(0, "b")], 5, CHANGES_SORT, NOW), settled)
+        self.assertEqual(next_position([NOW - timedelta(days=1), "x"], [], 5, CHANGES_SORT, NOW), settled)
+        # Never moves backwards past where a previous full page ended
+        ahead = [NOW - timedelta(seconds=1), "z"]
+        self.assertEqual(next_position(ahead, [], 5, CHANGES_SORT, NOW), ahead)
+
+
+class SyncEndpointTest(ServerTestCase):
+    def sync(self, **params):
+        response = self.client.get("/api/sync", params=params)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def create_note(self, title):
+        response = self.client.post("/api/notes", json={"title": title, "content": "..."})
+        self.assertEqual(response.status_code, 200)
+        self.flush()
+        return response.json()["id"]
+
+    def test_pages_changes_and_tombstones(self):
+        ids = [self.create_note(f"nota {i}") for i in range(3)]
+
+        first = self.sync(types="note", limit=2)
+        self.assertFalse(first["complete"])
+        second = self.sync(types="note", limit=2, cursor=first["cursor"])
+        self.assertTrue(second["complete"])
+        self.assertEqual([n["id"] for n in first["changes"]["note"] + second["changes"]["note"]], ids)
+        self.assertEqual(first["deleted"], [])
+
+        self.assertEqual(self.client.delete(f"/api/notes/{ids[0]}").status_code, 200)
+        self.flush()
+        third = self.sync(types="note", cursor=second["cursor"])
+        self.assertEqual([(d["type"], d["id"]) for d in third["deleted"]], [("note", ids[0])])
+        self.assertNotIn(ids[0], [n["id"] for n in third["changes"]["note"]])
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.get("/api/sync", params={"types": "chat"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/sync", params={"cursor": "nonsense"}).status_code, 400)
+        malformed = encode_sync_cursor({"note": [1, "x"]})
+        self.assertEqual(self.client.get("/api/sync", params={"cursor": malformed}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+import unittest
+
+from textindex import TextIndex, stem, tokenize, within_one_edit
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_accents_plurals_and_derivations_share_stems(self):
+        self.assertEqual(tokenize("Reunião"), tokenize("reunioes"))
+        self.assertEqual(tokenize("médicos"), tokenize("medico"))
+        self.assertEqual(tokenize("programação"), tokenize("programar"))
+        self.assertEqual(stem("papeis"), stem("papel"))
+        self.assertEqual(tokenize("a reunião de hoje com o time"), tokenize("reuniao hoje time"))
+
+    def test_within_one_edit(self):
+        self.assertTrue(within_one_edit("orcament", "orcamnt"))
+        self.assertTrue(within_one_edit("dentista", "dentita"))
+        self.assertFalse(within_one_edit("reunia", "reuniaoxx"))
+
+
+class TextIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TextIndex(capacity=2)
+        self.index.add("note", {"id": "n1", "title": "Reunião com a equipe", "content": "Discutir o orçamento", "tags": ["trabalho"]})
+        self.index.add("note", {"id": "n2", "title": "Lista de compras", "content": "Leite, pão e café para a reunião"})
+        self.index.add("reminder", {"id": "r1", "title": "Consulta médica", "description": "Levar exames"})
+        self.index.add("search", {"id": "s1", "query": "inteligência artificial", "results": "IA é um ramo da computação"})
+        self.index.add("code", {"id": "c1", "description": "ordenar lista", "language": "python", "analysis": "Use sorted()"})
+
+    def ids(self, query, **kwargs):
+        return [r["id"] for r in self.index.search(query, **kwargs)]
+
+    def test_ranked_by_field_weight(self):
+        # A title match outranks a match in the body
+        self.assertEqual(self.ids("reuniões"), ["n1", "n2"])
+
+    def test_accent_insensitive_and_type_filter(self):
+        self.assertEqual(self.ids("MEDICO"), ["r1"])
+        self.assertEqual(self.ids("lista", kinds=["code"]), ["c1"])
+        self.assertEqual(self.ids("inteligencia artificial."), ["s1"])
+
+    def test_typo_and_prefix_matching(self):
+        self.assertEqual(self.ids("orcamnto"), ["n1"])
+        self.assertEqual(self.ids("compu"), ["s1"])
+
+    def test_incremental_updates(self):
+        self.index.add("note", {"id": "n1", "title": "Planejamento", "content": "Sprint"})
+        self.assertEqual(self.ids("reunião"), ["n2"])
+        self.assertEqual(self.ids("planejamento"), ["n1"])
+
+        self.assertTrue(self.index.remove("note", "n2"))
+        self.assertFalse(self.index.remove("note", "n2"))
+        self.assertEqual(self.ids("reunião"), [])
+        self.index.add("note", {"id": "n3", "title": "Café"})
+        self.assertEqual(self.ids("cafe"), ["n3"])
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.stats()["by_type"]["note"], 2)
+
+    def test_query_latency_at_100k_documents(self):
+        """Build time and query latency over 100k synthetic documents"""
+        rng = random.Random(7)
+        vocabulary = [
+            "reunião", "projeto", "orçamento", "cliente", "entrega", "relatório", "médico", "exame", "viagem",
+            "compras", "mercado", "python", "javascript", "banco", "dados", "análise", "código", "teste",
+            "inteligência", "artificial", "pesquisa", "família", "aniversário", "academia", "treino", "leitura",
+        ] + [f"termo{i}" for i in range(5000)]
+
+        def text(words):
+            return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+        kinds = {"note": ("title", "content"), "reminder": ("title", "description"),
+                 "search": ("query", "results"), "code": ("description", "analysis")}
+        documents = []
+        for i in range(100000):
+            kind = list(kinds)[i % 4]
+            title, body = kinds[kind]
+            documents.append((kind, {"id": str(i), title: text(4), body: text(30)}))
+
+        index = TextIndex()
+        start = time.perf_counter()
+        for kind, document in documents:
+            index.add(kind, document)
+        build = time.perf_counter() - start
+
+        queries = ["reunião projeto", "orcamento cliente", "relatorio", "termo42 termo43", "analise de codigo python",
+                   "medico exame", "viagem familia", "inteligencia artificial", "treino academia", "term"]
+        for q in queries:
+            index.search(q)  # first query per term builds its posting arrays
+        timings = []
+        for _ in range(10):
+            for q in queries:
+                start = time.perf_counter()
+                index.search(q, limit=20)
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p50, p95 = statistics.median(timings), timings[int(len(timings) * 0.95)]
+        print(f"\n100000 docs: built in {build:.1f} s, {index.stats()['terms']} terms, query p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+        self.assertLess(p50, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
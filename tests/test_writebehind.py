@@ -0,0 +1,170 @@
+import asyncio
+import time
+import unittest
+
+from pymongo.errors import BulkWriteError, DocumentTooLarge
+
+from writebehind import WriteBehindQueue, WriteQueueClosed
+
+
+class FakeRepository:
+    """insert_many with a fixed round-trip latency; can fail the next N calls"""
+
+    def __init__(self, latency=0.0, fail_next=0, unique=None):
+        self.latency = latency
+        self.fail_next = fail_next
+        self.unique = unique
+        self.documents = []
+        self.calls = 0
+
+    async def insert(self, document):
+        await asyncio.sleep(self.latency)
+        self.documents.append(document)
+        return document
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail_next:
+            self.fail_next -= 1
+            raise ConnectionError("mongod unreachable")
+        if any(document.get("huge") for document in documents):
+            # Raised by the driver while encoding, before anything is sent
+            raise DocumentTooLarge("BSON document too large")
+        for index, document in enumerate(documents):
+            if self.unique and any(d[self.unique] == document[self.unique] for d in self.documents):
+                raise BulkWriteError({
+                    "nInserted": index,
+                    "writeErrors": [{"index": index, "code": 11000, "errmsg": "duplicate key"}],
+                })
+            self.documents.append(document)
+        return len(documents)
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+    def test_batches_in_order_across_collections(self):
+        chats, searches = FakeRepository(), FakeRepository()
+
+        async def run():
+            queue = WriteBehindQueue(max_batch=100, flush_interval=0.01)
+            for i in range(10):
+                await queue.put(chats, {"n": i})
+                await queue.put(chats, {"n": i, "again": True})
+                await queue.put(searches, {"n": i})
+            await queue.close()
+            return queue
+
+        queue = asyncio.run(run())
+        self.assertEqual([d["n"] for d in searches.documents], list(range(10)))
+        self.assertEqual(len(chats.documents), 20)
+        self.assertEqual((chats.calls, searches.calls), (1, 1))
+        self.assertEqual(queue.stats()["written"], 30)
+        self.assertEqual(queue.stats()["pending"], 0)
+
+    def test_retries_transient_failures(self):
+        chats = FakeRepository(fail_next=2)
+
+        async def run():
+            queue = WriteBehindQueue(flush_interval=0, retry_backoff=0.001)
+            for i in range(5):
+                await queue.put(chats, {"n": i})
+            await queue.flush()
+            await queue.close()
+            return queue
+
+        queue = asyncio.run(run())
+        self.assertEqual([d["n"] for d in chats.documents], list(range(5)))
+        self.assertEqual(queue.retries, 2)
+
+    def test_duplicates_are_skipped_not_retried(self):
+        blobs = FakeRepository(unique="hash")
+
+        async def run():
+            queue = WriteBehindQueue(flush_interval=0.01)
+            for h in ["a", "b", "a", "c", "b"]:
+                await queue.put(blobs, {"hash": h})
+            await queue.close()
+
+        asyncio.run(run())
+        self.assertEqual([d["hash"] for d in blobs.documents], ["a", "b", "c"])
+
+    def test_document_that_cannot_be_written_is_dropped(self):
+        chats = FakeRepository()
+
+        async def run():
+            queue = WriteBehindQueue(flush_interval=0.01, retry_backoff=0.001)
+            for i in range(10):
+                await queue.put(chats, {"n": i, "huge": i == 6})
+            await asyncio.wait_for(queue.close(), 1)
+            return queue
+
+        queue = asyncio.run(run())
+        self.assertEqual([d["n"] for d in chats.documents], [0, 1, 2, 3, 4, 5, 7, 8, 9])
+        self.assertEqual(queue.stats()["failed"], 1)
+        self.assertEqual(queue.stats()["retries"], 0)
+        self.assertEqual(queue.stats()["pending"], 0)
+
+    def test_backpressure_when_mongo_is_slow(self):
+        chats = FakeRepository(latency=0.02)
+
+        async def run():
+            queue = WriteBehindQueue(max_batch=10, max_pending=20, flush_interval=0)
+            for i in range(100):
+                await queue.put(chats, {"n": i})
+                self.assertLessEqual(queue.pending, 20)
+            await queue.close()
+            return queue
+
+        queue = asyncio.run(run())
+        self.assertEqual(len(chats.documents), 100)
+        self.assertGreater(queue.stats()["backpressure_waits"], 0)
+        self.assertEqual(queue.stats()["high_water"], 20)
+
+    def test_closed_queue_rejects_writes(self):
+        async def run():
+            queue = WriteBehindQueue()
+            await queue.close()
+            await queue.put(FakeRepository(), {})
+
+        with self.assertRaises(WriteQueueClosed):
+            asyncio.run(run())
+
+    def test_throughput(self):
+        """Request-path latency and sustained throughput: insert_one per save vs write-behind"""
+        count, concurrency, latency = 2000, 50, 0.002
+
+        async def saves(save):
+            async def worker(w):
+                for i in range(w, count, concurrency):
+                    await save({"n": i})
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(w) for w in range(concurrency)))
+            return time.perf_counter() - start
+
+        async def direct():
+            repo = FakeRepository(latency=latency)
+            elapsed = await saves(repo.insert)
+            return elapsed, elapsed, repo
+
+        async def behind():
+            repo = FakeRepository(latency=latency)
+            queue = WriteBehindQueue(max_batch=500, flush_interval=0.005)
+            enqueue = await saves(lambda doc: queue.put(repo, doc))
+            await queue.flush()
+            total = enqueue + queue.flush_seconds_total
+            await queue.close()
+            return enqueue, total, repo
+
+        direct_path, direct_total, direct_repo = asyncio.run(direct())
+        behind_path, behind_total, behind_repo = asyncio.run(behind())
+        print()
+        print(f"insert_one:   {direct_path * 1000:7.1f} ms in request path, {count / direct_total:8.0f} docs/s")
+        print(f"write-behind: {behind_path * 1000:7.1f} ms in request path, {count / behind_total:8.0f} docs/s, {behind_repo.calls} insert_many calls")
+
+        self.assertEqual(len(behind_repo.documents), count)
+        self.assertLess(behind_path, direct_path)
+        self.assertLess(behind_repo.calls, count / 10)
+
+
+if __name__ == "__main__":
+    unittest.main()